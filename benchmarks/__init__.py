@@ -0,0 +1,79 @@
+"""
+Benchmarks for the project's hot paths.
+
+Each module is runnable on its own, e.g. ``python -m benchmarks.band_scores``.
+``benchmarks.suite`` runs the main scenarios on data from ``benchmarks.data``
+and writes a JSON report that can be compared across commits.
+They run against a throwaway test database, never against ``db.sqlite3``.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+# LOGIN_THROTTLE that never throttles: benchmark requests all come from one
+# address, and the throttle is not what is being measured.
+UNTHROTTLED_LOGIN = {
+    "CACHE": "throttle", "IP_CAPACITY": 10**9, "IP_PERIOD": 1,
+    "EMAIL_CAPACITY": 10**9, "EMAIL_PERIOD": 1, "UNKNOWN_EMAIL_TTL": 60,
+}
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test databases for the duration of a benchmark run."""
+    from django.test.utils import setup_databases, teardown_databases
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+class Measurement:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+@contextmanager
+def measure():
+    """Count queries and wall time spent inside the block."""
+    from django.db import connection
+
+    result = Measurement()
+
+    def count(execute, sql, params, many, context):
+        result.queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        yield result
+        result.seconds = time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(samples, elapsed):
+    """p50/p99 in milliseconds and throughput for per-request timings."""
+    return {
+        "requests": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+    }
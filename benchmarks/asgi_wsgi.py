@@ -0,0 +1,210 @@
+"""
+The same endpoints served through WSGI and ASGI at high concurrency.
+
+    python -m benchmarks.asgi_wsgi --connections 1000 --requests 5000
+    python -m benchmarks.asgi_wsgi --endpoint login --fast-hasher
+
+Requests are fed straight into Django's handlers, with no server or
+sockets, so the numbers compare the request paths themselves. WSGI gets
+``--threads`` worker threads (a threaded gunicorn worker) and the
+connections queue for them. ASGI runs every connection as a task on one
+event loop, with ``core.asgi_urls`` routing to the async views. Latency
+includes the time a request waited for a worker.
+"""
+import argparse
+import asyncio
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import latency_summary, setup_django, test_database
+
+PASSWORD = "bench-password-1"
+ENDPOINTS = ("exam", "login")
+
+
+def populate(users):
+    from django.contrib.auth.hashers import make_password
+
+    from users.models import CustomUser
+    from users_auth.tokens import LoginRefreshToken
+    from writing.models import WritingExamModel, WritingTaskModel
+
+    password = make_password(PASSWORD)
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                email=f"asgi{i}@example.com", first_name="Bench", last_name=str(i),
+                full_name=f"Bench {i}", password=password, is_active=True,
+            )
+            for i in range(users)
+        ],
+        batch_size=1000,
+    )
+    exam = WritingExamModel.objects.create(title="Bench exam", tag="academic")
+    for task in ("task1", "task2"):
+        WritingTaskModel.objects.create(exam=exam, type="text", task=task, the_question="Q")
+    token = LoginRefreshToken.for_user(CustomUser.objects.first()).access_token
+    return exam.pk, str(token)
+
+
+def make_requests(endpoint, count, users, exam_id, token):
+    """``(method, path, headers, body)`` for each request"""
+    if endpoint == "exam":
+        headers = {"Authorization": f"Bearer {token}"}
+        return [("GET", f"/api/v1/writing/exams/{exam_id}/", headers, b"")] * count
+    return [
+        (
+            "POST",
+            "/api/v1/users_auth/login/",
+            {"Content-Type": "application/json"},
+            json.dumps({"email": f"asgi{i % users}@example.com", "password": PASSWORD}).encode(),
+        )
+        for i in range(count)
+    ]
+
+
+def run_wsgi(requests, connections, threads):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    pool = ThreadPoolExecutor(max_workers=threads)
+
+    def one(request, queued):
+        method, path, headers, body = request
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "REMOTE_ADDR": "127.0.0.1",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+            **{"HTTP_" + name.upper().replace("-", "_"): value for name, value in headers.items()},
+        }
+        if "HTTP_CONTENT_TYPE" in environ:
+            environ["CONTENT_TYPE"] = environ.pop("HTTP_CONTENT_TYPE")
+        statuses = []
+        response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        b"".join(response)
+        response.close()
+        return time.perf_counter() - queued, int(statuses[0].split()[0])
+
+    batches = [requests[i::connections] for i in range(connections)]
+    start = time.perf_counter()
+    # Each connection sends its requests one after another, handing each to
+    # the worker pool and waiting for its response.
+    with ThreadPoolExecutor(max_workers=connections) as clients:
+        results = list(clients.map(
+            lambda batch: [pool.submit(one, request, time.perf_counter()).result()
+                           for request in batch],
+            batches,
+        ))
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return [row for batch in results for row in batch], elapsed
+
+
+def run_asgi(requests, connections):
+    from django.core.handlers.asgi import ASGIHandler
+
+    handler = ASGIHandler()
+
+    async def one(request):
+        method, path, headers, body = request
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"content-length", str(len(body)).encode())]
+            + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # No disconnect; the handler cancels this wait when it is done.
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        started = time.perf_counter()
+        await handler(scope, receive, send)
+        return time.perf_counter() - started, statuses[0]
+
+    async def connection(batch):
+        return [await one(request) for request in batch]
+
+    async def main():
+        batches = [requests[i::connections] for i in range(connections)]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(connection(batch) for batch in batches))
+        return [row for batch in results for row in batch], time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+def summarize(label, rows, elapsed):
+    samples = [seconds for seconds, _ in rows]
+    errors = sum(1 for _, status in rows if status >= 400)
+    summary = latency_summary(samples, elapsed)
+    print(f"{label:5} {summary['requests']:6d} req  p50 {summary['p50_ms']:8.1f} ms  "
+          f"p99 {summary['p99_ms']:8.1f} ms  {summary['rps']:8.0f} req/s  {errors} errors")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="exam")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32, help="WSGI worker threads")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--fast-hasher", action="store_true",
+                        help="MD5 hasher, to compare request overhead without the hash")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.test.utils import override_settings, setup_test_environment
+
+    setup_test_environment()
+    overrides = {
+        # One client IP sends everything; don't measure the login throttle.
+        "LOGIN_THROTTLE": {
+            "CACHE": "throttle", "IP_CAPACITY": 10**9, "IP_PERIOD": 1,
+            "EMAIL_CAPACITY": 10**9, "EMAIL_PERIOD": 1, "UNKNOWN_EMAIL_TTL": 60,
+        },
+    }
+    if args.fast_hasher:
+        overrides["PASSWORD_HASHERS"] = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+    with override_settings(**overrides), test_database():
+        exam_id, token = populate(args.users)
+        requests = make_requests(args.endpoint, args.requests, args.users, exam_id, token)
+        print(f"{args.endpoint}: {args.requests} requests over {args.connections} connections, "
+              f"WSGI with {args.threads} threads")
+        with override_settings(ROOT_URLCONF="core.urls"):
+            summarize("wsgi", *run_wsgi(requests, args.connections, args.threads))
+        with override_settings(ROOT_URLCONF="core.asgi_urls"):
+            summarize("asgi", *run_asgi(requests, args.connections))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Final band scoring: per-row loop vs. the set-based service.
+
+    python -m benchmarks.band_scores --users 10000
+"""
+import argparse
+
+from benchmarks import measure, setup_django, test_database
+
+
+def populate(users):
+    from users.models import CustomUser
+    from writing.models import (
+        WritingAnswerModel, WritingEvalution, WritingExamModel, WritingTaskModel,
+    )
+
+    exam = WritingExamModel.objects.create(title="Benchmark exam", tag="academic")
+    task1 = WritingTaskModel.objects.create(exam=exam, type="text", task="task1", the_question="Q1")
+    task2 = WritingTaskModel.objects.create(exam=exam, type="text", task="task2", the_question="Q2")
+
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                email=f"bench{i}@example.com", first_name="Bench", last_name=str(i),
+                full_name=f"Bench {i}", password="!",
+            )
+            for i in range(users)
+        ],
+        batch_size=1000,
+    )
+    user_ids = list(CustomUser.objects.values_list("pk", flat=True))
+
+    answers = []
+    for user_id in user_ids:
+        answers.append(WritingAnswerModel(exam=exam, answer=task1, user_id=user_id, weight=1))
+        answers.append(WritingAnswerModel(exam=exam, answer=task2, user_id=user_id, weight=2))
+    WritingAnswerModel.objects.bulk_create(answers, batch_size=1000)
+
+    evaluations = []
+    for i, answer_id in enumerate(WritingAnswerModel.objects.values_list("pk", flat=True)):
+        band = 5 + (i % 8) / 2
+        evaluations.append(
+            WritingEvalution(
+                evalute_id=answer_id, task_response=band, coherence_cohesion=band,
+                lexical_resource=band, grammatical_range_accuracy=band, overall_band=band,
+            )
+        )
+    WritingEvalution.objects.bulk_create(evaluations, batch_size=1000)
+    return exam, user_ids
+
+
+def legacy_final_band(user, exam):
+    """The per-row loop ``calculate_final_band`` used before the service."""
+    from writing.models import WritingAnswerModel
+
+    answers = WritingAnswerModel.objects.filter(user=user, exam=exam)
+    if not answers.exists():
+        return 0.0
+    total = 0
+    total_weight = 0
+    for ans in answers:
+        if hasattr(ans, "evaluation"):
+            total += ans.evaluation.overall_band * ans.weight
+            total_weight += ans.weight
+    return total / total_weight if total_weight else 0.0
+
+
+def run(users):
+    from writing.services import finalize_bands
+
+    exam, user_ids = populate(users)
+
+    with measure() as legacy:
+        for user_id in user_ids:
+            legacy_final_band(user_id, exam)
+
+    with measure() as bulk:
+        finalize_bands(exam=exam)
+
+    print(f"users: {users}")
+    print(f"per-row loop : {legacy.queries:>7} queries {legacy.seconds:8.3f}s")
+    print(f"finalize_bands: {bulk.queries:>6} queries {bulk.seconds:8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        run(args.users)
+
+
+if __name__ == "__main__":
+    main()
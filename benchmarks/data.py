@@ -0,0 +1,155 @@
+"""
+Synthetic IELTS writing data for the benchmarks.
+
+    from benchmarks.data import generate
+    dataset = generate(users=10000, exams=4)
+
+Users, exams with their two tasks, submitted attempts, answers and
+evaluations are written with ``bulk_create``, a chunk of users at a time,
+and the derived tables (score ledger, final bands, ranking histograms) are
+rebuilt at the end, so the data looks like what the app itself would have
+written. The same ``seed`` gives the same data. Every user has the password
+``PASSWORD``, hashed once with the configured hasher.
+"""
+import random
+import time
+
+PASSWORD = "bench-password-1"
+EMAIL = "user{}@bench.example.com"
+BANDS = [band / 2 for band in range(8, 18)]  # 4.0 to 8.5
+
+
+class Dataset:
+    """What ``generate`` created, and what it left for the scenarios to do"""
+
+    def __init__(self):
+        self.user_ids = []
+        self.exam_ids = []
+        self.tasks = {}            # exam id -> (task1 id, task2 id)
+        self.answered = []         # (user id, exam id) with a submitted attempt
+        self.unanswered = []       # (user id, exam id) still open
+        self.unevaluated = []      # answer ids without an evaluation
+        self.counts = {}
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {**self.counts, "seconds": self.seconds}
+
+
+def _users(start, stop, password):
+    from users.models import CustomUser
+
+    return [
+        CustomUser(
+            email=EMAIL.format(i), first_name="Bench", last_name=str(i),
+            full_name=f"Bench {i}", password=password, is_active=True,
+        )
+        for i in range(start, stop)
+    ]
+
+
+def evaluation(rng, answer_id):
+    """An unsaved evaluation of ``answer_id`` with random bands"""
+    from writing.models import WritingEvalution
+
+    bands = [rng.choice(BANDS) for _ in range(4)]
+    return WritingEvalution(
+        evalute_id=answer_id, task_response=bands[0], coherence_cohesion=bands[1],
+        lexical_resource=bands[2], grammatical_range_accuracy=bands[3],
+        overall_band=sum(bands) / 4,
+    )
+
+
+def generate(users=1000, exams=4, answered=0.75, evaluated=0.8, seed=0, batch_size=1000):
+    """
+    Create ``users`` users and ``exams`` exams. Each user submits each exam
+    with probability ``answered``, and each answer is evaluated with
+    probability ``evaluated``. Returns a Dataset.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+
+    from users.models import CustomUser
+    from writing.models import (
+        WritingAnswerModel,
+        WritingEvalution,
+        WritingExamModel,
+        WritingSubmissionModel,
+        WritingTaskModel,
+    )
+    from writing.rankings import rebuild_rankings
+    from writing.services import finalize_bands, rebuild_ledger
+
+    rng = random.Random(seed)
+    dataset = Dataset()
+    start = time.perf_counter()
+    password = make_password(PASSWORD)
+    tags = [tag for tag, _ in WritingExamModel.TAG]
+
+    with transaction.atomic():
+        created = WritingExamModel.objects.bulk_create([
+            WritingExamModel(title=f"Synthetic exam {i}", tag=tags[i % len(tags)])
+            for i in range(exams)
+        ])
+        dataset.exam_ids = [exam.pk for exam in created]
+        tasks = WritingTaskModel.objects.bulk_create([
+            WritingTaskModel(exam_id=exam_id, type="text", task=task,
+                             the_question=f"Synthetic {task} question")
+            for exam_id in dataset.exam_ids
+            for task in ("task1", "task2")
+        ])
+        for first, second in zip(tasks[::2], tasks[1::2]):
+            dataset.tasks[first.exam_id] = (first.pk, second.pk)
+
+    submissions = answers = evaluations = 0
+    for chunk_start in range(0, users, batch_size):
+        with transaction.atomic():
+            created = CustomUser.objects.bulk_create(
+                _users(chunk_start, min(users, chunk_start + batch_size), password)
+            )
+            pairs = []
+            for user in created:
+                dataset.user_ids.append(user.pk)
+                for exam_id in dataset.exam_ids:
+                    if rng.random() < answered:
+                        pairs.append((user.pk, exam_id))
+                    else:
+                        dataset.unanswered.append((user.pk, exam_id))
+            dataset.answered.extend(pairs)
+
+            attempts = WritingSubmissionModel.objects.bulk_create([
+                WritingSubmissionModel(user_id=user_id, exam_id=exam_id)
+                for user_id, exam_id in pairs
+            ])
+            rows = WritingAnswerModel.objects.bulk_create([
+                WritingAnswerModel(
+                    exam_id=attempt.exam_id, answer_id=task_id, user_id=attempt.user_id,
+                    weight=weight, submission_id=attempt.pk, text="Synthetic essay text.",
+                )
+                for attempt in attempts
+                for task_id, weight in zip(dataset.tasks[attempt.exam_id], (1, 2))
+            ])
+            marked = []
+            for row in rows:
+                if rng.random() < evaluated:
+                    marked.append(evaluation(rng, row.pk))
+                else:
+                    dataset.unevaluated.append(row.pk)
+            WritingEvalution.objects.bulk_create(marked)
+            submissions += len(attempts)
+            answers += len(rows)
+            evaluations += len(marked)
+
+    rebuild_ledger(batch_size=batch_size)
+    finalize_bands(batch_size=batch_size)
+    rebuild_rankings()
+
+    dataset.seconds = time.perf_counter() - start
+    dataset.counts = {
+        "users": len(dataset.user_ids),
+        "exams": len(dataset.exam_ids),
+        "submissions": submissions,
+        "answers": answers,
+        "evaluations": evaluations,
+    }
+    return dataset
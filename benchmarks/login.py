@@ -0,0 +1,125 @@
+"""
+Login endpoint load test: the old LoginApiView flow vs. the current one.
+
+    python -m benchmarks.login --requests 200 --threads 4
+    python -m benchmarks.login --fast-hasher   # isolate non-hash overhead
+
+Each request goes through the DRF view with a real password check, so the
+numbers include the configured hasher unless ``--fast-hasher`` is given.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import UNTHROTTLED_LOGIN, latency_summary, setup_django, test_database
+
+PASSWORD = "bench-password-1"
+
+
+def legacy_view():
+    """LoginApiView as it was before the hot-path rework."""
+    from django.utils import timezone
+    from rest_framework import status
+    from rest_framework.response import Response
+    from rest_framework.views import APIView
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from users.models import CustomUser
+    from users_auth.serializers import UserSerializer
+
+    class LegacyLoginApiView(APIView):
+        def post(self, request):
+            user_qs = CustomUser.objects.filter(email=request.data.get("email")).first()
+            if not user_qs:
+                return Response(status=status.HTTP_401_UNAUTHORIZED)
+            if not user_qs.check_password(request.data.get("password")):
+                return Response(status=status.HTTP_401_UNAUTHORIZED)
+            if not user_qs.is_active or user_qs.is_suspended:
+                return Response()
+            user_qs.last_login = timezone.now()
+            user_qs.save()
+            token = RefreshToken.for_user(user_qs)
+            return Response({
+                "access": str(token.access_token),
+                "refresh": str(token),
+                "user": UserSerializer(user_qs).data,
+            })
+
+    return LegacyLoginApiView.as_view()
+
+
+def populate(users):
+    from django.contrib.auth.hashers import make_password
+
+    from users.models import CustomUser
+
+    password = make_password(PASSWORD)
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                email=f"login{i}@example.com", first_name="Login", last_name=str(i),
+                full_name=f"Login {i}", password=password, is_active=True,
+            )
+            for i in range(users)
+        ],
+        batch_size=1000,
+    )
+
+
+def drive(view, requests, threads, users):
+    from django.db import connections
+    from rest_framework.test import APIRequestFactory
+
+    factory = APIRequestFactory()
+
+    def one(i):
+        request = factory.post(
+            "/api/v1/users_auth/login/",
+            {"email": f"login{i % users}@example.com", "password": PASSWORD},
+            format="json",
+        )
+        start = time.perf_counter()
+        response = view(request)
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.status_code
+        connections.close_all()
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(one, range(requests)))
+    return latency_summary(samples, time.perf_counter() - start)
+
+
+def run(requests, threads, users):
+    from users_auth.views import LoginApiView
+
+    populate(users)
+    for label, view in (("before", legacy_view()), ("after", LoginApiView.as_view())):
+        result = drive(view, requests, threads, users)
+        print(
+            f"{label:<7} {result['requests']} req  p50 {result['p50_ms']:8.2f} ms  "
+            f"p99 {result['p99_ms']:8.2f} ms  {result['rps']:8.1f} req/s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--fast-hasher", action="store_true")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test.utils import override_settings
+
+    overrides = {"LOGIN_THROTTLE": UNTHROTTLED_LOGIN}
+    if args.fast_hasher:
+        overrides["PASSWORD_HASHERS"] = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+    with override_settings(**overrides), test_database():
+        run(args.requests, args.threads, args.users)
+
+
+if __name__ == "__main__":
+    main()
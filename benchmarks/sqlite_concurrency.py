@@ -0,0 +1,149 @@
+"""
+Concurrent logins and answer submissions against a SQLite file database.
+
+    python -m benchmarks.sqlite_concurrency --threads 8 --requests 400
+    python -m benchmarks.sqlite_concurrency --mode tuned
+
+Without ``--mode`` both the default SQLite settings and ``DB_SQLITE_TUNING``
+are measured, each in a fresh process and a fresh temporary database file
+(settings are fixed once Django is set up). Half of the requests log in,
+which writes ``last_login``; the other half submit a writing attempt. Requests
+that fail with "database is locked" are counted, not retried.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import latency_summary, setup_django
+
+PASSWORD = "bench-password-1"
+MODES = ("default", "tuned")
+
+
+def populate(users):
+    from django.contrib.auth.hashers import make_password
+
+    from users.models import CustomUser
+    from writing.models import WritingExamModel, WritingTaskModel
+
+    password = make_password(PASSWORD)
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                email=f"sqlite{i}@example.com", first_name="Bench", last_name=str(i),
+                full_name=f"Bench {i}", password=password, is_active=True,
+            )
+            for i in range(users)
+        ],
+        batch_size=1000,
+    )
+    exam = WritingExamModel.objects.create(title="Bench exam", tag="academic")
+    tasks = [
+        WritingTaskModel.objects.create(exam=exam, type="text", task=task, the_question="Q")
+        for task in ("task1", "task2")
+    ]
+    return exam, tasks, list(CustomUser.objects.order_by("pk"))
+
+
+def drive(requests, threads, users):
+    from django.db import OperationalError, connections
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from users_auth.views import LoginApiView
+    from writing.views import ExamSubmissionApiView
+
+    exam, tasks, accounts = populate(users)
+    login = LoginApiView.as_view()
+    submit = ExamSubmissionApiView.as_view()
+    factory = APIRequestFactory()
+    answers = [{"task": task.pk, "text": "Some essay text."} for task in tasks]
+
+    def one(i):
+        user = accounts[i % users]
+        if i % 2:
+            request = factory.post(
+                "/api/v1/users_auth/login/",
+                {"email": user.email, "password": PASSWORD},
+                format="json",
+            )
+            view, kwargs = login, {}
+        else:
+            request = factory.post(
+                f"/api/v1/writing/exams/{exam.pk}/submit/",
+                {"answers": answers},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY=f"bench-{i}",
+            )
+            force_authenticate(request, user=user)
+            view, kwargs = submit, {"pk": exam.pk}
+        start = time.perf_counter()
+        try:
+            status = view(request, **kwargs).status_code
+        except OperationalError:
+            status = None
+        elapsed = time.perf_counter() - start
+        connections.close_all()
+        return elapsed, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(requests)))
+    summary = latency_summary([elapsed for elapsed, _ in results], time.perf_counter() - start)
+    summary["locked"] = sum(1 for _, status in results if status is None)
+    summary["errors"] = sum(1 for _, status in results if status and status >= 400)
+    return summary
+
+
+def run_mode(mode, requests, threads, users):
+    """Run one mode in this process; Django must not be set up yet."""
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.sqlite3')}"
+        os.environ["DB_SQLITE_TUNING"] = "1" if mode == "tuned" else "0"
+        setup_django()
+
+        from django.conf import settings
+        from django.core.management import call_command
+
+        # Isolate the database: a fast hasher and no login throttling.
+        settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        settings.LOGIN_THROTTLE = {
+            **settings.LOGIN_THROTTLE, "IP_CAPACITY": 10**9, "EMAIL_CAPACITY": 10**9,
+        }
+        call_command("migrate", verbosity=0)
+        result = drive(requests, threads, users)
+
+    print(
+        f"{mode:<8} {result['requests']} req  p50 {result['p50_ms']:8.2f} ms  "
+        f"p99 {result['p99_ms']:8.2f} ms  {result['rps']:8.1f} req/s  "
+        f"locked {result['locked']}  other errors {result['errors']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.requests, args.threads, args.users)
+        return
+    for mode in MODES:
+        subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.sqlite_concurrency", "--mode", mode,
+                "--requests", str(args.requests), "--threads", str(args.threads),
+                "--users", str(args.users),
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Hot-path scenarios on synthetic data, reported as JSON for comparing commits.
+
+    python -m benchmarks.suite --users 10000 --output before.json
+    python -m benchmarks.suite --users 10000 --compare before.json
+    python -m benchmarks.suite --scenario login --scenario submit --fast-hasher
+
+``benchmarks.data.generate`` fills a throwaway test database, then each
+scenario runs ``--operations`` times against it:
+
+    login       LoginApiView with the user's password
+    submit      ExamSubmissionApiView for an exam the user had not taken
+    evaluate    an examiner saving a WritingEvalution (ledger update included)
+    final_band  WrintingBandScoreModel.calculate_final_band for one user
+    cohort      finalize_bands for a whole exam (one operation per exam)
+
+Every scenario reports throughput, latency percentiles, SQL queries and the
+peak memory traced by tracemalloc, which slows Python code down; use
+``--no-memory`` for timings closer to production. The JSON also records the
+commit, database and hasher, so runs are only compared like for like.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from benchmarks import UNTHROTTLED_LOGIN, measure, percentile, setup_django, test_database
+from benchmarks.data import PASSWORD, evaluation, generate
+
+# Lower is better for everything compared except throughput.
+COMPARED = ("throughput", "p50_ms", "p99_ms", "queries_per_op", "peak_memory_kb")
+
+
+def login(dataset, operations, rng):
+    from rest_framework.test import APIRequestFactory
+
+    from benchmarks.data import EMAIL
+    from users_auth.views import LoginApiView
+
+    view = LoginApiView.as_view()
+    factory = APIRequestFactory()
+    users = len(dataset.user_ids)
+    requests = [
+        factory.post(
+            "/api/v1/users_auth/login/",
+            {"email": EMAIL.format(rng.randrange(users)), "password": PASSWORD},
+            format="json",
+        )
+        for _ in range(operations)
+    ]
+    for request in requests:
+        yield lambda request=request: _expect(view(request), 200)
+
+
+def submit(dataset, operations, rng):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from users.models import CustomUser
+    from writing.views import ExamSubmissionApiView
+
+    view = ExamSubmissionApiView.as_view()
+    factory = APIRequestFactory()
+    pairs = rng.sample(dataset.unanswered, min(operations, len(dataset.unanswered)))
+    users = CustomUser.objects.in_bulk({user_id for user_id, _ in pairs})
+    for user_id, exam_id in pairs:
+        request = factory.post(
+            f"/api/v1/writing/exams/{exam_id}/submit/",
+            {"answers": [
+                {"task": task_id, "text": "A synthetic essay."}
+                for task_id in dataset.tasks[exam_id]
+            ]},
+            format="json",
+        )
+        force_authenticate(request, users[user_id])
+        yield lambda request=request, pk=exam_id: _expect(view(request, pk=pk), 201)
+
+
+def evaluate(dataset, operations, rng):
+    for answer_id in rng.sample(dataset.unevaluated, min(operations, len(dataset.unevaluated))):
+        yield evaluation(rng, answer_id).save
+
+
+def final_band(dataset, operations, rng):
+    from writing.models import WrintingBandScoreModel
+
+    for user_id, exam_id in rng.sample(dataset.answered, min(operations, len(dataset.answered))):
+        yield WrintingBandScoreModel(user_id=user_id, exam_id=exam_id).calculate_final_band
+
+
+def cohort(dataset, operations, rng):
+    from writing.services import finalize_bands
+
+    for exam_id in dataset.exam_ids:
+        yield lambda exam_id=exam_id: finalize_bands(exam=exam_id)
+
+
+SCENARIOS = {
+    "login": login,
+    "submit": submit,
+    "evaluate": evaluate,
+    "final_band": final_band,
+    "cohort": cohort,
+}
+
+
+def _expect(response, status):
+    if response.status_code != status:
+        raise RuntimeError(f"expected {status}, got {response.status_code}: {response.data}")
+    return response
+
+
+def run_scenario(name, dataset, operations, rng, memory=True):
+    """Run one scenario's operations and summarize them"""
+    # Build the operations (requests, tokens, objects) outside the measurement.
+    calls = list(SCENARIOS[name](dataset, operations, rng))
+    samples = []
+    if memory:
+        tracemalloc.start()
+    try:
+        with measure() as measured:
+            for call in calls:
+                start = time.perf_counter()
+                call()
+                samples.append(time.perf_counter() - start)
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return {
+        "operations": len(samples),
+        "seconds": measured.seconds,
+        "throughput": len(samples) / measured.seconds if measured.seconds else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples, default=0.0) * 1000,
+        "queries": measured.queries,
+        "queries_per_op": measured.queries / len(samples) if samples else 0.0,
+        "peak_memory_kb": peak / 1024 if peak is not None else None,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import django
+    from django.conf import settings
+    from django.db import connection
+
+    return {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "password_hasher": settings.PASSWORD_HASHERS[0],
+    }
+
+
+def compare(baseline, report):
+    """Lines comparing ``report`` with an earlier ``baseline`` report"""
+    lines = [f"baseline {baseline['meta']['commit']}  current {report['meta']['commit']}"]
+    for name, current in report["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before:
+            continue
+        for metric in COMPARED:
+            old, new = before.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+7.1f}%" if old else "      -"
+            lines.append(f"{name:11} {metric:15} {old:12.2f} -> {new:12.2f}  {change}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--exams", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="run only these (repeatable); default all")
+    parser.add_argument("--fast-hasher", action="store_true",
+                        help="MD5 hasher, to measure login without the hash")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier JSON report to compare with")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    from django.test.utils import override_settings, setup_test_environment
+
+    setup_test_environment()
+    overrides = {"LOGIN_THROTTLE": UNTHROTTLED_LOGIN}
+    if args.fast_hasher:
+        overrides["PASSWORD_HASHERS"] = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+    with override_settings(**overrides), test_database():
+        rng = random.Random(args.seed)
+        dataset = generate(users=args.users, exams=args.exams, seed=args.seed)
+        report = {
+            "meta": environment(),
+            "parameters": vars(args),
+            "dataset": dataset.as_dict(),
+            "scenarios": {},
+        }
+        for name in args.scenario or SCENARIOS:
+            report["scenarios"][name] = run_scenario(
+                name, dataset, args.operations, rng, memory=not args.no_memory
+            )
+            print(f"{name}: {report['scenarios'][name]['throughput']:.1f} ops/s", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    with open(args.output, "w") if args.output else nullcontext(sys.stdout) as out:
+        out.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n".join(compare(json.load(f), report)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+User payloads: the old ModelSerializer vs. the profile layer.
+
+    python -m benchmarks.user_serializer --users 2000 --rounds 5
+
+Each variant loads ``--users`` users and turns them into API payloads:
+
+    model_serializer  full rows through the old ModelSerializer
+    user_serializer   profiles() rows through the current UserSerializer
+    profile_data      profiles() rows through users.profiles.profile_data
+    cached            users.profiles.get_profiles, after a warm-up round
+
+Times are the best of ``--rounds``, split into loading and serializing.
+The default cache is a local-memory one sized to hold every profile (the
+stock one keeps 300 entries).
+"""
+import argparse
+import time
+
+from benchmarks import measure, setup_django, test_database
+
+
+def legacy_serializer():
+    """UserSerializer as it was before the profile layer."""
+    from rest_framework import serializers
+
+    from users.models import CustomUser
+
+    class LegacyUserSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = CustomUser
+            fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'is_active']
+            read_only = ["id"]
+
+    return LegacyUserSerializer
+
+
+def populate(users):
+    from users.models import CustomUser
+
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                email=f"profile{i}@example.com", first_name="Profile", last_name=str(i),
+                full_name=f"Profile {i}", password="!", is_active=True,
+            )
+            for i in range(users)
+        ],
+        batch_size=1000,
+    )
+    return list(CustomUser.objects.values_list("pk", flat=True))
+
+
+def variants(user_ids):
+    """``{name: (load, serialize)}``; serialize takes what load returned"""
+    from users.models import CustomUser
+    from users.profiles import get_profiles, profile_data, profiles
+    from users_auth.serializers import UserSerializer
+
+    legacy = legacy_serializer()
+    return {
+        "model_serializer": (
+            lambda: list(CustomUser.objects.filter(pk__in=user_ids)),
+            lambda users: [legacy(user).data for user in users],
+        ),
+        "user_serializer": (
+            lambda: list(profiles().filter(pk__in=user_ids)),
+            lambda users: [UserSerializer(user).data for user in users],
+        ),
+        "profile_data": (
+            lambda: list(profiles().filter(pk__in=user_ids)),
+            lambda users: [profile_data(user) for user in users],
+        ),
+        "cached": (
+            lambda: get_profiles(user_ids),
+            lambda found: [found[user_id] for user_id in user_ids],
+        ),
+    }
+
+
+def run(users, rounds):
+    from django.core.cache import cache
+
+    user_ids = populate(users)
+    cache.clear()
+    print(f"users: {users}, best of {rounds}")
+    for name, (load, serialize) in variants(user_ids).items():
+        if name == "cached":
+            load()
+        best_load = best_serialize = float("inf")
+        for _ in range(rounds):
+            with measure() as loading:
+                loaded = load()
+            start = time.perf_counter()
+            serialize(loaded)
+            best_load = min(best_load, loading.seconds)
+            best_serialize = min(best_serialize, time.perf_counter() - start)
+        per_user = (best_load + best_serialize) / users * 1e6
+        print(f"{name:17} load {best_load * 1000:8.2f} ms ({loading.queries} queries)  "
+              f"serialize {best_serialize * 1000:8.2f} ms  {per_user:7.2f} us/user")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    caches = {
+        **settings.CACHES,
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 2 * args.users},
+        },
+    }
+    with override_settings(CACHES=caches), test_database():
+        run(args.users, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Serve the async login and exam views (core/asgi_urls.py).
+os.environ.setdefault('ROOT_URLCONF', 'core.asgi_urls')
 
 application = get_asgi_application()
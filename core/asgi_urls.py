@@ -0,0 +1,19 @@
+"""
+URL configuration for the ASGI deployment (core/asgi.py).
+
+The same routes as core/urls.py, except that login, exam detail and exam
+submission are served by async views that don't tie up a thread per request.
+"""
+from django.urls import path
+
+from users_auth import async_views as users_auth_async
+from writing import async_views as writing_async
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("api/v1/users_auth/login/", users_auth_async.login, name='async-login'),
+    path("api/v1/writing/exams/<int:pk>/", writing_async.exam_detail, name='async-exam-detail'),
+    path("api/v1/writing/exams/<int:pk>/submit/", writing_async.submit_exam,
+         name='async-exam-submit'),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,36 @@
+"""
+Bounded thread pool for blocking work done on behalf of async views.
+
+Password hashing and storage I/O would stall the event loop, and
+``sync_to_async(thread_sensitive=False)`` hands them to the loop's default
+executor, which is shared with everything else. ``run_blocking`` uses a pool
+of ``ASYNC_BLOCKING_WORKERS`` threads instead, so a burst of logins queues
+up rather than starving other requests. Work sent here must not use the ORM.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def blocking_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_BLOCKING_WORKERS, thread_name_prefix="async-blocking"
+            )
+        return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # run_in_executor doesn't carry the caller's context (core.metrics) along.
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(blocking_executor(), call)
@@ -0,0 +1,289 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+``InstrumentationMiddleware`` (core/middleware.py) wraps every request in
+``collect()``, which counts the SQL queries (and their time) run on behalf
+of the request, on any thread, and the time spent verifying passwords. The
+totals and latency are added to ``request_metrics`` under the matched URL
+route, e.g. ``api/v1/writing/exams/<int:pk>/``. Queries whose fingerprint
+(SQL with literals and ``IN`` lists collapsed) repeats within a request are
+counted as duplicates: the N+1 patterns this is meant to catch.
+
+Views declare what they may cost with ``budget()``; requests over it are
+counted per route, and ``core.testing.assert_within_budget`` fails a test
+on the same limits. ``metrics_view`` serves everything at ``/metrics``.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+_current = ContextVar("request_metrics", default=None)
+
+UNMATCHED_ROUTE = "<unmatched>"
+MAX_FINGERPRINT_LENGTH = 200
+MAX_FINGERPRINTS_PER_ROUTE = 20
+
+_IN_LIST_RE = re.compile(r"\((?:\s*%s\s*,)*\s*%s\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql):
+    """The shape of a query: literals and parameter lists collapsed"""
+    sql = _IN_LIST_RE.sub("(%s, ...)", sql)
+    sql = _LITERAL_RE.sub("?", sql)
+    return " ".join(sql.split())[:MAX_FINGERPRINT_LENGTH]
+
+
+class RequestMetrics:
+    """What one request cost; filled in while ``collect()`` is active"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Repeated fingerprints and how often each ran"""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.duplicates.values())
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.query(sql, time.perf_counter() - start)
+
+
+def install(connection, **kwargs):
+    """Count this connection's queries into the active ``collect()``"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+# Connections are per thread and opened lazily; catch every new one.
+connection_created.connect(install, dispatch_uid="core.metrics.install")
+
+
+def record_hash(seconds):
+    """Password verification time, reported by users.hashers"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.hash_seconds += seconds
+
+
+@contextmanager
+def collect():
+    """Collect the queries and hash time of the block into a RequestMetrics"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds = time.perf_counter() - start
+        _current.reset(token)
+
+
+class Budget(NamedTuple):
+    """What a request to a view may cost; None leaves a limit unchecked"""
+    queries: Optional[int] = None
+    duplicates: Optional[int] = None
+    seconds: Optional[float] = None
+
+    def violations(self, metrics):
+        found = []
+        if self.queries is not None and metrics.queries > self.queries:
+            found.append(f"{metrics.queries} queries > {self.queries}")
+        if self.duplicates is not None and metrics.duplicate_queries > self.duplicates:
+            found.append(f"{metrics.duplicate_queries} duplicate queries > {self.duplicates}")
+        if self.seconds is not None and metrics.seconds > self.seconds:
+            found.append(f"{metrics.seconds * 1000:.0f} ms > {self.seconds * 1000:.0f} ms")
+        return found
+
+
+def budget(**limits):
+    """Declare a view's Budget: ``@budget(queries=2)`` or ``budget = Budget(...)``"""
+    def decorator(view):
+        view.budget = Budget(**limits)
+        return view
+    return decorator
+
+
+def view_budget(view):
+    """The Budget of a resolved view function, also through ``as_view()``"""
+    declared = getattr(view, "budget", None)
+    if declared is None:
+        declared = getattr(getattr(view, "view_class", None), "budget", None)
+    return declared
+
+
+class MetricsRegistry:
+    """Per-process totals by route, rendered in the Prometheus text format"""
+
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = Counter()
+            self._routes = {}
+
+    def _route(self, route):
+        return self._routes.setdefault(route, {
+            "latency": [0] * len(self.LATENCY_BUCKETS),
+            "latency_sum": 0.0,
+            "queries": [0] * len(self.QUERY_BUCKETS),
+            "queries_sum": 0,
+            "count": 0,
+            "db_seconds": 0.0,
+            "hash_seconds": 0.0,
+            "duplicate_queries": 0,
+            "over_budget": 0,
+            "fingerprints": Counter(),
+        })
+
+    def observe(self, route, method, status, metrics, over_budget=False):
+        with self._lock:
+            self._requests[(route, method, status)] += 1
+            stats = self._route(route)
+            stats["count"] += 1
+            stats["latency_sum"] += metrics.seconds
+            stats["queries_sum"] += metrics.queries
+            for i, bound in enumerate(self.LATENCY_BUCKETS):
+                if metrics.seconds <= bound:
+                    stats["latency"][i] += 1
+            for i, bound in enumerate(self.QUERY_BUCKETS):
+                if metrics.queries <= bound:
+                    stats["queries"][i] += 1
+            stats["db_seconds"] += metrics.db_seconds
+            stats["hash_seconds"] += metrics.hash_seconds
+            stats["duplicate_queries"] += metrics.duplicate_queries
+            stats["over_budget"] += over_budget
+            fingerprints = stats["fingerprints"]
+            for sql, count in metrics.duplicates.items():
+                if sql in fingerprints or len(fingerprints) < MAX_FINGERPRINTS_PER_ROUTE:
+                    fingerprints[sql] += count - 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "routes": {
+                    route: {**stats, "fingerprints": dict(stats["fingerprints"])}
+                    for route, stats in self._routes.items()
+                },
+            }
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, labels, bounds, counts, total, count):
+            for bound, value in zip(bounds, counts):
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {value}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        routes = snapshot["routes"]
+        family("http_requests_total", "counter", "Requests by route, method and status.")
+        for (route, method, status), count in sorted(snapshot["requests"].items()):
+            lines.append(
+                f"http_requests_total{_labels({'route': route, 'method': method, 'status': status})} {count}"
+            )
+        family("http_request_duration_seconds", "histogram", "Request latency by route.")
+        for route, stats in sorted(routes.items()):
+            histogram("http_request_duration_seconds", {"route": route}, self.LATENCY_BUCKETS,
+                      stats["latency"], stats["latency_sum"], stats["count"])
+        family("http_request_queries", "histogram", "SQL queries per request by route.")
+        for route, stats in sorted(routes.items()):
+            histogram("http_request_queries", {"route": route}, self.QUERY_BUCKETS,
+                      stats["queries"], stats["queries_sum"], stats["count"])
+        for name, key, help_text in (
+            ("http_request_db_seconds_total", "db_seconds", "Time spent in SQL queries."),
+            ("http_request_password_hash_seconds_total", "hash_seconds",
+             "Time spent verifying passwords."),
+            ("http_request_duplicate_queries_total", "duplicate_queries",
+             "Queries repeating a query shape already run by the same request."),
+            ("http_request_over_budget_total", "over_budget",
+             "Requests over the query or latency budget their view declares."),
+        ):
+            family(name, "counter", help_text)
+            for route, stats in sorted(routes.items()):
+                lines.append(f"{name}{_labels({'route': route})} {stats[key]}")
+        family("http_request_duplicate_query_fingerprint_total", "counter",
+               "Duplicate queries by route and query shape.")
+        for route, stats in sorted(routes.items()):
+            for sql, count in sorted(stats["fingerprints"].items()):
+                labels = _labels({"route": route, "fingerprint": sql})
+                lines.append(f"http_request_duplicate_query_fingerprint_total{labels} {count}")
+
+        from users.hashers import verification_stats
+
+        family("password_hash_verify_seconds", "histogram", "Password verification time.")
+        for algorithm, stats in sorted(verification_stats.snapshot().items()):
+            buckets = stats["buckets"]
+            histogram("password_hash_verify_seconds", {"algorithm": algorithm}, list(buckets),
+                      list(buckets.values()), stats["sum"], stats["count"])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = {**labels, **extra}
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + "}"
+
+
+request_metrics = MetricsRegistry()
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires ``Authorization: Bearer
+    <METRICS_TOKEN>``; without a token configured it only answers in DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not constant_time_compare(supplied, token):
+            raise Http404
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(request_metrics.render(),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,110 @@
+"""
+Project-wide middleware.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .routers import _pinned
+
+PIN_COOKIE = "db_pinned"
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class ReadYourWritesMiddleware:
+    """
+    Keep a client on the primary database right after it writes.
+
+    Unsafe requests, and requests that carry the pin cookie set by a
+    successful one, read from the primary. The cookie lives for
+    ``DATABASE_REPLICA_LAG`` seconds, long enough for the replicas to catch
+    up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._pin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._set_cookie(request, response)
+
+    async def __acall__(self, request):
+        # The async handler copies the context into the threads that run sync
+        # code, so the pin reaches them too.
+        token = self._pin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._set_cookie(request, response)
+
+    def _pin(self, request):
+        return _pinned.set(request.method in UNSAFE_METHODS or PIN_COOKIE in request.COOKIES)
+
+    def _set_cookie(self, request, response):
+        if (request.method in UNSAFE_METHODS and response.status_code < 400
+                and settings.DATABASE_REPLICA_LAG):
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.DATABASE_REPLICA_LAG, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+class InstrumentationMiddleware:
+    """
+    Record each request's queries, database time, password-hash time and
+    latency under its URL route in ``core.metrics.request_metrics``.
+
+    Goes first in MIDDLEWARE so the latency covers the whole stack. The
+    request's RequestMetrics is left on ``request.metrics`` for
+    ``core.testing.assert_within_budget``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Connections opened before core.metrics was imported missed the
+        # connection_created signal.
+        for alias in connections:
+            metrics.install(connections[alias])
+        with metrics.collect() as request.metrics:
+            response = self.get_response(request)
+        return self._observe(request, response)
+
+    async def __acall__(self, request):
+        with metrics.collect() as request.metrics:
+            response = await self.get_response(request)
+        return self._observe(request, response)
+
+    def _observe(self, request, response):
+        match = getattr(request, "resolver_match", None)
+        declared = metrics.view_budget(match.func) if match else None
+        metrics.request_metrics.observe(
+            match.route if match else metrics.UNMATCHED_ROUTE,
+            request.method,
+            response.status_code,
+            request.metrics,
+            over_budget=bool(declared and declared.violations(request.metrics)),
+        )
+        return response
+
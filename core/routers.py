@@ -0,0 +1,64 @@
+"""
+Primary/replica database routing.
+
+Reads of the ``REPLICA_APPS`` models (the exam catalog and scoreboards) go to
+a random replica from ``DATABASES``; everything else, and every write, uses
+the primary. A request that wrote something, or whose client wrote within
+the last ``DATABASE_REPLICA_LAG`` seconds, is pinned to the primary so the
+user always reads their own writes (see ``core.middleware``).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_APPS = {"writing"}
+
+_pinned = ContextVar("db_pinned_to_primary", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def pin_to_primary():
+    """Send the rest of the current request/task's reads to the primary."""
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+@contextmanager
+def primary():
+    """Temporarily read from the primary, e.g. right after a write."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICA_APPS or is_pinned():
+            return DEFAULT_DB_ALIAS
+        # Inside a transaction on the primary, reads must see its writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -41,9 +41,16 @@ INSTALLED_APPS = [
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users_auth.authentication.StatelessJWTAuthentication',
     ),
+    # Number of reverse proxies in front of the app. Unset, client IPs (as
+    # used by the login throttle) are REMOTE_ADDR and X-Forwarded-For is
+    # ignored; set it when deployed behind proxies that append to that header.
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=None),
 }
+# How often each process reloads the suspended-user set used by the
+# stateless JWT authentication.
+SUSPENDED_USERS_REFRESH_SECONDS = env.int('SUSPENDED_USERS_REFRESH_SECONDS', default=30)
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -53,7 +60,20 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Refresh-token revocation (users_auth.revocation.revoked_tokens)
+REVOKED_TOKENS = {
+    'REFRESH_SECONDS': 5,        # pull revocations made by other processes
+    'PULL_OVERLAP': 1000,        # ids re-read under the highest seen, for late commits
+    'REBUILD_SECONDS': 3600,     # rebuild the Bloom filter without purged rows
+    'BLOOM_CAPACITY': 100_000,
+    'BLOOM_ERROR_RATE': 0.001,
+    'PURGE_BATCH_SIZE': 5000,
+}
+
+# Stock paths, which "check --deploy" looks for. Under ASGI each of them runs
+# its hooks through sync_to_async in the request's own thread.
 MIDDLEWARE = [
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,9 +81,11 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
 ]
 
-ROOT_URLCONF = 'core.urls'
+# core/asgi.py defaults this to core.asgi_urls, which adds the async views.
+ROOT_URLCONF = env('ROOT_URLCONF', default='core.urls')
 
 TEMPLATES = [
     {
@@ -83,12 +105,51 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Threads that async views hand blocking work to (core/executors.py), such as
+# password hashing; more concurrent logins than this wait their turn.
+ASYNC_BLOCKING_WORKERS = env.int('ASYNC_BLOCKING_WORKERS', default=os.cpu_count() or 4)
+
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': env('DB_ENGINE', default='django.db.backends.sqlite3'),
-        'NAME': BASE_DIR / env('DB_NAME', default='db.sqlite3'),
-    }
+# DATABASE_URL / DATABASE_REPLICA_URLS and the connection options are
+# documented in core/database.py.
+from core.database import database_settings
+
+DATABASES = database_settings(env, BASE_DIR)
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Seconds a client keeps reading from the primary after it wrote.
+DATABASE_REPLICA_LAG = env.int('DATABASE_REPLICA_LAG', default=5)
+
+# Caches
+# Use e.g. THROTTLE_CACHE_URL=redis://127.0.0.1:6379/1 to share login
+# throttling state between workers; local memory is per process.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://default'),
+    'throttle': env.cache_url('THROTTLE_CACHE_URL', default='locmemcache://throttle'),
+}
+
+# Seconds a serialized writing exam stays in the catalog cache; saves and
+# deletes of exams or tasks invalidate it earlier.
+WRITING_CATALOG_CACHE_TIMEOUT = env.int('WRITING_CATALOG_CACHE_TIMEOUT', default=3600)
+# Seconds a candidate's results dashboard stays cached; new evaluations and
+# submissions invalidate it earlier.
+WRITING_RESULTS_CACHE_TIMEOUT = env.int('WRITING_RESULTS_CACHE_TIMEOUT', default=3600)
+# Seconds a ranking (writing/rankings.py) stays cached; band changes in its
+# exam or tag invalidate it earlier.
+WRITING_RANKINGS_CACHE_TIMEOUT = env.int('WRITING_RANKINGS_CACHE_TIMEOUT', default=3600)
+# Seconds a user's profile payload (users/profiles.py) stays cached; saving
+# or deleting the user invalidates it earlier.
+USER_PROFILE_CACHE_TIMEOUT = env.int('USER_PROFILE_CACHE_TIMEOUT', default=3600)
+
+# Login throttling: token buckets of CAPACITY requests refilled at
+# CAPACITY per PERIOD seconds, per client IP and per email.
+LOGIN_THROTTLE = {
+    'CACHE': 'throttle',
+    'IP_CAPACITY': env.int('LOGIN_THROTTLE_IP_CAPACITY', default=30),
+    'IP_PERIOD': 60,
+    'EMAIL_CAPACITY': env.int('LOGIN_THROTTLE_EMAIL_CAPACITY', default=10),
+    'EMAIL_PERIOD': 300,
+    # How long an email with no account is answered from the cache.
+    'UNKNOWN_EMAIL_TTL': 300,
 }
 
 # Password validation
@@ -99,6 +160,25 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing policy
+# New passwords use PASSWORD_HASHER; older hashes (other algorithms or costs)
+# are verified as before and transparently re-hashed on successful login.
+PASSWORD_HASHER = env("PASSWORD_HASHER", default="scrypt")
+PASSWORD_SCRYPT_WORK_FACTOR = env.int("PASSWORD_SCRYPT_WORK_FACTOR", default=2**14)
+PASSWORD_SCRYPT_BLOCK_SIZE = env.int("PASSWORD_SCRYPT_BLOCK_SIZE", default=8)
+PASSWORD_SCRYPT_PARALLELISM = env.int("PASSWORD_SCRYPT_PARALLELISM", default=1)
+PASSWORD_PBKDF2_ITERATIONS = env.int("PASSWORD_PBKDF2_ITERATIONS", default=1_000_000)
+
+_PASSWORD_HASHER_CHOICES = {
+    "scrypt": "users.hashers.ScryptPasswordHasher",
+    "pbkdf2": "users.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHER_CHOICES.pop(PASSWORD_HASHER),
+    *_PASSWORD_HASHER_CHOICES.values(),
+    "users.hashers.PBKDF2SHA1PasswordHasher",
+]
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -115,6 +195,48 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': env("CLOUDINARY_API_SECRET")
 }
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+
+# URL/metadata cache of the media storages (temp/storage.py). ALIAS names a
+# shared Django cache (e.g. one backed by Redis); without it every process
+# keeps its own copy for at most TTL seconds.
+MEDIA_STORAGE_CACHE = {
+    'ALIAS': env('MEDIA_STORAGE_CACHE_ALIAS', default=None),
+    'TTL': env.int('MEDIA_STORAGE_CACHE_TTL', default=24 * 3600),
+    'MAX_ENTRIES': 10_000,
+}
+
+# Resized copies of writing task images (writing/derivatives.py), made by
+# WORKERS threads after an image task is saved. WORKERS 0 makes them inline.
+IMAGE_DERIVATIVES = {
+    'WIDTHS': [320, 640, 1024],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'WORKERS': env.int('IMAGE_DERIVATIVE_WORKERS', default=2),
+}
+
+# Background media uploads (temp/uploads.py). Requests stage the file in
+# STAGING_DIR and WORKERS threads push it to BACKEND in CHUNK_SIZE pieces
+# (Cloudinary needs at least 5 MB). WORKERS 0 uploads inline.
+MEDIA_UPLOADS = {
+    'BACKEND': env('MEDIA_UPLOAD_BACKEND', default='temp.uploads.CloudinaryBackend'),
+    'STAGING_DIR': env('MEDIA_STAGING_DIR', default=str(BASE_DIR / 'media_staging')),
+    'LOCAL_ROOT': env('MEDIA_LOCAL_ROOT', default=str(BASE_DIR / 'media')),  # LocalFileSystemBackend
+    'WORKERS': env.int('MEDIA_UPLOAD_WORKERS', default=2),
+    'CHUNK_SIZE': 6 * 1024 * 1024,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 1.0,        # seconds, doubled after every failed attempt
+}
+# Bulk user enrollment (users/enrollment.py). Roster passwords are hashed
+# on a pool of HASH_WORKERS processes; 0 hashes them inline.
+USER_ENROLLMENT = {
+    'HASH_WORKERS': env.int('ENROLLMENT_HASH_WORKERS', default=os.cpu_count() or 4),
+    'CHUNK_SIZE': 1000,
+}
+
+# Per-route request metrics (core/metrics.py), scraped from /metrics with
+# "Authorization: Bearer METRICS_TOKEN". Without a token only DEBUG serves it.
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
 AUTH_USER_MODEL= "users.CustomUser"
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,79 @@
+"""
+Test helpers shared by the apps' test suites.
+"""
+import re
+
+from django.db import connections
+
+from .metrics import Budget, view_budget
+
+
+class FullScanError(AssertionError):
+    pass
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+def _sqlite_full_scans(plan):
+    # "SCAN <table>" without an index is a full table scan; "SEARCH" and
+    # "SCAN <table> USING [COVERING] INDEX" are not.
+    return [
+        line.strip()
+        for line in plan.splitlines()
+        if re.search(r"\bSCAN\b", line) and "USING" not in line and "CONSTANT ROW" not in line
+    ]
+
+
+def _postgres_full_scans(plan):
+    return [line.strip() for line in plan.splitlines() if "Seq Scan" in line]
+
+
+def assert_no_full_scan(queryset):
+    """
+    Fail if the database plans ``queryset`` with a full table scan.
+
+    On PostgreSQL sequential scans are disabled for the EXPLAIN so the check
+    is about whether a usable index exists, not what the planner prefers
+    for a tiny test table.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        try:
+            scans = _postgres_full_scans(queryset.explain())
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+    elif connection.vendor == "sqlite":
+        scans = _sqlite_full_scans(queryset.explain())
+    else:
+        return
+    if scans:
+        raise FullScanError(f"Full table scan in query plan: {scans}\n{queryset.query}")
+
+
+def assert_within_budget(response, budget=None, **limits):
+    """
+    Fail if the request behind a test client ``response`` went over a
+    budget: ``budget``, a Budget from ``limits``, or the one its view
+    declares with ``core.metrics.budget``.
+
+    Needs core.middleware.InstrumentationMiddleware, which measured it.
+    """
+    request = getattr(response, "wsgi_request", None) or response.asgi_request
+    if budget is None:
+        budget = Budget(**limits) if limits else view_budget(request.resolver_match.func)
+    if budget is None:
+        raise AssertionError(f"No budget declared for {request.resolver_match.route}")
+    violations = budget.violations(request.metrics)
+    if violations:
+        repeated = "".join(
+            f"\n  {count}x {sql}" for sql, count in request.metrics.duplicates.items()
+        )
+        raise BudgetExceeded(
+            f"{request.method} {request.path} over budget: {', '.join(violations)}{repeated}"
+        )
+    return request.metrics
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import environ
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+from writing.models import WritingExamModel
+from .database import database_settings, parse_database_url, sqlite_options
+from .metrics import collect, fingerprint, request_metrics
+from .middleware import PIN_COOKIE, ReadYourWritesMiddleware
+from .routers import PrimaryReplicaRouter, is_pinned, primary
+from .testing import BudgetExceeded, assert_within_budget
+
+BASE_DIR = Path("/srv/ielts")
+
+
+def settings_from(**environment):
+    with mock.patch.dict(os.environ, environment, clear=True):
+        return database_settings(environ.Env(), BASE_DIR)
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_legacy_sqlite_settings(self):
+        databases = settings_from(DB_NAME="dev.sqlite3")
+        self.assertEqual(databases["default"]["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(databases["default"]["NAME"], BASE_DIR / "dev.sqlite3")
+        self.assertEqual(databases["default"]["CONN_MAX_AGE"], 60)
+        self.assertTrue(databases["default"]["CONN_HEALTH_CHECKS"])
+
+    def test_legacy_non_sqlite_name_is_not_a_path(self):
+        databases = settings_from(DB_ENGINE="django.db.backends.postgresql", DB_NAME="ielts")
+        self.assertEqual(databases["default"]["NAME"], "ielts")
+
+    def test_postgres_url(self):
+        databases = settings_from(
+            DATABASE_URL="postgres://app:secret@db:5432/ielts?sslmode=require",
+            DB_CONN_MAX_AGE="300",
+        )
+        default = databases["default"]
+        self.assertEqual(default["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((default["NAME"], default["USER"], default["HOST"]), ("ielts", "app", "db"))
+        self.assertEqual(default["OPTIONS"], {"sslmode": "require"})
+        self.assertEqual(default["CONN_MAX_AGE"], 300)
+
+    def test_pgbouncer_disables_server_side_cursors(self):
+        config = parse_database_url("postgres://app@bouncer:6432/ielts", pool="pgbouncer")
+        self.assertTrue(config["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_psycopg_pool_replaces_persistent_connections(self):
+        config = parse_database_url("postgres://app@db/ielts", conn_max_age=60, pool="psycopg")
+        self.assertTrue(config["OPTIONS"]["pool"])
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+
+    def test_pool_mode_is_ignored_for_sqlite(self):
+        config = parse_database_url("sqlite:////tmp/ielts.sqlite3", pool="psycopg")
+        self.assertNotIn("pool", config.get("OPTIONS", {}))
+
+    def test_unknown_pool_mode(self):
+        with self.assertRaises(ValueError):
+            parse_database_url("postgres://app@db/ielts", pool="pgpool")
+
+    def test_sqlite_tuning_is_opt_in(self):
+        self.assertNotIn("OPTIONS", settings_from()["default"])
+        databases = settings_from(DB_SQLITE_TUNING="1", DB_SQLITE_BUSY_TIMEOUT="30")
+        options = databases["default"]["OPTIONS"]
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        self.assertEqual(options["timeout"], 30)
+        self.assertIn("PRAGMA journal_mode=WAL", options["init_command"])
+
+    def test_sqlite_tuning_pragmas_apply(self):
+        options = sqlite_options()
+        with tempfile.TemporaryDirectory() as directory:
+            conn = sqlite3.connect(os.path.join(directory, "tuned.sqlite3"))
+            try:
+                for pragma in options["init_command"].split(";"):
+                    conn.execute(pragma)
+                self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+                # 1 = NORMAL
+                self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+            finally:
+                conn.close()
+
+    def test_replicas_mirror_the_primary_in_tests(self):
+        databases = settings_from(
+            DATABASE_URL="postgres://app@primary/ielts",
+            DATABASE_REPLICA_URLS="postgres://app@replica-a/ielts, postgres://app@replica-b/ielts",
+        )
+        self.assertEqual(list(databases), ["default", "replica1", "replica2"])
+        self.assertEqual(databases["replica2"]["HOST"], "replica-b")
+        self.assertEqual(databases["replica1"]["TEST"], {"MIRROR": "default"})
+
+
+@mock.patch("core.routers.replica_aliases", return_value=["replica1"])
+class PrimaryReplicaRouterTests(TestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_catalog_reads_go_to_a_replica(self, _):
+        with mock.patch("core.routers._pinned") as pinned:
+            pinned.get.return_value = False
+            # TestCase wraps each test in a transaction; routing outside one
+            # is what a request sees.
+            with mock.patch("core.routers.connections") as connections:
+                connections.__getitem__.return_value.in_atomic_block = False
+                self.assertEqual(self.router.db_for_read(WritingExamModel), "replica1")
+
+    def test_other_apps_read_from_the_primary(self, _):
+        self.assertEqual(self.router.db_for_read(CustomUser), "default")
+
+    def test_reads_inside_a_transaction_use_the_primary(self, _):
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(WritingExamModel), "default")
+
+    def test_writes_pin_reads_to_the_primary(self, _):
+        with primary(), mock.patch("core.routers.connections") as connections:
+            connections.__getitem__.return_value.in_atomic_block = False
+            self.assertEqual(self.router.db_for_write(WritingExamModel), "default")
+            self.assertTrue(is_pinned())
+            self.assertEqual(self.router.db_for_read(WritingExamModel), "default")
+
+    def test_migrations_only_run_on_the_primary(self, _):
+        self.assertTrue(self.router.allow_migrate("default", "writing"))
+        self.assertFalse(self.router.allow_migrate("replica1", "writing"))
+
+
+class ReadYourWritesMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.seen = []
+
+        def view(request):
+            self.seen.append(is_pinned())
+            return HttpResponse()
+
+        self.middleware = ReadYourWritesMiddleware(view)
+        self.factory = RequestFactory()
+
+    def test_write_pins_the_client(self):
+        response = self.middleware(self.factory.post("/"))
+        self.assertEqual(self.seen, [True])
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+    def test_pinned_client_reads_from_the_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        self.middleware(request)
+        self.middleware(self.factory.get("/"))
+        self.assertEqual(self.seen, [True, False])
+
+    async def test_async_chain(self):
+        async def view(request):
+            self.seen.append(is_pinned())
+            return HttpResponse()
+
+        before = is_pinned()
+        response = await ReadYourWritesMiddleware(view)(self.factory.post("/"))
+        self.assertEqual(self.seen, [True])
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(is_pinned(), before)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        request_metrics.reset()
+        self.user = CustomUser.objects.create_user(email="metrics@example.com", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fingerprint_collapses_literals_and_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a''b' LIMIT 21"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'c' LIMIT 5"),
+        )
+
+    def test_repeated_query_shapes_are_duplicates(self):
+        with collect() as metrics:
+            for email in ("a@example.com", "b@example.com", "c@example.com"):
+                CustomUser.objects.filter(email=email).exists()
+            WritingExamModel.objects.count()
+        self.assertEqual(metrics.queries, 4)
+        self.assertEqual(metrics.duplicate_queries, 2)
+        [(sql, count)] = metrics.duplicates.items()
+        self.assertEqual(count, 3)
+        self.assertIn("users_customuser", sql)
+
+    @override_settings(
+        PASSWORD_HASHERS=["users.hashers.PBKDF2PasswordHasher"], PASSWORD_PBKDF2_ITERATIONS=1000
+    )
+    def test_password_verification_time(self):
+        encoded = make_password("pass")
+        with collect() as metrics:
+            self.assertTrue(check_password("pass", encoded))
+        self.assertGreater(metrics.hash_seconds, 0)
+
+    def test_requests_are_recorded_by_route(self):
+        self.client.get(reverse("my-results"))
+        self.client.get(reverse("my-results"))
+        self.client.get("/nowhere/")
+        snapshot = request_metrics.snapshot()
+        self.assertEqual(snapshot["requests"][("api/v1/writing/me/results/", "GET", 200)], 2)
+        self.assertEqual(snapshot["requests"][("<unmatched>", "GET", 404)], 1)
+        route = snapshot["routes"]["api/v1/writing/me/results/"]
+        # the results query, then a cache hit
+        self.assertEqual(route["queries_sum"], 1)
+        self.assertEqual(route["over_budget"], 0)
+
+    @override_settings(METRICS_TOKEN="scrape")
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse("my-results"))
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scrape")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'http_requests_total{route="api/v1/writing/me/results/",method="GET",status="200"} 1',
+            body,
+        )
+        self.assertIn('http_request_queries_bucket{route="api/v1/writing/me/results/",le="1"} 1',
+                      body)
+
+    def test_budget_assertion(self):
+        response = self.client.get(reverse("my-results"))
+        metrics = assert_within_budget(response)
+        self.assertEqual(metrics.queries, 1)
+        with self.assertRaisesMessage(BudgetExceeded, "1 queries > 0"):
+            assert_within_budget(response, queries=0)
@@ -19,9 +19,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path("api/v1/users/", include('users.urls')),
     path("api/v1/users_auth/", include('users_auth.urls')),
+    path("api/v1/writing/", include('writing.urls')),
+    path("api/v1/media/", include('temp.urls')),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 # Serve media files during development
@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import MediaFile, AudioFile
+from .models import MediaFile, AudioFile, UploadJob
 
 admin.site.register(MediaFile)
 admin.site.register(AudioFile)
+
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "filename", "content_type", "object_id", "status", "offset", "size", "updated_at")
+    list_filter = ("status",)
+    list_select_related = ("content_type",)
+    show_full_result_count = False
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from temp.models import UPLOAD_READY, UploadJob
+from temp.uploads import resume_uploads
+
+
+class Command(BaseCommand):
+    help = "Finish background media uploads interrupted by a restart or left failed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--failed", action="store_true", help="Retry failed uploads too.")
+        parser.add_argument(
+            "--stale-minutes", type=int, default=15,
+            help="Treat uploads without progress for this long as interrupted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale_minutes"] < 0:
+            raise CommandError("--stale-minutes cannot be negative.")
+        job_ids = resume_uploads(
+            failed=options["failed"],
+            stale_after=timedelta(minutes=options["stale_minutes"]),
+            inline=True,
+        )
+        done = UploadJob.objects.filter(pk__in=job_ids, status=UPLOAD_READY).count()
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Resumed {len(job_ids)} upload(s), {done} finished."
+            ))
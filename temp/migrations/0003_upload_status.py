@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('temp', '0002_alter_mediafile_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiofile',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field_name', models.CharField(max_length=50)),
+                ('filename', models.CharField(max_length=255)),
+                ('staged_path', models.CharField(max_length=500)),
+                ('size', models.PositiveBigIntegerField()),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('state', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='temp_upload_status_idx')],
+            },
+        ),
+    ]
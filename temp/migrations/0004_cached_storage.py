@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:52
+
+import temp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('temp', '0003_upload_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audiofile',
+            name='audio',
+            field=models.FileField(storage=temp.storage.CachedVideoMediaCloudinaryStorage(), upload_to='ielts_audio/'),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='file',
+            field=models.FileField(storage=temp.storage.CachedMediaCloudinaryStorage(), upload_to='images/'),
+        ),
+    ]
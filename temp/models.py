@@ -1,23 +1,80 @@
 from django.db import models
 
 # Create your models here.
-from cloudinary_storage.storage import MediaCloudinaryStorage
+from django.contrib.contenttypes.models import ContentType
 
-class MediaFile(models.Model):
+from .storage import CachedMediaCloudinaryStorage, CachedVideoMediaCloudinaryStorage
+
+
+# ------------------------------
+# Staged uploads
+# ------------------------------
+UPLOAD_PENDING = "pending"
+UPLOAD_UPLOADING = "uploading"
+UPLOAD_READY = "ready"
+UPLOAD_FAILED = "failed"
+
+UPLOAD_STATUS_CHOICES = [
+    (UPLOAD_PENDING, "Pending"),
+    (UPLOAD_UPLOADING, "Uploading"),
+    (UPLOAD_READY, "Ready"),
+    (UPLOAD_FAILED, "Failed"),
+]
+
+
+class UploadStatusMixin(models.Model):
+    """Upload state of a model whose file is pushed to storage in the background"""
+    upload_status = models.CharField(
+        max_length=10, choices=UPLOAD_STATUS_CHOICES, default=UPLOAD_READY
+    )
+
+    class Meta:
+        abstract = True
+
+
+class UploadJob(models.Model):
+    """
+    One staged file on its way to the storage backend.
+
+    ``offset`` and ``state`` (the backend's session, e.g. a Cloudinary upload
+    id) are saved after every chunk, so an interrupted upload resumes where
+    it stopped.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    field_name = models.CharField(max_length=50)
+    filename = models.CharField(max_length=255)
+    staged_path = models.CharField(max_length=500)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    state = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=UPLOAD_STATUS_CHOICES, default=UPLOAD_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"], name="temp_upload_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.status}) ({self.id})"
+
+
+class MediaFile(UploadStatusMixin):
     title = models.CharField(max_length=100)
     file = models.FileField(
-        storage=MediaCloudinaryStorage(),  # forces Cloudinary storage
+        storage=CachedMediaCloudinaryStorage(),  # forces Cloudinary storage
         upload_to='images/'  # Cloudinary folder
     )
 
 
-from django.db import models
-from cloudinary_storage.storage import VideoMediaCloudinaryStorage
-
-class AudioFile(models.Model):
+class AudioFile(UploadStatusMixin):
     title = models.CharField(max_length=100)
     audio = models.FileField(
-        storage=VideoMediaCloudinaryStorage(),  # for audio files
+        storage=CachedVideoMediaCloudinaryStorage(),  # for audio files
         upload_to='ielts_audio/'
     )
 
@@ -0,0 +1,206 @@
+"""
+Cloudinary storages that memoize URLs and file metadata.
+
+``url()`` is rebuilt on every serialization of a file field and ``exists()``,
+``size()`` and ``metadata()`` each cost a request to Cloudinary. The cached
+storages keep the results in a per-process TTL/LRU cache and, when
+``MEDIA_STORAGE_CACHE["ALIAS"]`` names a Django cache, in that shared cache
+too. Saving or deleting a file through the storage (or finishing a background
+upload) invalidates its entries; other processes only see that through the
+shared cache, so without one their copies live at most ``TTL`` seconds.
+"""
+import mimetypes
+import threading
+import time
+from collections import OrderedDict
+
+from cloudinary_storage.storage import MediaCloudinaryStorage, VideoMediaCloudinaryStorage
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.deconstruct import deconstructible
+
+MISSING = object()
+
+
+def _config():
+    return settings.MEDIA_STORAGE_CACHE
+
+
+class StorageCacheStats:
+    """Per-process hit/miss counters of the storage cache, by kind of lookup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def observe(self, kind, hit):
+        with self._lock:
+            stats = self._stats.setdefault(kind, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {kind: dict(stats) for kind, stats in self._stats.items()}
+
+
+storage_cache_stats = StorageCacheStats()
+
+
+class LRUCache:
+    """Thread-safe in-memory cache bounded by entry count and age"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def local_cache():
+    global _local_cache
+    with _local_cache_lock:
+        if _local_cache is None:
+            config = _config()
+            _local_cache = LRUCache(config["MAX_ENTRIES"], config["TTL"])
+        return _local_cache
+
+
+def clear_storage_cache():
+    """Drop this process's entries, e.g. between tests."""
+    local_cache().clear()
+
+
+class CachedStorageMixin:
+    """Memoizes ``url``, ``exists``, ``size`` and ``metadata`` by file name"""
+
+    KINDS = ("url", "exists", "meta")
+
+    def _cache_key(self, kind, name):
+        return f"media-storage:{type(self).__name__}:{kind}:{name}"
+
+    def _cached(self, kind, name, compute):
+        key = self._cache_key(kind, name)
+        local = local_cache()
+        value = local.get(key, MISSING)
+        if value is MISSING and _config()["ALIAS"]:
+            value = caches[_config()["ALIAS"]].get(key, MISSING)
+            if value is not MISSING:
+                local.set(key, value)
+        storage_cache_stats.observe(kind, value is not MISSING)
+        if value is MISSING:
+            value = compute()
+            local.set(key, value)
+            if _config()["ALIAS"]:
+                caches[_config()["ALIAS"]].set(key, value, _config()["TTL"])
+        return value
+
+    def invalidate(self, name):
+        keys = [self._cache_key(kind, name) for kind in self.KINDS]
+        for key in keys:
+            local_cache().delete(key)
+        if _config()["ALIAS"]:
+            caches[_config()["ALIAS"]].delete_many(keys)
+
+    def url(self, name):
+        return self._cached("url", name, lambda: super(CachedStorageMixin, self).url(name))
+
+    def exists(self, name):
+        return self._cached("exists", name, lambda: super(CachedStorageMixin, self).exists(name))
+
+    def size(self, name):
+        return self.metadata(name)["size"]
+
+    def metadata(self, name):
+        """``{"size", "content_type", "width", "height"}`` of a stored file"""
+        return self._cached("meta", name, lambda: self._fetch_metadata(name))
+
+    def _fetch_metadata(self, name):
+        return {
+            "size": super().size(name),
+            "content_type": mimetypes.guess_type(name)[0],
+            "width": None,
+            "height": None,
+        }
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.invalidate(name)
+        return name
+
+    def delete(self, name):
+        try:
+            return super().delete(name)
+        finally:
+            self.invalidate(name)
+
+
+class CloudinaryMetadataMixin:
+    """Reads size, format and dimensions with one Admin API call"""
+
+    def _fetch_metadata(self, name):
+        import cloudinary.api
+
+        try:
+            resource = cloudinary.api.resource(
+                self._prepend_prefix(name), resource_type=self._get_resource_type(name)
+            )
+        except cloudinary.api.NotFound:
+            return {"size": None, "content_type": mimetypes.guess_type(name)[0],
+                    "width": None, "height": None}
+        fmt = resource.get("format")
+        return {
+            "size": resource.get("bytes"),
+            "content_type": mimetypes.guess_type(f"{name}.{fmt}" if fmt else name)[0],
+            "width": resource.get("width"),
+            "height": resource.get("height"),
+        }
+
+
+@deconstructible
+class CachedMediaCloudinaryStorage(CloudinaryMetadataMixin, CachedStorageMixin, MediaCloudinaryStorage):
+    pass
+
+
+@deconstructible
+class CachedVideoMediaCloudinaryStorage(
+    CloudinaryMetadataMixin, CachedStorageMixin, VideoMediaCloudinaryStorage
+):
+    pass
@@ -0,0 +1,180 @@
+"""
+Byte-range file streaming for locally stored media.
+
+``stream_file`` answers GET/HEAD requests for a file on disk with a 200, a
+206 for a single ``Range`` (``If-Range`` honoured), a 416 for an
+unsatisfiable one or a 304 for a matching conditional request. The body is a
+``FileResponse`` over ``RangeFile``, so servers with ``wsgi.file_wrapper``
+(gunicorn, uWSGI) send it with ``sendfile()``; elsewhere it is read in
+``block_size`` chunks and never loaded whole.
+"""
+import os
+import re
+import threading
+import time
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+BLOCK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class StreamStats:
+    """Per-process counters of streamed responses and the chunks they sent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._responses = {}
+            self.active = 0
+            self.chunks = 0
+            self.bytes = 0
+            self.seconds = 0.0
+
+    def response(self, status):
+        with self._lock:
+            self._responses[status] = self._responses.get(status, 0) + 1
+
+    def opened(self):
+        with self._lock:
+            self.active += 1
+
+    def chunk(self, size):
+        with self._lock:
+            self.chunks += 1
+            self.bytes += size
+
+    def closed(self, seconds, sendfile_bytes=0):
+        with self._lock:
+            self.active -= 1
+            self.bytes += sendfile_bytes
+            self.seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "responses": dict(self._responses),
+                "active": self.active,
+                "chunks": self.chunks,
+                "bytes": self.bytes,
+                "seconds": self.seconds,
+                "bytes_per_second": self.bytes / self.seconds if self.seconds else 0.0,
+            }
+
+
+stream_stats = StreamStats()
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of a file starting at ``start``.
+
+    It exposes ``fileno()`` so a WSGI server can ``sendfile()`` from the
+    current offset; the server stops at the Content-Length.
+    """
+
+    def __init__(self, path, start, length):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = length
+        self._length = length
+        self._started = time.perf_counter()
+        self._sendfile = False
+        stream_stats.opened()
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size) if size else b""
+        self._remaining -= len(data)
+        if data:
+            stream_stats.chunk(len(data))
+        return data
+
+    def fileno(self):
+        self._sendfile = True
+        return self._file.fileno()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        # sendfile() bypasses read(); count the bytes it was asked to send.
+        unread = self._remaining if self._sendfile and self._remaining == self._length else 0
+        stream_stats.closed(time.perf_counter() - self._started, sendfile_bytes=unread)
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single-range ``Range`` header, None to
+    serve the whole file (no header, several ranges or a malformed one) or
+    ``False`` when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # "bytes=-N": the last N bytes
+        length = int(last)
+        if not length or not size:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get("If-Range")
+    if not value:
+        return True
+    if value.startswith(('"', "W/")):
+        # Only a strong validator may match.
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def stream_file(request, path, content_type):
+    """Serve ``path`` honouring Range and conditional request headers."""
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{size:x}")
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        stream_stats.response(conditional.status_code)
+        return conditional
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.headers.get("Range"), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    else:
+        start, end = byte_range or (0, size - 1)
+        length = max(0, end - start + 1)
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=content_type)
+        else:
+            response = FileResponse(RangeFile(path, start, length), content_type=content_type)
+            response.block_size = BLOCK_SIZE
+        response["Content-Length"] = length
+        if byte_range:
+            response.status_code = 206
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    stream_stats.response(response.status_code)
+    return response
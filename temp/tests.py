@@ -1,3 +1,460 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+from writing.models import WritingExamModel, WritingTaskImageVariant, WritingTaskModel
+from writing.serializers import WritingTaskSerializer
+from .models import (
+    UPLOAD_FAILED,
+    UPLOAD_PENDING,
+    UPLOAD_READY,
+    UPLOAD_UPLOADING,
+    AudioFile,
+    MediaFile,
+    UploadJob,
+)
+from .storage import (
+    CachedMediaCloudinaryStorage,
+    CachedStorageMixin,
+    clear_storage_cache,
+    local_cache,
+    storage_cache_stats,
+)
+from .streaming import RangeFile, parse_range, stream_stats
+from .uploads import LocalFileSystemBackend, process_upload, resume_uploads, stage_upload
+
+AUDIO = b"ID3" + bytes(range(256)) * 40  # 10243 bytes
+
+
+class FlakyBackend(LocalFileSystemBackend):
+    """Fails the first ``failures`` chunk sends after ``after`` good ones"""
+    failures = 0
+    after = 0
+    sent = 0
+
+    def send_chunk(self, state, data, offset, size):
+        cls = type(self)
+        if cls.sent >= cls.after and cls.failures:
+            cls.failures -= 1
+            raise ConnectionError("connection reset")
+        cls.sent += 1
+        return super().send_chunk(state, data, offset, size)
+
+
+class UploadTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.override = override_settings(MEDIA_UPLOADS={
+            **settings.MEDIA_UPLOADS,
+            "BACKEND": "temp.uploads.LocalFileSystemBackend",
+            "STAGING_DIR": os.path.join(self.directory, "staging"),
+            "LOCAL_ROOT": os.path.join(self.directory, "media"),
+            "WORKERS": 0,
+            "CHUNK_SIZE": 4096,
+            "RETRY_BACKOFF": 0,
+        }, IMAGE_DERIVATIVES={**settings.IMAGE_DERIVATIVES, "WORKERS": 0})
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        FlakyBackend.failures = FlakyBackend.after = FlakyBackend.sent = 0
+
+    def stored_bytes(self, name):
+        with open(os.path.join(self.directory, "media", name), "rb") as stored:
+            return stored.read()
+
+
+class UploadPipelineTests(UploadTestMixin, TestCase):
+    def test_staged_file_is_uploaded_in_chunks_after_commit(self):
+        audio = AudioFile.objects.create(title="Listening part 1")
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = stage_upload(audio, "audio", SimpleUploadedFile("part1.mp3", AUDIO))
+        audio.refresh_from_db()
+        self.assertEqual(audio.upload_status, UPLOAD_PENDING)
+        self.assertTrue(os.path.exists(job.staged_path))
+
+        with mock.patch.object(
+            LocalFileSystemBackend, "send_chunk", autospec=True,
+            side_effect=LocalFileSystemBackend.send_chunk,
+        ) as send_chunk:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(send_chunk.call_count, 3)
+
+        job.refresh_from_db()
+        audio.refresh_from_db()
+        self.assertEqual((job.status, job.offset), (UPLOAD_READY, len(AUDIO)))
+        self.assertEqual(audio.upload_status, UPLOAD_READY)
+        self.assertEqual(audio.audio.name, "ielts_audio/part1.mp3")
+        self.assertEqual(self.stored_bytes(audio.audio.name), AUDIO)
+        self.assertFalse(os.path.exists(job.staged_path))
+
+    def test_empty_file(self):
+        media = MediaFile.objects.create(title="Blank")
+        with self.captureOnCommitCallbacks(execute=True):
+            job = stage_upload(media, "file", SimpleUploadedFile("blank.png", b""))
+        job.refresh_from_db()
+        self.assertEqual(job.status, UPLOAD_READY)
+        self.assertEqual(self.stored_bytes("images/blank.png"), b"")
+
+    @override_settings()
+    def test_chunk_errors_are_retried(self):
+        settings.MEDIA_UPLOADS = {**settings.MEDIA_UPLOADS, "BACKEND": "temp.tests.FlakyBackend"}
+        FlakyBackend.failures, FlakyBackend.after = 2, 1
+        audio = AudioFile.objects.create(title="Listening part 2")
+        with self.captureOnCommitCallbacks(execute=True):
+            job = stage_upload(audio, "audio", SimpleUploadedFile("part2.mp3", AUDIO))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (UPLOAD_READY, 2))
+        self.assertEqual(self.stored_bytes(AudioFile.objects.get().audio.name), AUDIO)
+
+    @override_settings()
+    def test_failed_upload_resumes_from_its_offset(self):
+        settings.MEDIA_UPLOADS = {
+            **settings.MEDIA_UPLOADS, "BACKEND": "temp.tests.FlakyBackend", "MAX_ATTEMPTS": 2,
+        }
+        FlakyBackend.failures, FlakyBackend.after = 2, 1
+        audio = AudioFile.objects.create(title="Listening part 3")
+        with self.captureOnCommitCallbacks(execute=True):
+            job = stage_upload(audio, "audio", SimpleUploadedFile("part3.mp3", AUDIO))
+        job.refresh_from_db()
+        audio.refresh_from_db()
+        self.assertEqual((job.status, job.offset), (UPLOAD_FAILED, 4096))
+        self.assertIn("connection reset", job.error)
+        self.assertEqual(audio.upload_status, UPLOAD_FAILED)
+
+        self.assertEqual(resume_uploads(failed=True), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual(job.status, UPLOAD_READY)
+        # Only the two chunks after the saved offset were sent again.
+        self.assertEqual(FlakyBackend.sent, 3)
+        self.assertEqual(self.stored_bytes(AudioFile.objects.get().audio.name), AUDIO)
+
+    def test_interrupted_upload_is_resumed_once_stale(self):
+        audio = AudioFile.objects.create(title="Listening part 4")
+        with self.captureOnCommitCallbacks():
+            job = stage_upload(audio, "audio", SimpleUploadedFile("part4.mp3", AUDIO))
+        UploadJob.objects.filter(pk=job.pk).update(status=UPLOAD_UPLOADING)
+
+        self.assertEqual(resume_uploads(), [])
+        UploadJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(resume_uploads(), [job.pk])
+        job.refresh_from_db()
+        self.assertEqual(job.status, UPLOAD_READY)
+
+    def test_job_is_processed_once(self):
+        media = MediaFile.objects.create(title="Chart")
+        with self.captureOnCommitCallbacks(execute=True):
+            job = stage_upload(media, "file", SimpleUploadedFile("chart.png", b"png"))
+        self.assertIsNone(process_upload(job.pk))
+
+    def test_image_task_may_wait_for_its_upload(self):
+        from PIL import Image
+
+        # Read the upload back from where LocalFileSystemBackend put it.
+        storage = FileSystemStorage(location=os.path.join(self.directory, "media"))
+        for field in (
+            WritingTaskModel._meta.get_field("image_file"),
+            WritingTaskImageVariant._meta.get_field("file"),
+        ):
+            patcher = mock.patch.object(field, "storage", storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        png = io.BytesIO()
+        Image.new("RGB", (800, 400), "white").save(png, "PNG")
+
+        exam = WritingExamModel.objects.create(title="Academic 1", tag="academic")
+        task = WritingTaskModel(exam=exam, type="image", task="task1", upload_status=UPLOAD_PENDING)
+        task.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            stage_upload(task, "image_file", SimpleUploadedFile("graph.png", png.getvalue()))
+        task.refresh_from_db()
+        self.assertEqual(task.image_file.name, "images/writing/img/graph.png")
+        self.assertEqual(task.upload_status, UPLOAD_READY)
+        # The finished upload generated the variants inline.
+        self.assertEqual(
+            sorted(task.image_variants.values_list("format", "width")),
+            [("jpeg", 320), ("jpeg", 640), ("jpeg", 800), ("webp", 320), ("webp", 640), ("webp", 800)],
+        )
+
+
+class UploadApiTests(UploadTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_superuser(email="admin@example.com", password="x")
+        self.client.force_authenticate(self.admin)
+
+    def test_upload_returns_before_the_file_is_stored(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                reverse("media-upload"),
+                {"kind": "audio", "title": "Part 1", "file": SimpleUploadedFile("p1.mp3", AUDIO)},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], UPLOAD_PENDING)
+        self.assertEqual(AudioFile.objects.get().upload_status, UPLOAD_PENDING)
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get(reverse("upload-job", args=[response.data["job"]]))
+        self.assertEqual(response.data["status"], UPLOAD_READY)
+        self.assertEqual(response.data["uploaded"], len(AUDIO))
+
+    def test_unknown_kind(self):
+        response = self.client.post(
+            reverse("media-upload"),
+            {"kind": "video", "title": "x", "file": SimpleUploadedFile("x.mp4", b"x")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(
+            CustomUser.objects.create_user(email="student@example.com", password="x")
+        )
+        response = self.client.post(reverse("media-upload"), {}, format="multipart")
+        self.assertEqual(response.status_code, 403)
+
+
+class RemoteStorage(Storage):
+    """Counts the calls that would go to the remote service"""
+
+    def __init__(self):
+        self.calls = []
+
+    def url(self, name):
+        self.calls.append(("url", name))
+        return f"https://cdn.example.com/{name}"
+
+    def exists(self, name):
+        self.calls.append(("exists", name))
+        return True
+
+    def size(self, name):
+        self.calls.append(("size", name))
+        return 42
+
+    def get_available_name(self, name, max_length=None):
+        # Like Cloudinary: saving under a taken name replaces the file.
+        return name
+
+    def _save(self, name, content):
+        self.calls.append(("save", name))
+        return name
+
+    def delete(self, name):
+        self.calls.append(("delete", name))
+
+
+class CachedRemoteStorage(CachedStorageMixin, RemoteStorage):
+    pass
+
+
+@override_settings(MEDIA_STORAGE_CACHE={"ALIAS": None, "TTL": 60, "MAX_ENTRIES": 3})
+class CachedStorageTests(TestCase):
+    def setUp(self):
+        clear_storage_cache()
+        storage_cache_stats.reset()
+        # The LRU is sized from settings when first used.
+        with mock.patch("temp.storage._local_cache", None):
+            self.cache = local_cache()
+        patcher = mock.patch("temp.storage._local_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.storage = CachedRemoteStorage()
+
+    def test_urls_and_metadata_are_memoized(self):
+        for _ in range(3):
+            self.assertEqual(self.storage.url("a.png"), "https://cdn.example.com/a.png")
+            self.assertTrue(self.storage.exists("a.png"))
+            self.assertEqual(self.storage.size("a.png"), 42)
+        self.assertEqual(self.storage.metadata("a.png")["content_type"], "image/png")
+        self.assertEqual(
+            self.storage.calls, [("url", "a.png"), ("exists", "a.png"), ("size", "a.png")]
+        )
+        self.assertEqual(
+            storage_cache_stats.snapshot(),
+            {"url": {"hits": 2, "misses": 1}, "exists": {"hits": 2, "misses": 1},
+             "meta": {"hits": 3, "misses": 1}},
+        )
+
+    def test_replacing_or_deleting_a_file_invalidates_it(self):
+        self.storage.size("a.png")
+        self.storage.save("a.png", ContentFile(b"new"))
+        self.storage.size("a.png")
+        self.storage.delete("a.png")
+        self.storage.size("a.png")
+        self.assertEqual([call for call, _ in self.storage.calls].count("size"), 3)
+
+    def test_entries_expire(self):
+        self.storage.url("a.png")
+        with mock.patch("temp.storage.time.monotonic", return_value=10**9):
+            self.storage.url("a.png")
+        self.assertEqual(len(self.storage.calls), 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in ("a", "b", "c"):
+            self.storage.url(name)
+        self.storage.url("a")
+        self.storage.url("d")  # evicts b
+        self.storage.url("a")
+        self.storage.url("b")
+        self.assertEqual([name for _, name in self.storage.calls], ["a", "b", "c", "d", "b"])
+
+    @override_settings(MEDIA_STORAGE_CACHE={"ALIAS": "default", "TTL": 60, "MAX_ENTRIES": 3})
+    def test_shared_cache_serves_other_processes(self):
+        caches["default"].clear()
+        self.storage.url("a.png")
+        clear_storage_cache()  # a fresh process
+        self.storage.url("a.png")
+        self.assertEqual(len(self.storage.calls), 1)
+        self.storage.delete("a.png")
+        clear_storage_cache()
+        self.storage.url("a.png")
+        self.assertEqual([call for call, _ in self.storage.calls].count("url"), 2)
+
+    def test_cloudinary_metadata(self):
+        resource = {"bytes": 2048, "format": "png", "width": 800, "height": 600}
+        with mock.patch("cloudinary.api.resource", return_value=resource) as api:
+            storage = CachedMediaCloudinaryStorage()
+            for _ in range(2):
+                metadata = storage.metadata("images/writing/img/graph")
+        self.assertEqual(api.call_count, 1)
+        self.assertEqual(
+            metadata, {"size": 2048, "content_type": "image/png", "width": 800, "height": 600}
+        )
+
+    def test_repeat_renders_reuse_urls(self):
+        exam = WritingExamModel.objects.create(title="Academic 1", tag="academic")
+        task = WritingTaskModel.objects.create(
+            exam=exam, type="image", task="task1", image_file="images/writing/img/graph.png"
+        )
+        with mock.patch(
+            "cloudinary_storage.storage.MediaCloudinaryStorage.url", return_value="https://x/graph.png"
+        ) as url:
+            for _ in range(3):
+                data = WritingTaskSerializer(task).data
+        self.assertEqual(url.call_count, 1)
+        self.assertEqual(data["image_file"], "https://x/graph.png")
+
+
+class AudioStreamTests(UploadTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        stream_stats.reset()
+        os.makedirs(os.path.join(self.directory, "media", "ielts_audio"))
+        with open(os.path.join(self.directory, "media", "ielts_audio", "s1.mp3"), "wb") as f:
+            f.write(AUDIO)
+        self.audio = AudioFile.objects.create(title="Section 1", audio="ielts_audio/s1.mp3")
+        self.url = reverse("audio-stream", args=[self.audio.pk])
+        self.client = APIClient()
+        self.client.force_authenticate(
+            CustomUser.objects.create_user(email="listener@example.com", password="x")
+        )
+
+    def body(self, response):
+        content = b"".join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Type"], "audio/mpeg")
+        self.assertEqual(self.body(response), AUDIO)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(AUDIO)}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(self.body(response), AUDIO[100:200])
+
+    def test_open_ended_and_suffix_ranges(self):
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_RANGE="bytes=10000-")), AUDIO[10000:])
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_RANGE="bytes=-3")), AUDIO[-3:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(AUDIO)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(AUDIO)}")
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.body(response)), len(AUDIO))
+
+    def test_head(self):
+        response = self.client.head(self.url, HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Length"], "10")
+
+    def test_remote_file_redirects(self):
+        remote = AudioFile.objects.create(title="Section 2", audio="ielts_audio/remote.mp3")
+        with mock.patch(
+            "temp.storage.CachedVideoMediaCloudinaryStorage.url", return_value="https://cdn/remote.mp3"
+        ):
+            response = self.client.get(reverse("audio-stream", args=[remote.pk]))
+        self.assertRedirects(response, "https://cdn/remote.mp3", fetch_redirect_response=False)
+
+    def test_pending_upload_is_not_served(self):
+        AudioFile.objects.filter(pk=self.audio.pk).update(upload_status=UPLOAD_PENDING)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_stats(self):
+        self.body(self.client.get(self.url, HTTP_RANGE="bytes=0-99"))
+        self.body(self.client.get(self.url))
+        stats = stream_stats.snapshot()
+        self.assertEqual(stats["responses"], {206: 1, 200: 1})
+        self.assertEqual(stats["bytes"], 100 + len(AUDIO))
+        self.assertEqual(stats["active"], 0)
+
+    def test_range_file_stops_at_its_length(self):
+        path = os.path.join(self.directory, "media", "ielts_audio", "s1.mp3")
+        part = RangeFile(path, 5, 10)
+        self.assertEqual(part.read(), AUDIO[5:15])
+        self.assertEqual(part.read(), b"")
+        part.close()
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+
+    def test_empty_file(self):
+        open(os.path.join(self.directory, "media", "ielts_audio", "empty.mp3"), "wb").close()
+        empty = AudioFile.objects.create(title="Empty", audio="ielts_audio/empty.mp3")
+        url = reverse("audio-stream", args=[empty.pk])
+        response = self.client.get(url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */0")
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, self.body(response)), (200, b""))
+
+    def test_parse_range(self):
+        self.assertIsNone(parse_range("", 10))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 10))
+        self.assertEqual(parse_range("bytes=2-100", 10), (2, 9))
+        self.assertIs(parse_range("bytes=5-2", 10), False)
+        self.assertIs(parse_range("bytes=-0", 10), False)
+        self.assertIs(parse_range("bytes=-5", 0), False)
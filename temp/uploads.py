@@ -0,0 +1,319 @@
+"""
+Background media uploads.
+
+A request only streams the file to ``MEDIA_UPLOADS["STAGING_DIR"]`` and
+records an ``UploadJob`` (``stage_upload``); a worker pool then pushes it to
+the storage backend chunk by chunk (``process_upload``) and sets the model's
+file field and ``upload_status`` when it is done. Chunks are retried with
+exponential backoff, and the offset is saved after each one so a failed or
+interrupted job resumes where it stopped (``manage.py resume_uploads``).
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import (
+    UPLOAD_FAILED,
+    UPLOAD_PENDING,
+    UPLOAD_READY,
+    UPLOAD_UPLOADING,
+    UploadJob,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Sent with the model class as sender and ``object_id``/``field_name`` once
+# the file is stored; the model row is updated with a queryset update, so no
+# post_save is sent.
+upload_finished = Signal()
+
+
+def _config():
+    return settings.MEDIA_UPLOADS
+
+
+# ------------------------------
+# Storage backends
+# ------------------------------
+class UploadBackend:
+    """
+    Chunked upload protocol.
+
+    ``start`` opens a session and returns its JSON-serializable state,
+    ``send_chunk`` uploads ``data`` found at ``offset`` of a ``size`` byte
+    file and returns the updated state, and ``finish`` returns the name to
+    store in the file field. Resending a chunk must be harmless.
+    """
+
+    def start(self, name, size, storage):
+        raise NotImplementedError
+
+    def send_chunk(self, state, data, offset, size):
+        raise NotImplementedError
+
+    def finish(self, state):
+        raise NotImplementedError
+
+
+class CloudinaryBackend(UploadBackend):
+    """Cloudinary's chunked upload API, resumable through the upload id."""
+
+    def start(self, name, size, storage):
+        import cloudinary.utils
+
+        # Same public id layout as the field's cloudinary_storage storage.
+        name = storage._prepend_prefix(storage._normalise_name(name))
+        return {
+            "upload_id": cloudinary.utils.random_public_id(),
+            "filename": os.path.basename(name),
+            "folder": os.path.dirname(name),
+            "resource_type": storage.RESOURCE_TYPE,
+            "tags": storage.TAG,
+        }
+
+    def send_chunk(self, state, data, offset, size):
+        import cloudinary.uploader
+
+        options = {
+            "resource_type": state["resource_type"],
+            "tags": state["tags"],
+            "use_filename": True,
+        }
+        if state["folder"]:
+            options["folder"] = state["folder"]
+        if state.get("public_id"):
+            options["public_id"] = state["public_id"]
+        headers = {
+            "Content-Range": f"bytes {offset}-{offset + len(data) - 1}/{size}",
+            "X-Unique-Upload-Id": state["upload_id"],
+        }
+        result = cloudinary.uploader.upload_large_part(
+            (state["filename"], data), http_headers=headers, **options
+        )
+        return {**state, "public_id": result.get("public_id") or state.get("public_id")}
+
+    def finish(self, state):
+        return state["public_id"]
+
+
+class LocalFileSystemBackend(UploadBackend):
+    """Writes into ``MEDIA_UPLOADS["LOCAL_ROOT"]``; stands in for Cloudinary in tests"""
+
+    def __init__(self, root=None):
+        self.storage = FileSystemStorage(location=root or _config()["LOCAL_ROOT"])
+
+    def start(self, name, size, storage):
+        name = self.storage.generate_filename(name)
+        part = self.storage.path(f"{name}.{uuid.uuid4().hex}.part")
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        open(part, "wb").close()
+        return {"name": name, "part": part}
+
+    def send_chunk(self, state, data, offset, size):
+        with open(state["part"], "r+b") as part:
+            part.seek(offset)
+            part.write(data)
+            part.truncate()
+        return state
+
+    def finish(self, state):
+        name = self.storage.get_available_name(state["name"])
+        os.replace(state["part"], self.storage.path(name))
+        return name
+
+
+def get_backend():
+    return import_string(_config()["BACKEND"])()
+
+
+# ------------------------------
+# Worker pool
+# ------------------------------
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config()["WORKERS"], thread_name_prefix="media-upload"
+            )
+        return _executor
+
+
+def _run(job_id):
+    try:
+        process_upload(job_id)
+    finally:
+        connection.close()
+
+
+def _log_failure(job_id, future):
+    # process_upload records upload errors on the job; this catches the rest.
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Upload job %s failed", job_id, exc_info=future.exception())
+
+
+def enqueue(job_id):
+    """Hand a job to the worker pool; with ``WORKERS`` 0 it runs inline."""
+    if _config()["WORKERS"]:
+        _pool().submit(_run, job_id).add_done_callback(partial(_log_failure, job_id))
+    else:
+        process_upload(job_id)
+
+
+# ------------------------------
+# Staging and uploading
+# ------------------------------
+def _stage_file(uploaded_file):
+    staging_dir = _config()["STAGING_DIR"]
+    os.makedirs(staging_dir, exist_ok=True)
+    ext = os.path.splitext(uploaded_file.name)[1]
+    staged_path = os.path.join(staging_dir, f"{uuid.uuid4().hex}{ext}")
+    if hasattr(uploaded_file, "temporary_file_path"):
+        # Large uploads are already on disk; move instead of copying.
+        file_move_safe(uploaded_file.temporary_file_path(), staged_path)
+    else:
+        with open(staged_path, "wb") as staged:
+            for chunk in uploaded_file.chunks():
+                staged.write(chunk)
+    return staged_path
+
+
+def stage_upload(instance, field_name, uploaded_file):
+    """
+    Stage ``uploaded_file`` for ``instance.<field_name>`` and queue the upload.
+
+    ``instance`` must be saved and have an ``upload_status`` field; it is
+    marked pending here. The job is queued once the surrounding transaction
+    commits. Returns the ``UploadJob``.
+    """
+    staged_path = _stage_file(uploaded_file)
+    try:
+        with transaction.atomic():
+            type(instance).objects.filter(pk=instance.pk).update(upload_status=UPLOAD_PENDING)
+            instance.upload_status = UPLOAD_PENDING
+            job = UploadJob.objects.create(
+                content_type=ContentType.objects.get_for_model(instance),
+                object_id=instance.pk,
+                field_name=field_name,
+                filename=os.path.basename(uploaded_file.name),
+                staged_path=staged_path,
+                size=os.path.getsize(staged_path),
+            )
+            transaction.on_commit(partial(enqueue, job.pk))
+    except Exception:
+        os.remove(staged_path)
+        raise
+    return job
+
+
+def _send_with_retry(backend, job, data):
+    config = _config()
+    attempt = 0
+    while True:
+        try:
+            return backend.send_chunk(job.state, data, job.offset, job.size)
+        except Exception:
+            attempt += 1
+            job.attempts += 1
+            if attempt >= config["MAX_ATTEMPTS"]:
+                raise
+            time.sleep(config["RETRY_BACKOFF"] * 2 ** (attempt - 1))
+
+
+def _set_status(job, model, status, error=""):
+    job.status = status
+    job.error = error
+    job.save(update_fields=["status", "error", "attempts", "updated_at"])
+    model.objects.filter(pk=job.object_id).update(upload_status=status)
+
+
+def process_upload(job_id):
+    """
+    Push a pending job to the backend. Returns the job, or None when
+    another worker already claimed it.
+    """
+    claimed = UploadJob.objects.filter(pk=job_id, status=UPLOAD_PENDING).update(
+        status=UPLOAD_UPLOADING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    job = UploadJob.objects.select_related("content_type").get(pk=job_id)
+    model = job.content_type.model_class()
+    model.objects.filter(pk=job.object_id).update(upload_status=UPLOAD_UPLOADING)
+
+    backend = get_backend()
+    chunk_size = _config()["CHUNK_SIZE"]
+    try:
+        instance = model.objects.get(pk=job.object_id)
+        field = model._meta.get_field(job.field_name)
+        if not job.state:
+            name = field.generate_filename(instance, job.filename)
+            job.state = backend.start(name, job.size, field.storage)
+            job.save(update_fields=["state", "updated_at"])
+        with open(job.staged_path, "rb") as staged:
+            staged.seek(job.offset)
+            # At least one chunk, so empty files are uploaded too.
+            while True:
+                data = staged.read(chunk_size)
+                job.state = _send_with_retry(backend, job, data)
+                job.offset += len(data)
+                job.save(update_fields=["state", "offset", "attempts", "updated_at"])
+                if job.offset >= job.size:
+                    break
+        stored_name = backend.finish(job.state)
+    except Exception as exc:
+        _set_status(job, model, UPLOAD_FAILED, error=f"{type(exc).__name__}: {exc}")
+        return job
+
+    with transaction.atomic():
+        model.objects.filter(pk=job.object_id).update(
+            **{field.attname: stored_name, "upload_status": UPLOAD_READY}
+        )
+        job.status = UPLOAD_READY
+        job.error = ""
+        job.save(update_fields=["status", "error", "updated_at"])
+    # A replaced file keeps its name; drop what was cached about the old one.
+    if hasattr(field.storage, "invalidate"):
+        field.storage.invalidate(stored_name)
+    os.remove(job.staged_path)
+    upload_finished.send(sender=model, object_id=job.object_id, field_name=job.field_name)
+    return job
+
+
+def resume_uploads(failed=False, stale_after=timedelta(minutes=15), inline=False):
+    """
+    Re-queue jobs left behind by a restart: pending ones, ones stuck
+    uploading for longer than ``stale_after`` and, with ``failed``, failed
+    ones. They continue from their saved offset; ``inline`` uploads them in
+    this thread instead of the pool. Returns the job ids.
+    """
+    statuses = [UPLOAD_UPLOADING, UPLOAD_FAILED] if failed else [UPLOAD_UPLOADING]
+    stale = UploadJob.objects.filter(status__in=statuses)
+    stale = stale.exclude(status=UPLOAD_UPLOADING, updated_at__gte=timezone.now() - stale_after)
+    stale.update(status=UPLOAD_PENDING)
+    job_ids = list(
+        UploadJob.objects.filter(status=UPLOAD_PENDING).order_by("pk").values_list("pk", flat=True)
+    )
+    for job_id in job_ids:
+        process_upload(job_id) if inline else enqueue(job_id)
+    return job_ids
+
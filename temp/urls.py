@@ -0,0 +1,19 @@
+# temp/urls.py
+from django.urls import path
+from .views import (
+    AudioStreamApiView,
+    MediaUploadApiView,
+    StorageCacheStatsApiView,
+    StreamStatsApiView,
+    TaskImageUploadApiView,
+    UploadJobApiView,
+)
+
+urlpatterns = [
+    path('uploads/', MediaUploadApiView.as_view(), name='media-upload'),
+    path('uploads/<int:pk>/', UploadJobApiView.as_view(), name='upload-job'),
+    path('writing-tasks/<int:pk>/image/', TaskImageUploadApiView.as_view(), name='task-image-upload'),
+    path('audio/<int:pk>/stream/', AudioStreamApiView.as_view(), name='audio-stream'),
+    path('audio/streams/', StreamStatsApiView.as_view(), name='audio-stream-stats'),
+    path('storage-cache/', StorageCacheStatsApiView.as_view(), name='storage-cache-stats'),
+]
@@ -1,3 +1,137 @@
-from django.shortcuts import render
+import mimetypes
+import os
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.utils._os import safe_join
+from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from writing.models import WritingTaskModel
+from .models import UPLOAD_READY, AudioFile, MediaFile, UploadJob
+from .storage import local_cache, storage_cache_stats
+from .streaming import stream_file, stream_stats
+from .uploads import stage_upload
+
+# kind -> (model, file field)
+UPLOAD_KINDS = {
+    "image": (MediaFile, "file"),
+    "audio": (AudioFile, "audio"),
+}
+
+
+def _job_data(job):
+    return {
+        "job": job.pk,
+        "status": job.status,
+        "size": job.size,
+        "uploaded": job.offset,
+        "error": job.error,
+    }
+
+
+class MediaUploadApiView(APIView):
+    """
+    Create a MediaFile (``kind=image``) or AudioFile (``kind=audio``).
+
+    The multipart ``file`` is only staged here; it is uploaded in the
+    background and the response (202) carries the job to poll.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        kind = request.data.get("kind")
+        title = request.data.get("title")
+        upload = request.FILES.get("file")
+        if kind not in UPLOAD_KINDS:
+            return Response({"message": f"kind must be one of {', '.join(UPLOAD_KINDS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not title or not upload:
+            return Response({"message": "A title and a file are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        model, field_name = UPLOAD_KINDS[kind]
+        instance = model.objects.create(title=title[:100])
+        job = stage_upload(instance, field_name, upload)
+        return Response({"id": instance.pk, "kind": kind, **_job_data(job)},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class TaskImageUploadApiView(APIView):
+    """Replace a writing task's image; uploaded in the background like MediaUploadApiView"""
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, pk):
+        task = get_object_or_404(WritingTaskModel.objects.select_related(None), pk=pk)
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"message": "An image file is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        job = stage_upload(task, "image_file", upload)
+        return Response({"id": task.pk, **_job_data(job)}, status=status.HTTP_202_ACCEPTED)
+
+
+class UploadJobApiView(APIView):
+    """Progress of a background upload"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        job = get_object_or_404(UploadJob, pk=pk)
+        return Response(_job_data(job))
+
+
+class StorageCacheStatsApiView(APIView):
+    """Hit/miss counters of this process's media storage cache"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"entries": len(local_cache()), "lookups": storage_cache_stats.snapshot()})
+
+
+def _local_path(fieldfile):
+    """Path of a stored file on this machine, or None when it is remote"""
+    try:
+        return fieldfile.storage.path(fieldfile.name)
+    except NotImplementedError:
+        pass
+    # Written by the local upload backend in place of Cloudinary.
+    try:
+        path = safe_join(settings.MEDIA_UPLOADS["LOCAL_ROOT"], fieldfile.name)
+    except ValueError:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+class AudioStreamApiView(APIView):
+    """
+    Play an AudioFile from any position; signed-in users only.
+
+    Locally stored files are streamed with Range support; files that only
+    live on Cloudinary redirect to its URL, which handles ranges itself.
+    HEAD is answered like GET, without the body.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        audio = get_object_or_404(AudioFile, pk=pk, upload_status=UPLOAD_READY)
+        if not audio.audio:
+            raise Http404
+        path = _local_path(audio.audio)
+        if path is None:
+            return HttpResponseRedirect(audio.audio.url)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return stream_file(request, path, content_type)
+
+
+class StreamStatsApiView(APIView):
+    """Responses, chunks and throughput of this process's audio streams"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(stream_stats.snapshot())
@@ -28,6 +28,7 @@ class CustomUserAdmin(UserAdmin):
     )
 
     ordering = ('email',)  # Order by email
+    show_full_result_count = False
     
 
 admin.site.register(CustomUser, CustomUserAdmin)
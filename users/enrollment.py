@@ -0,0 +1,254 @@
+"""
+Bulk enrollment of users from CSV rosters.
+
+A roster has ``email``, ``first_name`` and ``last_name`` columns and an
+optional ``password``. ``enroll_users`` streams it ``chunk_size`` rows at a
+time. Per chunk it:
+
+- normalizes the emails;
+- drops the ones already seen in the file, or (one query) already
+  registered in any letter case;
+- hashes the given passwords on a process pool of ``HASH_WORKERS``;
+- inserts the users with one ``bulk_create``.
+
+Users without a password get an unusable one and an activation token,
+which ``activate_with_token`` (``/users/activation/confirm/``) exchanges
+for a password. The tokens have their own salt and only work while the
+account has no usable password, so they cannot reset passwords. ``activate_users`` activates accounts with one UPDATE.
+
+``bulk_create`` skips ``save()`` and its signals, so ``full_name`` is set
+here and the new emails are dropped from the login unknown-email cache.
+"""
+import csv
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from users_auth.throttling import forget_unknown_emails
+from .models import CustomUser
+from .profiles import invalidate_profile
+from .workers import init_worker
+
+NAME_LENGTH = CustomUser._meta.get_field("first_name").max_length
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class EnrollmentReport:
+    """Outcome of an enrollment"""
+
+    def __init__(self):
+        self.created = 0
+        self.existing = 0
+        self.duplicates = 0
+        self.rejected = []
+        self.activations = []
+        # Why the roster could not be read to the end, if it could not
+        self.error = None
+
+    def reject(self, line, reason, row=None):
+        self.rejected.append({"line": line, "reason": reason, "row": row})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "existing": self.existing,
+            "duplicates": self.duplicates,
+            "rejected_count": len(self.rejected),
+            "rejected": self.rejected,
+            "activations": self.activations,
+            "error": self.error,
+        }
+
+
+def _config():
+    return settings.USER_ENROLLMENT
+
+
+class ActivationTokenGenerator(PasswordResetTokenGenerator):
+    """Activation tokens; its own salt keeps them apart from password reset tokens"""
+    key_salt = "users.enrollment.ActivationTokenGenerator"
+
+
+activation_token_generator = ActivationTokenGenerator()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Forking a web worker would copy its threads' locks and open
+            # connections into the children.
+            _executor = ProcessPoolExecutor(
+                max_workers=_config()["HASH_WORKERS"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(list(settings.PASSWORD_HASHERS),),
+            )
+        return _executor
+
+
+def hash_passwords(passwords):
+    """``make_password`` of each password, in parallel when HASH_WORKERS > 0"""
+    workers = _config()["HASH_WORKERS"]
+    if workers < 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(_pool().map(make_password, passwords, chunksize=chunksize))
+
+
+def read_roster(stream):
+    """Yield ``(line_number, row_dict)`` lazily from a CSV text stream."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _parse_row(row):
+    """``(email, first_name, last_name, password)``; raises ValueError"""
+    email = CustomUser.objects.normalize_email((row.get("email") or "").strip())
+    try:
+        validate_email(email)
+    except ValidationError:
+        raise ValueError(f"invalid email {email!r}")
+    first_name = (row.get("first_name") or "").strip()
+    last_name = (row.get("last_name") or "").strip()
+    if not first_name:
+        raise ValueError("first_name is required")
+    if len(first_name) > NAME_LENGTH or len(last_name) > NAME_LENGTH:
+        raise ValueError(f"names are limited to {NAME_LENGTH} characters")
+    return email, first_name, last_name, row.get("password") or None
+
+
+def _registered(emails):
+    """The lowercased emails among ``emails`` that already have a user"""
+    return set(
+        CustomUser.objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=[CustomUser.objects.lookup_email(email) for email in emails])
+        .values_list("email_lower", flat=True)
+    )
+
+
+def activation_uid(user_id):
+    return urlsafe_base64_encode(force_bytes(user_id))
+
+
+def _enroll_chunk(chunk, report, seen, activate, batch_size):
+    parsed = []
+    for line, row in chunk:
+        try:
+            email, first_name, last_name, password = _parse_row(row)
+        except ValueError as exc:
+            report.reject(line, str(exc), row={k: v for k, v in row.items() if k != "password"})
+            continue
+        if email.lower() in seen:
+            report.duplicates += 1
+            continue
+        seen.add(email.lower())
+        parsed.append((email, first_name, last_name, password))
+
+    registered = _registered([email for email, *_ in parsed]) if parsed else set()
+    report.existing += sum(1 for email, *_ in parsed if email.lower() in registered)
+    parsed = [row for row in parsed if row[0].lower() not in registered]
+    if not parsed:
+        return
+
+    given = [password for *_, password in parsed if password]
+    hashed = iter(hash_passwords(given))
+    users = [
+        CustomUser(
+            email=email,
+            first_name=first_name,
+            last_name=last_name,
+            # What CustomUser.save() would have set
+            full_name=f"{first_name} {last_name}",
+            password=next(hashed) if password else make_password(None),
+            is_active=activate,
+        )
+        for email, first_name, last_name, password in parsed
+    ]
+    try:
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users, batch_size=batch_size)
+    except IntegrityError:
+        # A concurrent enrollment or signup registered some emails first.
+        registered = _registered([user.email for user in users])
+        report.existing += len(registered)
+        users = [user for user in users if user.email.lower() not in registered]
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users, batch_size=batch_size)
+
+    report.created += len(users)
+    forget_unknown_emails([user.email for user in users])
+    for user in users:
+        if not user.has_usable_password():
+            report.activations.append({
+                "id": user.pk,
+                "email": user.email,
+                "uid": activation_uid(user.pk),
+                "token": activation_token_generator.make_token(user),
+            })
+
+
+def enroll_users(stream, chunk_size=None, activate=False, batch_size=500):
+    """
+    Create the users of a CSV roster stream and return an EnrollmentReport.
+    ``activate`` creates them active; otherwise they stay inactive until
+    ``activate_users`` or their activation token. An unreadable roster stops
+    the enrollment with ``report.error`` set.
+    """
+    report = EnrollmentReport()
+    seen = set()
+    rows = read_roster(stream)
+    chunk_size = chunk_size or _config()["CHUNK_SIZE"]
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _enroll_chunk(chunk, report, seen, activate, batch_size)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # The chunks before the unreadable one stay enrolled.
+        report.error = f"the roster is not valid UTF-8 CSV: {exc}"
+    return report
+
+
+def activate_users(user_ids):
+    """Activate the given users with one UPDATE; returns how many changed"""
+    user_ids = list(user_ids)
+    activated = CustomUser.objects.filter(pk__in=user_ids, is_active=False).update(is_active=True)
+    invalidate_profile(*user_ids)
+    return activated
+
+
+def activate_with_token(uid, token, password):
+    """
+    Set the password of an enrolled user holding a valid activation token
+    and activate the account. Returns the user, or None for a bad token or
+    an account that already has a password.
+    """
+    try:
+        user = CustomUser.objects.get(pk=force_str(urlsafe_base64_decode(uid)))
+    except (TypeError, ValueError, OverflowError, CustomUser.DoesNotExist):
+        return None
+    if user.has_usable_password():
+        return None
+    # The token is bound to the password hash, so it stops working once used.
+    if not activation_token_generator.check_token(user, token):
+        return None
+    user.set_password(password)
+    user.is_active = True
+    user.save(update_fields=["password", "is_active"])
+    return user
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from core import metrics
+
+
+class VerificationStats:
+    """Per-process timing of password hash verifications, by algorithm"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def observe(self, algorithm, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(
+                algorithm, {"count": 0, "sum": 0.0, "buckets": [0] * len(self.BUCKETS)}
+            )
+            stats["count"] += 1
+            stats["sum"] += seconds
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    stats["buckets"][i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                algorithm: {
+                    "count": stats["count"],
+                    "sum": stats["sum"],
+                    "buckets": dict(zip(self.BUCKETS, stats["buckets"])),
+                }
+                for algorithm, stats in self._stats.items()
+            }
+
+
+verification_stats = VerificationStats()
+
+
+class TimedVerifyMixin:
+    def verify(self, password, encoded):
+        start = time.perf_counter()
+        try:
+            return super().verify(password, encoded)
+        finally:
+            seconds = time.perf_counter() - start
+            verification_stats.observe(self.algorithm, seconds)
+            metrics.record_hash(seconds)
+
+
+class ScryptPasswordHasher(TimedVerifyMixin, hashers.ScryptPasswordHasher):
+    """
+    Memory-hard scrypt with its cost taken from settings.
+
+    Hashes made with other parameters report ``must_update`` and are
+    re-hashed on the next successful login.
+    """
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        # Same as Django's, except that the memory limit follows the cost the
+        # hash is computed with: a stored hash keeps verifying after
+        # PASSWORD_SCRYPT_* is lowered. OpenSSL's 32 MiB default is too small
+        # for work factors above 2**14.
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode("ascii").strip()
+        return "%s$%d$%s$%d$%d$%s" % (self.algorithm, n, salt, r, p, hash_)
+
+
+class PBKDF2PasswordHasher(TimedVerifyMixin, hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class PBKDF2SHA1PasswordHasher(TimedVerifyMixin, hashers.PBKDF2SHA1PasswordHasher):
+    pass
+
@@ -0,0 +1,46 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.enrollment import enroll_users
+
+
+class Command(BaseCommand):
+    help = "Enroll the users of a CSV roster (email, first_name, last_name[, password])."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--activate", action="store_true", help="Create the users active")
+        parser.add_argument("--chunk-size", type=int, help="Default: USER_ENROLLMENT['CHUNK_SIZE']")
+        parser.add_argument(
+            "--tokens", metavar="PATH",
+            help="Write the activation tokens of users without a password to this CSV",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] is not None and options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+        try:
+            stream = open(options["path"], encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with stream:
+            report = enroll_users(
+                stream, chunk_size=options["chunk_size"], activate=options["activate"]
+            )
+
+        if options["tokens"]:
+            with open(options["tokens"], "w", newline="") as out:
+                writer = csv.DictWriter(out, fieldnames=["id", "email", "uid", "token"])
+                writer.writeheader()
+                writer.writerows(report.activations)
+        for rejected in report.rejected:
+            self.stderr.write(f"line {rejected['line']}: {rejected['reason']}")
+        if report.error:
+            raise CommandError(f"Stopped after {report.created} user(s): {report.error}")
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Enrolled {report.created} user(s); {report.existing} already registered, "
+                f"{report.duplicates} duplicate(s), {len(report.rejected)} rejected."
+            ))
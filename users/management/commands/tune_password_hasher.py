@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+# Cost setting and the candidate values tried for each hasher.
+CANDIDATES = {
+    "scrypt": ("PASSWORD_SCRYPT_WORK_FACTOR", [2**13, 2**14, 2**15, 2**16]),
+    "pbkdf2_sha256": ("PASSWORD_PBKDF2_ITERATIONS", [150_000, 300_000, 600_000, 1_000_000]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time password verification at several costs and report single-core "
+        "login throughput, to pick a cost that fits the CPU budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--algorithm", default=None,
+            help="scrypt or pbkdf2_sha256 (default: the configured PASSWORD_HASHER)",
+        )
+        parser.add_argument("--samples", type=int, default=5)
+
+    def handle(self, *args, **options):
+        algorithm = options["algorithm"] or get_hasher().algorithm
+        if algorithm not in CANDIDATES:
+            raise CommandError(f"No tuning candidates for {algorithm!r}.")
+        setting, values = CANDIDATES[algorithm]
+        current = getattr(settings, setting)
+
+        self.stdout.write(f"{algorithm}: {setting} (current {current})")
+        for value in sorted(set(values) | {current}):
+            with override_settings(**{setting: value}):
+                hasher = get_hasher(algorithm)
+                encoded = hasher.encode("tune-password", hasher.salt())
+                start = time.perf_counter()
+                for _ in range(options["samples"]):
+                    hasher.verify("tune-password", encoded)
+                per_verify = (time.perf_counter() - start) / options["samples"]
+            marker = "  <- current" if value == current else ""
+            self.stdout.write(
+                f"  {value:>10}  {per_verify * 1000:8.1f} ms/verify  "
+                f"{1 / per_verify:8.1f} logins/s/core{marker}"
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_customuser_email_ci'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='claims_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -3,8 +3,11 @@ from django.db import models
 # Create your models here.
 from django.contrib.auth.models import AbstractBaseUser,BaseUserManager,PermissionsMixin
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from .profiles import invalidate_profile
+
 class CustomUserManager(BaseUserManager):
     def create_user(self ,email, password=None ,**extra_fields):
         if not email:
@@ -27,6 +30,18 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    @classmethod
+    def lookup_email(cls, email):
+        """An email as looked up and cache-keyed: trimmed and lowercased"""
+        return email.strip().lower()
+
+    def by_email(self, email):
+        """Case-insensitive email lookup that can use the LOWER(email) index"""
+        return self.alias(email_lower=Lower("email")).filter(email_lower=self.lookup_email(email))
+
+    def get_by_natural_key(self, username):
+        return self.by_email(username).get()
+
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
@@ -36,6 +51,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_active=models.BooleanField(default=False)
     is_suspended = models.BooleanField(default=False)
+    # When is_active or is_staff was last unset through save(); access tokens
+    # issued earlier carry stale claims and are refused (users_auth.revocation).
+    claims_changed_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
     date_joined= models.DateTimeField(default=timezone.now)
     date_of_birth = models.DateTimeField(null=True,blank=True)
 
@@ -44,6 +62,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD=  "email" #email for login
     REQUIRED_FIELDS = ["first_name"]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower("email"), name="unique_customuser_email_ci"),
+        ]
     
     
     def get_full_name(self):
@@ -62,4 +85,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def save(self,*args,**kwargs):
         self.full_name= self.get_full_name()
         super().save(*args,**kwargs)
+        invalidate_profile(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_profile(user_id)
+        return result
 
@@ -0,0 +1,67 @@
+"""
+The public profile of a user, as embedded in API responses.
+
+``profile_data`` builds the payload straight from the instance with one
+precompiled attribute getter, so no serializer fields are built or
+introspected per call. ``profiles()`` reads only ``PROFILE_FIELDS``: the
+password hash, permission flags and dates stay in the database.
+
+``get_profile``/``get_profiles`` cache the payloads per user until
+``CustomUser.save()`` or ``delete()`` drops them (``invalidate_profile``).
+Bulk ``QuerySet.update()`` calls bypass that and must invalidate themselves.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PROFILE_FIELDS = ("id", "email", "first_name", "last_name", "full_name", "is_active")
+
+_profile_values = attrgetter(*PROFILE_FIELDS)
+
+
+def profile_data(user):
+    """The profile payload of a CustomUser (a deferred one from profiles() will do)"""
+    return dict(zip(PROFILE_FIELDS, _profile_values(user)))
+
+
+def profiles():
+    """CustomUser queryset reading only the profile columns"""
+    from .models import CustomUser
+
+    return CustomUser.objects.only(*PROFILE_FIELDS)
+
+
+def profile_cache_key(user_id):
+    return f"users:profile:{user_id}"
+
+
+def get_profiles(user_ids):
+    """``{user_id: payload}``, from the cache or one query for the misses"""
+    keys = {profile_cache_key(user_id): user_id for user_id in user_ids}
+    found = {keys[key]: data for key, data in cache.get_many(keys).items()}
+    missing = [user_id for user_id in keys.values() if user_id not in found]
+    if missing:
+        loaded = {
+            row["id"]: row for row in profiles().filter(pk__in=missing).values(*PROFILE_FIELDS)
+        }
+        cache.set_many(
+            {profile_cache_key(user_id): data for user_id, data in loaded.items()},
+            settings.USER_PROFILE_CACHE_TIMEOUT,
+        )
+        found.update(loaded)
+    return found
+
+
+def get_profile(user_id):
+    """The cached profile payload of a user; None when there is no such user"""
+    return get_profiles([user_id]).get(user_id)
+
+
+def invalidate_profile(*user_ids):
+    # Again on commit, like invalidate_exam, in case a concurrent read cached
+    # the old row while the write was in flight.
+    keys = [profile_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
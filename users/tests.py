@@ -1,3 +1,296 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import call_command
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.db import IntegrityError
+from rest_framework.test import APIClient
+
+from core.testing import assert_no_full_scan, assert_within_budget
+
+from users_auth.throttling import is_unknown_email, remember_unknown_email
+from .enrollment import (
+    activate_users,
+    activation_token_generator,
+    activation_uid,
+    enroll_users,
+    hash_passwords,
+)
+from .hashers import verification_stats
+from .models import CustomUser
+from .profiles import get_profile, get_profiles, profile_data, profiles
+
+
+@override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2**10)
+class PasswordHashPolicyTests(TestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        self.user = CustomUser.objects.create_user(
+            email="legacy@example.com", password="old-pass-123",
+            first_name="Leg", last_name="Acy", is_active=True,
+        )
+
+    def login(self):
+        return APIClient().post(
+            reverse("login"), {"email": "legacy@example.com", "password": "old-pass-123"}
+        )
+
+    def test_new_passwords_use_scrypt(self):
+        self.assertTrue(self.user.password.startswith("scrypt$1024$"))
+
+    def test_pbkdf2_hash_is_upgraded_on_login(self):
+        legacy = make_password("old-pass-123", hasher="pbkdf2_sha256")
+        CustomUser.objects.filter(pk=self.user.pk).update(password=legacy)
+
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        # the re-hash shares the last_login UPDATE
+        assert_within_budget(response)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$"))
+        self.assertTrue(self.user.check_password("old-pass-123"))
+
+    def test_cost_change_triggers_rehash(self):
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2**11):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$2048$"))
+
+    def test_lowering_the_cost_keeps_old_hashes_valid(self):
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2**12):
+            stronger = make_password("old-pass-123")
+        CustomUser.objects.filter(pk=self.user.pk).update(password=stronger)
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$1024$"))
+
+    def test_verification_time_is_recorded(self):
+        verification_stats.reset()
+        self.user.check_password("wrong")
+        self.user.check_password("old-pass-123")
+
+        stats = verification_stats.snapshot()["scrypt"]
+        self.assertEqual(stats["count"], 2)
+        self.assertGreater(stats["sum"], 0)
+
+
+class EmailLookupTests(TestCase):
+    def test_email_is_unique_regardless_of_case(self):
+        CustomUser.objects.create_user(email="Case@Example.com", password=None, first_name="C")
+        with self.assertRaises(IntegrityError):
+            CustomUser.objects.create_user(email="case@example.com", password=None, first_name="C")
+
+    def test_lookup_is_case_insensitive_and_indexed(self):
+        user = CustomUser.objects.create_user(email="Mixed@Example.com", password=None, first_name="M")
+        self.assertEqual(CustomUser.objects.by_email("mixed@EXAMPLE.com").get(), user)
+        assert_no_full_scan(CustomUser.objects.by_email("mixed@example.com"))
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="profile@example.com", password=None,
+            first_name="Ada", last_name="Lovelace", is_active=True,
+        )
+
+    def test_payload_from_a_field_limited_row(self):
+        with self.assertNumQueries(1) as ctx:
+            user = profiles().get(pk=self.user.pk)
+        self.assertNotIn('"password"', ctx.captured_queries[0]["sql"])
+        with self.assertNumQueries(0):
+            data = profile_data(user)
+        self.assertEqual(data, {
+            "id": self.user.pk, "email": "profile@example.com", "first_name": "Ada",
+            "last_name": "Lovelace", "full_name": "Ada Lovelace", "is_active": True,
+        })
+
+    def test_cached_until_the_user_is_saved(self):
+        with self.assertNumQueries(1):
+            get_profile(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_profile(self.user.pk)["full_name"], "Ada Lovelace")
+
+        self.user.last_name = "King"
+        self.user.save()
+        self.assertEqual(get_profile(self.user.pk)["full_name"], "Ada King")
+
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertIsNone(get_profile(user_id))
+
+    def test_many_profiles_in_one_query(self):
+        other = CustomUser.objects.create_user(email="other@example.com", password=None)
+        get_profile(self.user.pk)
+        with self.assertNumQueries(1):
+            found = get_profiles([self.user.pk, other.pk, 0])
+        self.assertEqual(set(found), {self.user.pk, other.pk})
+
+    def test_me_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("me"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["email"], "profile@example.com")
+        with self.assertNumQueries(0):
+            client.get(reverse("me"))
+
+
+ROSTER = """email,first_name,last_name,password
+Student.One@School.example.com,Student,One,first-pass-1
+student.one@school.example.com,Student,Again,
+taken@EXAMPLE.com,Taken,User,
+not-an-email,Bad,Row,
+two@school.example.com,Student,Two,
+three@school.example.com,,Three,
+"""
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    USER_ENROLLMENT={"HASH_WORKERS": 0, "CHUNK_SIZE": 1000},
+)
+class EnrollmentTests(TestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        CustomUser.objects.create_user(email="Taken@example.com", password=None, first_name="T")
+
+    def enroll(self, roster=ROSTER, **kwargs):
+        return enroll_users(io.StringIO(roster), **kwargs)
+
+    def test_roster(self):
+        report = self.enroll()
+        self.assertEqual((report.created, report.existing, report.duplicates), (2, 1, 1))
+        self.assertEqual([row["line"] for row in report.rejected], [5, 7])
+
+        one = CustomUser.objects.get(email="Student.One@school.example.com")
+        self.assertEqual(one.full_name, "Student One")
+        self.assertTrue(one.check_password("first-pass-1"))
+        self.assertFalse(one.is_active)
+        two = CustomUser.objects.get(email="two@school.example.com")
+        self.assertFalse(two.has_usable_password())
+        self.assertEqual([row["id"] for row in report.activations], [two.pk])
+
+    def test_one_existing_lookup_and_one_insert_per_chunk(self):
+        def roster(name):
+            return "email,first_name,last_name\n" + "".join(
+                f"{name}{i}@school.example.com,User,{i}\n" for i in range(50)
+            )
+
+        # existing emails, savepoint pair around the insert
+        with self.assertNumQueries(4):
+            report = self.enroll(roster("user"), activate=True)
+        self.assertEqual(report.created, 50)
+        self.assertEqual(CustomUser.objects.filter(is_active=True).count(), 50)
+
+        report = self.enroll(roster("USER"), chunk_size=20)
+        self.assertEqual((report.created, report.existing), (0, 50))
+
+    def test_enrolled_emails_are_no_longer_unknown(self):
+        remember_unknown_email("two@school.example.com")
+        self.enroll()
+        self.assertFalse(is_unknown_email("two@school.example.com"))
+
+    def test_bulk_activation_is_one_update(self):
+        self.enroll()
+        ids = list(CustomUser.objects.filter(is_active=False).values_list("pk", flat=True))
+        with self.assertNumQueries(1):
+            self.assertEqual(activate_users(ids), len(ids))
+        self.assertFalse(CustomUser.objects.filter(is_active=False).exists())
+
+    def test_activation_token(self):
+        [activation] = self.enroll().activations
+        url = reverse("activation-confirm")
+        payload = {"uid": activation["uid"], "token": activation["token"], "password": "N3w-pass-word"}
+        self.assertEqual(APIClient().post(url, {**payload, "token": "bad"}).status_code, 400)
+
+        self.assertEqual(APIClient().post(url, payload).status_code, 200)
+        user = CustomUser.objects.get(pk=activation["id"])
+        self.assertTrue(user.is_active)
+        self.assertTrue(user.check_password("N3w-pass-word"))
+        # used up with the password it replaced
+        self.assertEqual(APIClient().post(url, payload).status_code, 400)
+
+    def test_non_string_activation_fields(self):
+        [activation] = self.enroll().activations
+        url = reverse("activation-confirm")
+        payload = {"uid": activation["uid"], "token": activation["token"], "password": "N3w-pass-word"}
+        for field, value in (("uid", activation["id"]), ("password", 12345678901)):
+            response = APIClient().post(url, {**payload, field: value}, format="json")
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(CustomUser.objects.get(pk=activation["id"]).is_active)
+
+    def test_password_reset_tokens_and_accounts_with_passwords_are_refused(self):
+        [activation] = self.enroll().activations
+        user = CustomUser.objects.get(pk=activation["id"])
+        url = reverse("activation-confirm")
+        reset = {"uid": activation["uid"], "token": default_token_generator.make_token(user),
+                 "password": "N3w-pass-word"}
+        self.assertEqual(APIClient().post(url, reset).status_code, 400)
+
+        # Not a second password reset for accounts that have a password.
+        member = CustomUser.objects.create_user(email="member@example.com", password="old-pass-1",
+                                                first_name="M", is_active=True)
+        payload = {"uid": activation_uid(member.pk),
+                   "token": activation_token_generator.make_token(member), "password": "N3w-pass-word"}
+        self.assertEqual(APIClient().post(url, payload).status_code, 400)
+        member.refresh_from_db()
+        self.assertTrue(member.check_password("old-pass-1"))
+
+    def test_unreadable_roster(self):
+        staff = CustomUser.objects.create_user(email="admin@example.com", password=None,
+                                               first_name="A", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(staff)
+        roster = io.BytesIO(b"email,first_name,last_name\nok@school.example.com,Ok,User\n\xff\n")
+        roster.name = "roster.csv"
+        response = client.post(reverse("user-enrollment"), {"file": roster}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("UTF-8", response.data["error"])
+
+    def test_endpoints_are_for_admins(self):
+        client = APIClient()
+        roster = io.BytesIO(ROSTER.encode())
+        roster.name = "roster.csv"
+        staff = CustomUser.objects.create_user(email="admin@example.com", password=None,
+                                               first_name="A", is_staff=True)
+        response = client.post(reverse("user-enrollment"), {"file": roster}, format="multipart")
+        self.assertEqual(response.status_code, 401)
+
+        client.force_authenticate(staff)
+        roster.seek(0)
+        response = client.post(reverse("user-enrollment"), {"file": roster, "activate": "true"},
+                               format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(len(response.data["activations"]), 1)
+
+        response = client.post(reverse("user-activate"), {"users": [staff.pk]}, format="json")
+        self.assertEqual(response.data, {"activated": 1})
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "roster.csv")
+            tokens = os.path.join(tmp, "tokens.csv")
+            with open(path, "w") as f:
+                f.write(ROSTER)
+            out = io.StringIO()
+            call_command("enroll_users", path, "--tokens", tokens, stdout=out, stderr=io.StringIO())
+            with open(tokens) as f:
+                self.assertIn(activation_uid(
+                    CustomUser.objects.get(email="two@school.example.com").pk
+                ), f.read())
+        self.assertIn("Enrolled 2 user(s)", out.getvalue())
+
+    @override_settings(USER_ENROLLMENT={"HASH_WORKERS": 2, "CHUNK_SIZE": 1000})
+    def test_passwords_hashed_in_worker_processes(self):
+        passwords = ["pass-a", "pass-b", "pass-c"]
+        hashed = hash_passwords(passwords)
+        self.assertTrue(all(map(check_password, passwords, hashed)))
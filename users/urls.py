@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import ActivateUsersApiView, ActivationConfirmApiView, EnrollmentApiView
+
+urlpatterns = [
+    path('enrollments/', EnrollmentApiView.as_view(), name='user-enrollment'),
+    path('activate/', ActivateUsersApiView.as_view(), name='user-activate'),
+    path('activation/confirm/', ActivationConfirmApiView.as_view(), name='activation-confirm'),
+]
@@ -1,3 +1,70 @@
-from django.shortcuts import render
+import io
 
-# Create your views here.
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .enrollment import activate_users, activate_with_token, enroll_users
+
+
+class EnrollmentApiView(APIView):
+    """
+    Enroll a CSV roster uploaded as multipart ``file``. With ``activate``
+    the users are created active. Users listed without a password come back
+    under ``activations`` with the uid and token to send them.
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"message": "A roster file is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        activate = str(request.data.get("activate", "")).lower() in ("1", "true", "yes")
+        report = enroll_users(stream, activate=activate)
+        if report.error:
+            return Response(report.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+class ActivateUsersApiView(APIView):
+    """Activate the accounts listed in ``users`` (ids) in one update"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        user_ids = request.data.get("users")
+        if not isinstance(user_ids, list) or not all(isinstance(pk, int) for pk in user_ids):
+            return Response({"message": "users must be a list of user ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({"activated": activate_users(user_ids)}, status=status.HTTP_200_OK)
+
+
+class ActivationConfirmApiView(APIView):
+    """Exchange an enrollment activation token for a password"""
+    authentication_classes = []
+
+    def post(self, request):
+        uid = request.data.get("uid", "")
+        token = request.data.get("token", "")
+        password = request.data.get("password")
+        if not password:
+            return Response({"message": "Password is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(value, str) for value in (uid, token, password)):
+            return Response({"message": "uid, token and password must be strings."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            validate_password(password)
+        except ValidationError as exc:
+            return Response({"message": exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+        user = activate_with_token(uid, token, password)
+        if user is None:
+            return Response({"message": "The activation link is invalid or has been used."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Account activated."}, status=status.HTTP_200_OK)
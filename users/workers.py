@@ -0,0 +1,17 @@
+"""
+Setup of the process-pool workers that hash enrollment passwords.
+
+Spawned workers unpickle ``init_worker`` by importing this module before
+Django is set up, so it must not import models at module level.
+"""
+
+
+def init_worker(password_hashers):
+    """Set up Django in a fresh worker and hash like the parent process."""
+    import django
+    from django.apps import apps
+    from django.conf import settings
+
+    if not apps.ready:
+        django.setup()
+    settings.PASSWORD_HASHERS = password_hashers
@@ -0,0 +1,106 @@
+"""
+Async login for the ASGI deployment (core/asgi_urls.py).
+
+Same contract as ``LoginApiView``, but the lookups run on the async ORM,
+the throttle and unknown-email checks on the async cache API and the
+password hash on the bounded ``core.executors`` pool, so an ASGI worker
+keeps serving other requests while a login hashes.
+"""
+import json
+
+from django.contrib.auth.hashers import verify_password
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from core.executors import run_blocking
+from core.metrics import budget
+from users.models import CustomUser
+from .serializers import UserSerializer
+from .throttling import (
+    LoginRateThrottle,
+    ais_unknown_email,
+    aremember_unknown_email,
+    arecord_failed_login,
+)
+from .tokens import LoginRefreshToken
+from .views import LOGIN_FIELDS
+
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _throttled(wait):
+    response = JsonResponse(
+        {"detail": f"Request was throttled. Expected available in {int(wait) + 1} seconds."},
+        status=429,
+    )
+    response["Retry-After"] = str(int(wait) + 1)
+    return response
+
+
+@budget(queries=2, duplicates=0)
+@csrf_exempt
+@require_POST
+async def login(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"detail": "JSON parse error."}, status=400)
+    email = data.get("email")
+    password = data.get("password")
+
+    throttle = LoginRateThrottle()
+    wait = await throttle.acheck(throttle.get_ident(request), email)
+    if wait:
+        return _throttled(wait)
+
+    if not email:
+        return JsonResponse({"message": "Email  is required."}, status=400)
+    if not password:
+        return JsonResponse({"message": "Password is required."}, status=400)
+    if not isinstance(email, str) or not isinstance(password, str):
+        return JsonResponse({"message": "Email and password must be strings."}, status=400)
+
+    if await ais_unknown_email(email):
+        await arecord_failed_login(email)
+        return JsonResponse(["Message: email is invalid"], status=401, safe=False)
+    try:
+        user = await CustomUser.objects.by_email(email).only(*LOGIN_FIELDS).aget()
+    except CustomUser.DoesNotExist:
+        await aremember_unknown_email(email)
+        await arecord_failed_login(email)
+        return JsonResponse(["Message: email is invalid"], status=401, safe=False)
+
+    if not user.is_active:
+        return JsonResponse(["Message: You are not active.With otp active your active"], safe=False)
+    if user.is_suspended:
+        return JsonResponse(["Message: You are suspended from site .Contact with admin"], safe=False)
+
+    is_correct, must_update = await run_blocking(verify_password, password, user.password)
+    if not is_correct:
+        await arecord_failed_login(email)
+        return JsonResponse(
+            ["Message: Password is wrong .Try with right password"], status=401, safe=False
+        )
+
+    user.last_login = timezone.now()
+    changes = {"last_login": user.last_login}
+    if must_update:
+        # Re-hash with the current policy, as check_password() would.
+        await run_blocking(user.set_password, password)
+        changes["password"] = user.password
+    await CustomUser.objects.filter(pk=user.pk).aupdate(**changes)
+
+    token = LoginRefreshToken.for_user(user)
+    return JsonResponse({
+        "access": str(token.access_token),
+        "refresh": str(token),
+        "user": UserSerializer(user).data,
+        "Message": "Login succesfull",
+    })
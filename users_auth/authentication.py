@@ -0,0 +1,108 @@
+from asgiref.sync import sync_to_async
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import suspended_users
+from .tokens import USER_CLAIMS
+
+
+class ClaimsUser(TokenUser):
+    """Lightweight request.user built from the access token claims"""
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def is_active(self):
+        return self.token.get("is_active", False)
+
+    @cached_property
+    def is_suspended(self):
+        return self.token.get("is_suspended", False)
+
+    @cached_property
+    def full_name(self):
+        return self.token.get("full_name", "")
+
+    def __str__(self):
+        return f"ClaimsUser {self.id}"
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication without the per-request ``CustomUser`` query.
+
+    Tokens issued by ``LoginApiView`` carry the status claims the API
+    checks; suspensions made after login, and tokens whose is_active or
+    is_staff claims are out of date, are caught by ``suspended_users``.
+    Tokens without the claims (issued before this class existed) fall back
+    to the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        user = self.claims_user(validated_token)
+        if user is None:
+            return super().get_user(validated_token)
+        if user.id in suspended_users:
+            raise _suspended()
+        if suspended_users.claims_stale(user.id, validated_token.get("iat", 0)):
+            raise _stale_claims()
+        return user
+
+    def claims_user(self, validated_token):
+        """The ClaimsUser of a token, or None when it lacks the status claims."""
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return None
+
+        user = ClaimsUser(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if user.is_suspended:
+            raise _suspended()
+        return user
+
+
+def _suspended():
+    return AuthenticationFailed(_("User is suspended"), code="user_suspended")
+
+
+def _stale_claims():
+    # InvalidToken, so clients refresh and get the current claims.
+    return InvalidToken(_("Token claims are out of date"))
+
+
+async def authenticate_async(request):
+    """
+    ``StatelessJWTAuthentication`` for async views (plain Django requests).
+
+    Returns the user, or None without credentials; raises
+    ``AuthenticationFailed``/``InvalidToken`` like the DRF class. Only tokens
+    without the status claims need the database, through the sync path.
+    """
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+    validated_token = authentication.get_validated_token(raw_token)
+    user = authentication.claims_user(validated_token)
+    if user is None:
+        return await sync_to_async(authentication.get_user)(validated_token)
+    if await suspended_users.acontains(user.id):
+        raise _suspended()
+    if suspended_users.claims_stale(user.id, validated_token.get("iat", 0)):
+        raise _stale_claims()
+    return user
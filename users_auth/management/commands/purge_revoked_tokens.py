@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users_auth.revocation import revoked_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete revoked refresh tokens that have expired. Run it from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] is not None and options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        deleted = revoked_tokens.purge_expired(batch_size=options["batch_size"])
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired revocation(s)."))
@@ -1,3 +1,19 @@
 from django.db import models
 
 # Create your models here.
+
+
+class RevokedTokenModel(models.Model):
+    """
+    A revoked refresh token, looked up by its JTI.
+
+    Rows are only needed until the token would have expired anyway, after
+    which ``purge_revoked_tokens`` deletes them. Processes pull new rows by
+    id (users_auth/revocation.py).
+    """
+    jti = models.UUIDField(unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at})"
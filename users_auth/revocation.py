@@ -0,0 +1,207 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from users.models import CustomUser
+from .bloom import BloomFilter
+from .models import RevokedTokenModel
+
+
+class SuspendedUsers:
+    """
+    In-memory set of suspended user ids, reloaded every ``refresh_interval``.
+
+    Stateless JWT authentication trusts the claims in the access token, so
+    this set is what stops a user suspended after login. It also keeps, for
+    users who lost is_active or is_staff within an access token's lifetime,
+    when that happened: ``claims_stale`` refuses their tokens issued before,
+    so a deactivated or demoted user cannot go on with the old claims. Changes saved in this process apply at once; other processes
+    pick them up on their next reload.
+    """
+
+    def __init__(self, refresh_interval=None):
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._ids = frozenset()
+        self._claims_changed = {}
+        self._loaded_at = None
+        self._areloading = False
+
+    @property
+    def refresh_interval(self):
+        if self._refresh_interval is not None:
+            return self._refresh_interval
+        return settings.SUSPENDED_USERS_REFRESH_SECONDS
+
+    def __contains__(self, user_id):
+        self._maybe_reload()
+        return int(user_id) in self._ids
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+                return
+            self.reload()
+
+    def _rows(self):
+        recent = timezone.now() - jwt_settings.ACCESS_TOKEN_LIFETIME
+        return CustomUser.objects.filter(
+            Q(is_suspended=True) | Q(claims_changed_at__gt=recent)
+        ).values_list("pk", "is_suspended", "claims_changed_at")
+
+    def _load(self, rows):
+        self._ids = frozenset(pk for pk, suspended, _ in rows if suspended)
+        self._claims_changed = {
+            pk: changed.timestamp() for pk, _, changed in rows if changed is not None
+        }
+        self._loaded_at = time.monotonic()
+
+    def reload(self):
+        self._load(list(self._rows()))
+
+    async def acontains(self, user_id):
+        """
+        ``user_id in self`` for async code; a due reload uses the async ORM.
+        Once a set is loaded, requests arriving during a reload use it rather
+        than each starting their own.
+        """
+        now = time.monotonic()
+        due = self._loaded_at is None or now - self._loaded_at >= self.refresh_interval
+        if due and (self._loaded_at is None or not self._areloading):
+            self._areloading = True
+            try:
+                self._load([row async for row in self._rows()])
+            finally:
+                self._areloading = False
+        return int(user_id) in self._ids
+
+    def claims_stale(self, user_id, issued_at):
+        """
+        Whether a token issued at ``issued_at`` (epoch seconds) predates the
+        user's last loss of is_active or is_staff. Tokens from the second of
+        the change count as stale. Ask after ``in``/``acontains``, which reload.
+        """
+        changed = self._claims_changed.get(int(user_id))
+        return changed is not None and issued_at <= changed
+
+    def add(self, user_id):
+        with self._lock:
+            self._ids = self._ids | {int(user_id)}
+
+    def discard(self, user_id):
+        with self._lock:
+            self._ids = self._ids - {int(user_id)}
+
+    def claims_changed(self, user_id, changed_at):
+        with self._lock:
+            self._claims_changed = {**self._claims_changed, int(user_id): changed_at.timestamp()}
+
+    def clear(self):
+        """Forget the loaded set; the next check reloads it."""
+        with self._lock:
+            self._ids = frozenset()
+            self._claims_changed = {}
+            self._loaded_at = None
+
+
+suspended_users = SuspendedUsers()
+
+
+class RevokedTokens:
+    """
+    Refresh-token revocation store with a Bloom-filter front.
+
+    Most tokens checked were never revoked; for those the filter answers
+    without touching the database. A filter hit is confirmed with a unique
+    key lookup. Each process pulls revocations made elsewhere every
+    ``REFRESH_SECONDS`` by id, so clock skew between servers cannot hide
+    any. Ids are assigned before commit, so a slow transaction can commit
+    below the highest id already seen; every pull re-reads the
+    ``PULL_OVERLAP`` ids under it to catch those. The filter is rebuilt
+    every ``REBUILD_SECONDS`` so purged tokens drop out of it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+
+    @property
+    def config(self):
+        return settings.REVOKED_TOKENS
+
+    def revoke(self, jti, expires_at):
+        jti = uuid.UUID(str(jti))
+        RevokedTokenModel.objects.bulk_create(
+            [RevokedTokenModel(jti=jti, expires_at=expires_at)], ignore_conflicts=True
+        )
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti.hex)
+
+    def is_revoked(self, jti):
+        try:
+            jti = uuid.UUID(str(jti))
+        except ValueError:
+            return True
+        self._maybe_refresh()
+        if jti.hex not in self._bloom:
+            return False
+        return RevokedTokenModel.objects.filter(
+            jti=jti, expires_at__gt=timezone.now()
+        ).exists()
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._bloom is None or now - self._built_at >= self.config["REBUILD_SECONDS"]:
+                self._rebuild(now)
+            elif now - self._refreshed_at >= self.config["REFRESH_SECONDS"]:
+                self._pull(now)
+
+    def _rebuild(self, now):
+        # Read first, so rows added during the rebuild are pulled next time.
+        last_id = RevokedTokenModel.objects.aggregate(last=Max("pk"))["last"] or 0
+        live = RevokedTokenModel.objects.filter(expires_at__gt=timezone.now())
+        capacity = max(self.config["BLOOM_CAPACITY"], 2 * live.count())
+        self._bloom = BloomFilter(capacity, self.config["BLOOM_ERROR_RATE"])
+        for jti in live.values_list("jti", flat=True).iterator(chunk_size=5000):
+            self._bloom.add(jti.hex)
+        self._built_at = self._refreshed_at = now
+        self._last_id = last_id
+
+    def _pull(self, now):
+        floor = self._last_id - self.config["PULL_OVERLAP"]
+        recent = RevokedTokenModel.objects.filter(pk__gt=floor).values_list("pk", "jti")
+        for pk, jti in recent:
+            self._bloom.add(jti.hex)
+            self._last_id = max(self._last_id, pk)
+        self._refreshed_at = now
+
+    def reset(self):
+        """Drop the filter; the next check rebuilds it."""
+        with self._lock:
+            self._bloom = None
+
+    def purge_expired(self, batch_size=None):
+        """Delete expired rows in batches; returns the number deleted."""
+        batch_size = batch_size or self.config["PURGE_BATCH_SIZE"]
+        deleted = 0
+        while True:
+            batch = list(
+                RevokedTokenModel.objects.filter(expires_at__lte=timezone.now())
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch:
+                return deleted
+            deleted += RevokedTokenModel.objects.filter(pk__in=batch).delete()[0]
+
+
+revoked_tokens = RevokedTokens()
@@ -1,7 +1,68 @@
 from users.models import CustomUser
+from users.profiles import profile_data
 from rest_framework import serializers
-class UserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model= CustomUser
-        fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'is_active']
-        read_only= ["id"]
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .revocation import revoked_tokens
+from .tokens import USER_CLAIMS, LoginRefreshToken
+
+
+class UserSerializer(serializers.Serializer):
+    """
+    Read-only user payload. The fields document the shape; the output comes
+    from ``users.profiles.profile_data`` without building them per call.
+    """
+    id = serializers.IntegerField(read_only=True)
+    email = serializers.EmailField(read_only=True)
+    first_name = serializers.CharField(read_only=True)
+    last_name = serializers.CharField(read_only=True)
+    full_name = serializers.CharField(read_only=True)
+    is_active = serializers.BooleanField(read_only=True)
+
+    def to_representation(self, instance):
+        return profile_data(instance)
+
+
+def revoke_refresh_token(refresh):
+    revoked_tokens.revoke(refresh[api_settings.JTI_CLAIM], datetime_from_epoch(refresh["exp"]))
+
+
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """
+    Refresh that honours revocations and re-reads the user's status claims.
+
+    With ``ROTATE_REFRESH_TOKENS`` and ``BLACKLIST_AFTER_ROTATION`` the old
+    refresh token is revoked when a new one is issued.
+    """
+    token_class = LoginRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if revoked_tokens.is_revoked(refresh.get(api_settings.JTI_CLAIM)):
+            raise TokenError(_("Token is revoked"))
+
+        user = (
+            CustomUser.objects.only("id", *USER_CLAIMS)
+            .filter(pk=refresh.get(api_settings.USER_ID_CLAIM))
+            .first()
+        )
+        if user is None or not user.is_active or user.is_suspended:
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revoke_refresh_token(refresh)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
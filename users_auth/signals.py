@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import CustomUser
+from .revocation import suspended_users
+from .throttling import forget_unknown_emails
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and "email" not in update_fields:
+        return
+    # A new account (or a changed email) must not keep failing from the
+    # unknown-email cache.
+    forget_unknown_emails([instance.email])
+
+
+@receiver(post_save, sender=CustomUser)
+def user_suspension_changed(sender, instance, **kwargs):
+    # Applies suspensions made in this process without waiting for a reload.
+    if instance.is_suspended:
+        suspended_users.add(instance.pk)
+    else:
+        suspended_users.discard(instance.pk)
+
+
+# Flags copied into access tokens whose loss must outdate the tokens
+TRUSTED_CLAIMS = ("is_active", "is_staff")
+
+
+@receiver(pre_save, sender=CustomUser)
+def user_claims_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._claims_changed = False
+    if not instance.pk or raw:
+        return
+    if update_fields is not None and not set(TRUSTED_CLAIMS) & set(update_fields):
+        return
+    stored = sender.objects.filter(pk=instance.pk).values_list(*TRUSTED_CLAIMS).first()
+    # Only a lost flag matters; tokens claiming less than the user has are harmless.
+    instance._claims_changed = stored is not None and any(
+        was and not getattr(instance, claim) for claim, was in zip(TRUSTED_CLAIMS, stored)
+    )
+
+
+@receiver(post_save, sender=CustomUser)
+def user_claims_changed(sender, instance, **kwargs):
+    # Recorded for other processes, and applied here without waiting for a
+    # reload, so a deactivated or demoted user's access tokens stop working.
+    if getattr(instance, "_claims_changed", False):
+        instance.claims_changed_at = timezone.now()
+        sender.objects.filter(pk=instance.pk).update(claims_changed_at=instance.claims_changed_at)
+        suspended_users.claims_changed(instance.pk, instance.claims_changed_at)
@@ -1,3 +1,397 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.utils import timezone
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.testing import assert_within_budget
+from users.models import CustomUser
+from .bloom import BloomFilter
+from .models import RevokedTokenModel
+from .revocation import revoked_tokens, suspended_users
+from .tokens import LoginRefreshToken
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class LoginApiViewTests(TestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email="candidate@example.com",
+            password="s3cret-pass",
+            first_name="Ada",
+            last_name="Lovelace",
+            is_active=True,
+        )
+
+    def login(self, email="candidate@example.com", password="s3cret-pass"):
+        return self.client.post(reverse("login"), {"email": email, "password": password})
+
+    def test_successful_login_reads_once_and_writes_last_login_only(self):
+        with self.assertNumQueries(2) as ctx:
+            response = self.login()
+
+        self.assertEqual(response.status_code, 200)
+        assert_within_budget(response)
+        self.assertIn("access", response.data)
+        self.assertEqual(response.data["user"]["full_name"], "Ada Lovelace")
+        update = ctx.captured_queries[1]["sql"]
+        self.assertTrue(update.startswith("UPDATE"))
+        self.assertIn('SET "last_login"', update)
+        self.assertNotIn('"full_name"', update)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_wrong_password(self):
+        response = self.login(password="nope")
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_email(self):
+        response = self.login(email="ghost@example.com")
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_and_suspended_users_skip_the_hash(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_suspended=True)
+        with mock.patch.object(CustomUser, "check_password") as check_password:
+            response = self.login()
+        check_password.assert_not_called()
+        self.assertIn("suspended", str(response.data))
+
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        with mock.patch.object(CustomUser, "check_password") as check_password:
+            response = self.login()
+        check_password.assert_not_called()
+        self.assertIn("not active", str(response.data))
+
+    def test_missing_password(self):
+        response = self.client.post(reverse("login"), {"email": "candidate@example.com"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], "Password is required.")
+
+    def test_non_string_email(self):
+        response = self.client.post(
+            reverse("login"), {"email": 5, "password": "s3cret-pass"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    LOGIN_THROTTLE={
+        "CACHE": "throttle",
+        "IP_CAPACITY": 5,
+        "IP_PERIOD": 60,
+        "EMAIL_CAPACITY": 2,
+        "EMAIL_PERIOD": 60,
+        "UNKNOWN_EMAIL_TTL": 60,
+    },
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        self.client = APIClient()
+        CustomUser.objects.create_user(
+            email="victim@example.com", password="right-pass", first_name="V", is_active=True,
+        )
+
+    def login(self, email, password="wrong", ip="10.0.0.1"):
+        return self.client.post(
+            reverse("login"), {"email": email, "password": password}, REMOTE_ADDR=ip
+        )
+
+    def test_email_bucket_rejects_before_any_query(self):
+        self.login("victim@example.com")
+        self.login("Victim@example.com ")
+        with self.assertNumQueries(0):
+            response = self.login("victim@example.com", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_ip_bucket(self):
+        for i in range(5):
+            self.assertNotEqual(self.login(f"user{i}@example.com").status_code, 429)
+        self.assertEqual(self.login("other@example.com").status_code, 429)
+        self.assertNotEqual(self.login("other@example.com", ip="10.0.0.9").status_code, 429)
+
+    def test_successful_logins_do_not_charge_the_email(self):
+        for i in range(4):
+            response = self.login("victim@example.com", "right-pass", ip=f"10.0.1.{i}")
+            self.assertEqual(response.status_code, 200)
+        self.login("victim@example.com", ip="10.0.1.9")
+        self.assertEqual(self.login("victim@example.com", "right-pass").status_code, 200)
+
+    def test_forwarded_for_is_ignored_without_num_proxies(self):
+        for i in range(5):
+            self.client.post(reverse("login"), {"email": f"u{i}@example.com", "password": "x"},
+                             REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=f"192.0.2.{i}")
+        response = self.client.post(reverse("login"), {"email": "u@example.com", "password": "x"},
+                                    REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="192.0.2.99")
+        self.assertEqual(response.status_code, 429)
+
+    def test_unknown_email_is_answered_from_cache(self):
+        self.assertEqual(self.login("ghost@example.com").status_code, 401)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.login("ghost@example.com", ip="10.0.0.3").status_code, 401)
+
+    def test_padded_email_shares_the_unknown_email_entry(self):
+        self.assertEqual(self.login(" Ghost@example.com").status_code, 401)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.login("ghost@example.com", ip="10.0.0.3").status_code, 401)
+        response = self.login(" victim@example.com ", "right-pass", ip="10.0.0.5")
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_account_clears_unknown_email(self):
+        self.login("late@example.com")
+        CustomUser.objects.create_user(
+            email="late@example.com", password="late-pass", first_name="L", is_active=True,
+        )
+        response = self.login("late@example.com", password="late-pass", ip="10.0.0.4")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    ROOT_URLCONF="core.asgi_urls",
+)
+class AsyncLoginTests(TestCase):
+    def setUp(self):
+        caches["throttle"].clear()
+        self.client = AsyncClient()
+        self.user = CustomUser.objects.create_user(
+            email="async@example.com", password="s3cret-pass", first_name="Ada", is_active=True,
+        )
+
+    def test_async_view_is_routed(self):
+        self.assertEqual(reverse("async-login"), reverse("login"))
+
+    async def test_login(self):
+        response = await self.client.post(
+            reverse("login"),
+            {"email": "async@example.com", "password": "s3cret-pass"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        assert_within_budget(response)
+        data = response.json()
+        self.assertIn("access", data)
+        self.assertEqual(data["user"]["email"], "async@example.com")
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertIsNotNone(user.last_login)
+
+    async def test_wrong_password_and_unknown_email(self):
+        for email, password in [("async@example.com", "nope"), ("ghost@example.com", "x")]:
+            response = await self.client.post(
+                reverse("login"), {"email": email, "password": password},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 401)
+
+    async def test_missing_password(self):
+        response = await self.client.post(
+            reverse("login"), {"email": "async@example.com"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Password is required.")
+
+    async def test_non_string_email(self):
+        response = await self.client.post(
+            reverse("login"), {"email": 5, "password": "s3cret-pass"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_legacy_hash_is_upgraded(self):
+        with override_settings(
+            PASSWORD_HASHERS=[
+                "users.hashers.PBKDF2PasswordHasher",
+                "django.contrib.auth.hashers.MD5PasswordHasher",
+            ],
+            PASSWORD_PBKDF2_ITERATIONS=1000,
+        ):
+            response = await self.client.post(
+                reverse("login"), {"email": "async@example.com", "password": "s3cret-pass"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+
+
+class WhoAmIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({"id": request.user.id, "staff": request.user.is_staff})
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        suspended_users.clear()
+        self.user = CustomUser.objects.create_user(
+            email="reader@example.com", password=None, first_name="Rea", last_name="Der",
+            is_active=True,
+        )
+
+    def get(self, token):
+        request = APIRequestFactory().get("/whoami/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return WhoAmIView.as_view()(request)
+
+    def test_reads_cost_no_auth_queries(self):
+        access = LoginRefreshToken.for_user(self.user).access_token
+        suspended_users.reload()
+        with self.assertNumQueries(0):
+            response = self.get(access)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"id": self.user.pk, "staff": False})
+
+    def test_suspension_after_login_is_enforced(self):
+        access = LoginRefreshToken.for_user(self.user).access_token
+        self.user.is_suspended = True
+        self.user.save()
+        self.assertEqual(self.get(access).status_code, 401)
+
+        self.user.is_suspended = False
+        self.user.save()
+        self.assertEqual(self.get(access).status_code, 200)
+
+    def test_suspension_from_another_process_after_reload(self):
+        access = LoginRefreshToken.for_user(self.user).access_token
+        CustomUser.objects.filter(pk=self.user.pk).update(is_suspended=True)
+        suspended_users.reload()
+        self.assertEqual(self.get(access).status_code, 401)
+
+    def save_at(self, seconds_ago):
+        at = timezone.now() - timedelta(seconds=seconds_ago)
+        with mock.patch("users_auth.signals.timezone.now", return_value=at):
+            self.user.save()
+
+    def test_demotion_outdates_earlier_tokens(self):
+        self.user.is_staff = True
+        self.save_at(20)
+        access = LoginRefreshToken.for_user(self.user).access_token
+        access["iat"] -= 10
+        self.assertEqual(self.get(access).data["staff"], True)
+
+        self.user.is_staff = False
+        self.save_at(5)
+        self.assertEqual(self.get(access).status_code, 401)
+        fresh = LoginRefreshToken.for_user(self.user).access_token
+        self.assertEqual(self.get(fresh).data["staff"], False)
+
+        # Saves that leave the claims alone don't outdate anything.
+        self.user.last_name = "Reader"
+        self.user.save()
+        self.assertEqual(self.get(fresh).status_code, 200)
+
+    def test_deactivation_from_another_process_after_reload(self):
+        access = LoginRefreshToken.for_user(self.user).access_token
+        suspended_users.reload()
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            is_active=False, claims_changed_at=timezone.now() + timedelta(seconds=1)
+        )
+        self.assertEqual(self.get(access).status_code, 200)
+        suspended_users.reload()
+        self.assertEqual(self.get(access).status_code, 401)
+
+    def test_tokens_without_claims_fall_back_to_the_database(self):
+        access = RefreshToken.for_user(self.user).access_token
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(access).status_code, 200)
+
+
+class RefreshTokenRevocationTests(TestCase):
+    def setUp(self):
+        revoked_tokens.reset()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email="refresh@example.com", password=None, first_name="Re", is_active=True,
+        )
+        self.refresh = LoginRefreshToken.for_user(self.user)
+
+    def refresh_access(self, token=None):
+        return self.client.post(reverse("token-refresh"), {"refresh": str(token or self.refresh)})
+
+    def test_unrevoked_refresh_skips_the_revocation_table(self):
+        other = LoginRefreshToken.for_user(self.user)
+        revoked_tokens.revoke(other["jti"], timezone.now() + timedelta(days=1))
+        self.refresh_access()  # warm the filter
+        # only the user status lookup remains
+        with self.assertNumQueries(1):
+            response = self.refresh_access()
+        self.assertEqual(response.status_code, 200)
+        assert_within_budget(response)
+        self.assertIn("access", response.data)
+
+    def test_logout_revokes_the_refresh_token(self):
+        response = self.client.post(reverse("logout"), {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+        response = self.refresh_access()
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocations_from_other_processes_are_pulled(self):
+        self.refresh_access()
+        RevokedTokenModel.objects.create(
+            jti=self.refresh["jti"], expires_at=timezone.now() + timedelta(days=1)
+        )
+        with override_settings(REVOKED_TOKENS={**settings.REVOKED_TOKENS, "REFRESH_SECONDS": 0}):
+            self.assertEqual(self.refresh_access().status_code, 401)
+
+    def test_pull_does_not_depend_on_the_clock(self):
+        self.refresh_access()
+        # Revoked by a server whose clock runs an hour behind.
+        RevokedTokenModel.objects.create(
+            jti=self.refresh["jti"], expires_at=timezone.now() + timedelta(days=1)
+        )
+        RevokedTokenModel.objects.update(revoked_at=timezone.now() - timedelta(hours=1))
+        with override_settings(REVOKED_TOKENS={**settings.REVOKED_TOKENS, "REFRESH_SECONDS": 0}):
+            self.assertEqual(self.refresh_access().status_code, 401)
+
+    def test_pull_catches_ids_committed_out_of_order(self):
+        self.refresh_access()
+        other = LoginRefreshToken.for_user(self.user)
+        expires_at = timezone.now() + timedelta(days=1)
+        with override_settings(REVOKED_TOKENS={**settings.REVOKED_TOKENS, "REFRESH_SECONDS": 0}):
+            RevokedTokenModel.objects.create(pk=10, jti=other["jti"], expires_at=expires_at)
+            self.refresh_access()
+            # A slower transaction commits a lower id after the pull saw 10.
+            RevokedTokenModel.objects.create(pk=9, jti=self.refresh["jti"], expires_at=expires_at)
+            self.assertEqual(self.refresh_access().status_code, 401)
+
+    def test_refresh_picks_up_suspension(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(is_suspended=True)
+        self.assertEqual(self.refresh_access().status_code, 401)
+
+    def test_purge_deletes_only_expired_rows_in_batches(self):
+        now = timezone.now()
+        for _ in range(5):
+            expired = LoginRefreshToken.for_user(self.user)
+            revoked_tokens.revoke(expired["jti"], now - timedelta(seconds=1))
+        revoked_tokens.revoke(self.refresh["jti"], now + timedelta(days=1))
+
+        call_command("purge_revoked_tokens", batch_size=2, verbosity=0)
+
+        self.assertEqual(RevokedTokenModel.objects.count(), 1)
+        self.assertEqual(self.refresh_access().status_code, 401)
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        members = [f"member-{i}" for i in range(1000)]
+        for member in members:
+            bloom.add(member)
+
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
@@ -0,0 +1,170 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from users.models import CustomUser
+
+
+def _config():
+    return settings.LOGIN_THROTTLE
+
+
+def _cache():
+    return caches[_config()["CACHE"]]
+
+
+def _email_key(prefix, email):
+    digest = hashlib.sha1(CustomUser.objects.lookup_email(str(email)).encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+class TokenBucket:
+    """
+    Token bucket kept in a Django cache.
+
+    ``capacity`` requests are allowed in a burst and the bucket refills at
+    ``capacity / period`` tokens per second. The read-modify-write is not
+    atomic, so concurrent requests may occasionally get a token too many;
+    that is fine for abuse protection.
+    """
+
+    def __init__(self, prefix, capacity, period):
+        self.prefix = prefix
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.period = period
+
+    def _tokens(self, state, now):
+        if state is None:
+            return self.capacity
+        tokens, updated = state
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def _wait(self, tokens):
+        return 0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def _take(self, state, now):
+        """``(new_state, seconds_to_wait)`` after taking a token from ``state``"""
+        tokens = self._tokens(state, now)
+        return (tokens - 1 if tokens >= 1 else tokens, now), self._wait(tokens)
+
+    def peek(self, key, cache=None):
+        """The seconds to wait for a token, or 0 when one is left; takes none."""
+        cache = cache or _cache()
+        return self._wait(self._tokens(cache.get(f"{self.prefix}:{key}"), time.time()))
+
+    async def apeek(self, key, cache=None):
+        cache = cache or _cache()
+        return self._wait(self._tokens(await cache.aget(f"{self.prefix}:{key}"), time.time()))
+
+    def consume(self, key, cache=None):
+        """Take a token; return the seconds to wait, or 0 when allowed."""
+        cache = cache or _cache()
+        cache_key = f"{self.prefix}:{key}"
+        state, wait = self._take(cache.get(cache_key), time.time())
+        cache.set(cache_key, state, self.period)
+        return wait
+
+    async def aconsume(self, key, cache=None):
+        cache = cache or _cache()
+        cache_key = f"{self.prefix}:{key}"
+        state, wait = self._take(await cache.aget(cache_key), time.time())
+        await cache.aset(cache_key, state, self.period)
+        return wait
+
+
+def _email_bucket():
+    config = _config()
+    return TokenBucket("login:email", config["EMAIL_CAPACITY"], config["EMAIL_PERIOD"])
+
+
+class LoginRateThrottle(BaseThrottle):
+    """
+    Per-IP and per-email token buckets for the login endpoint.
+
+    Runs in DRF's ``initial()``, so throttled requests are rejected before
+    the view touches the database or hashes a password. Every request takes
+    a token from its IP's bucket. An email's bucket is only charged by
+    failed logins (``record_failed_login``), so someone who does not know
+    the password cannot lock its owner out; it rejects every login once empty.
+
+    The client IP is REMOTE_ADDR. Behind reverse proxies, set NUM_PROXIES so
+    the address is taken from X-Forwarded-For, which clients can otherwise
+    forge to get a fresh bucket per request.
+    """
+
+    def __init__(self):
+        config = _config()
+        self.ip_bucket = TokenBucket("login:ip", config["IP_CAPACITY"], config["IP_PERIOD"])
+        self.email_bucket = _email_bucket()
+        self.retry_after = None
+
+    def allow_request(self, request, view):
+        wait = self.check(self.get_ident(request), request.data.get("email"))
+        self.retry_after = wait or None
+        return not wait
+
+    def get_ident(self, request):
+        # DRF keys on the whole X-Forwarded-For header when NUM_PROXIES is unset.
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get("REMOTE_ADDR")
+        return super().get_ident(request)
+
+    def check(self, ident, email):
+        """
+        Take a token for the client and check the email has failures left;
+        return the seconds to wait.
+        """
+        cache = _cache()
+        wait = self.ip_bucket.consume(ident, cache)
+        if not wait and isinstance(email, str) and email:
+            wait = self.email_bucket.peek(_email_key("addr", email), cache)
+        return wait
+
+    async def acheck(self, ident, email):
+        """``check()`` for async views, with the async cache API"""
+        cache = _cache()
+        wait = await self.ip_bucket.aconsume(ident, cache)
+        if not wait and isinstance(email, str) and email:
+            wait = await self.email_bucket.apeek(_email_key("addr", email), cache)
+        return wait
+
+    def wait(self):
+        return self.retry_after
+
+
+def record_failed_login(email):
+    """Charge a failed login (unknown email, wrong password) to the email's bucket"""
+    _email_bucket().consume(_email_key("addr", email))
+
+
+async def arecord_failed_login(email):
+    await _email_bucket().aconsume(_email_key("addr", email))
+
+
+# ------------------------------
+# Negative cache of emails without an account
+# ------------------------------
+# Keyed by CustomUserManager.lookup_email, like the login lookup.
+def is_unknown_email(email):
+    return _cache().get(_email_key("login:unknown", email)) is not None
+
+
+async def ais_unknown_email(email):
+    return await _cache().aget(_email_key("login:unknown", email)) is not None
+
+
+def remember_unknown_email(email):
+    _cache().set(_email_key("login:unknown", email), 1, _config()["UNKNOWN_EMAIL_TTL"])
+
+
+async def aremember_unknown_email(email):
+    await _cache().aset(_email_key("login:unknown", email), 1, _config()["UNKNOWN_EMAIL_TTL"])
+
+
+def forget_unknown_emails(emails):
+    _cache().delete_many([_email_key("login:unknown", email) for email in emails])
@@ -0,0 +1,15 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# User fields copied into the tokens so authentication needs no user query.
+USER_CLAIMS = ("is_active", "is_suspended", "is_staff", "full_name")
+
+
+class LoginRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the user's status claims"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
@@ -1,7 +1,10 @@
 # users_auth/urls.py
 from django.urls import path
-from .views import LoginApiView
+from .views import LoginApiView, LogoutApiView, MeApiView, TokenRefreshApiView
 
 urlpatterns = [
     path('login/', LoginApiView.as_view(), name='login'),
+    path('token/refresh/', TokenRefreshApiView.as_view(), name='token-refresh'),
+    path('logout/', LogoutApiView.as_view(), name='logout'),
+    path('me/', MeApiView.as_view(), name='me'),
 ]
@@ -2,13 +2,34 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from django.contrib.auth.hashers import verify_password
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken,TokenError
+from rest_framework_simplejwt.views import TokenRefreshView
 # Create your views here.
+from core.metrics import Budget
 from users.models import CustomUser
-from .serializers import UserSerializer
+from users.profiles import PROFILE_FIELDS, get_profile
+from .serializers import RefreshTokenSerializer, UserSerializer, revoke_refresh_token
+from .throttling import (
+    LoginRateThrottle,
+    is_unknown_email,
+    record_failed_login,
+    remember_unknown_email,
+)
+from .tokens import LoginRefreshToken
+
+# Only the columns the login path reads; the rest of the row stays deferred.
+LOGIN_FIELDS = (*PROFILE_FIELDS, "password", "is_suspended", "is_staff")
+
 
 class LoginApiView(APIView):
+    authentication_classes = []
+    throttle_classes = [LoginRateThrottle]
+    budget = Budget(queries=2, duplicates=0)
+
     def post(self, request):
         email = request.data.get("email")
         password = request.data.get("password")
@@ -16,27 +37,42 @@ class LoginApiView(APIView):
             return Response({"message": "Email  is required."},
                             status=status.HTTP_400_BAD_REQUEST)
         if not password:
-             return Response({"message": "Email  is required."},
+             return Response({"message": "Password is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(email, str) or not isinstance(password, str):
+            return Response({"message": "Email and password must be strings."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        user_qs=CustomUser.objects.filter(email=email).first()
-        if not user_qs:
+        if is_unknown_email(email):
+            record_failed_login(email)
             return Response({"Message: email is invalid"}, status =status.HTTP_401_UNAUTHORIZED)
-        
-        
-        if not user_qs.check_password(password):
+        try:
+            user_qs = CustomUser.objects.by_email(email).only(*LOGIN_FIELDS).get()
+        except CustomUser.DoesNotExist:
+            remember_unknown_email(email)
+            record_failed_login(email)
+            return Response({"Message: email is invalid"}, status =status.HTTP_401_UNAUTHORIZED)
+
+        # Cheap flag checks run before the expensive password hash.
+        if not user_qs.is_active:
+            return Response({"Message: You are not active.With otp active your active"})
+        if user_qs.is_suspended:
+            return Response({"Message: You are suspended from site .Contact with admin"})
+
+        is_correct, must_update = verify_password(password, user_qs.password)
+        if not is_correct:
+            record_failed_login(email)
             return Response({"Message: Password is wrong .Try with right password"},status=status.HTTP_401_UNAUTHORIZED)
-        
-        if user_qs:
-            if not user_qs.is_active:
-                return Response({"Message: You are not active.With otp active your active"})
-            if user_qs.is_suspended:
-                return Response({"Message: You are suspended from site .Contact with admin"})
-        
-        
-        user_qs.last_login= timezone.now()
-        user_qs.save()
-        token=RefreshToken.for_user(user_qs)
+
+        # One UPDATE instead of save(), which rewrote every column; a re-hash
+        # (as check_password() would do) goes into the same statement.
+        user_qs.last_login = timezone.now()
+        changes = {"last_login": user_qs.last_login}
+        if must_update:
+            user_qs.set_password(password)
+            changes["password"] = user_qs.password
+        CustomUser.objects.filter(pk=user_qs.pk).update(**changes)
+        token=LoginRefreshToken.for_user(user_qs)
         access= str(token.access_token)
         refresh= str(token)
         user=UserSerializer(user_qs).data
@@ -52,3 +88,33 @@ class LoginApiView(APIView):
         
         return Response(data, status=status.HTTP_200_OK)
 
+
+class TokenRefreshApiView(TokenRefreshView):
+    serializer_class = RefreshTokenSerializer
+    budget = Budget(queries=1, duplicates=0)
+
+
+class MeApiView(APIView):
+    """The signed-in user's profile, served from the profile cache"""
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=1, duplicates=0)
+
+    def get(self, request):
+        profile = get_profile(request.user.id)
+        if profile is None:
+            raise NotFound()
+        return Response(profile)
+
+
+class LogoutApiView(APIView):
+    """Revoke a refresh token so it can no longer mint access tokens"""
+    authentication_classes = []
+
+    def post(self, request):
+        try:
+            refresh = RefreshToken(request.data.get("refresh"))
+        except TokenError:
+            return Response({"message": "A valid refresh token is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        revoke_refresh_token(refresh)
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
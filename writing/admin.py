@@ -1,3 +1,93 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import (
+    WritingAnswerModel,
+    WritingBandHistogramModel,
+    WritingEvalution,
+    WritingExamModel,
+    WritingScoreLedgerModel,
+    WritingTaskImageVariant,
+    WritingTaskModel,
+    WrintingBandScoreModel,
+)
+
+# Every changelist joins the relations its columns and __str__ read, and
+# skips the unfiltered COUNT(*) that large tables make expensive. FK inputs
+# use autocomplete instead of rendering every related row in a <select>.
+
+
+class WritingModelAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # ChangeList skips list_select_related when the default manager has
+        # already called select_related(), so apply it here.
+        queryset = super().get_queryset(request)
+        if self.list_select_related:
+            queryset = queryset.select_related(*self.list_select_related)
+        return queryset
+
+
+@admin.register(WritingExamModel)
+class WritingExamModelAdmin(WritingModelAdmin):
+    list_display = ('id', 'title', 'tag')
+    list_filter = ('tag',)
+    search_fields = ('title',)
+
+
+@admin.register(WritingTaskModel)
+class WritingTaskModelAdmin(WritingModelAdmin):
+    list_display = ('id', 'exam', 'task', 'type')
+    list_filter = ('task', 'type')
+    list_select_related = ('exam',)
+    search_fields = ('exam__title', 'the_question')
+    autocomplete_fields = ('exam',)
+
+
+@admin.register(WritingTaskImageVariant)
+class WritingTaskImageVariantAdmin(WritingModelAdmin):
+    list_display = ('id', 'task', 'format', 'width', 'height', 'size')
+    list_filter = ('format',)
+    list_select_related = ('task__exam',)
+    readonly_fields = ('task', 'source_hash', 'format', 'width', 'height', 'size', 'file')
+
+
+@admin.register(WritingAnswerModel)
+class WritingAnswerModelAdmin(WritingModelAdmin):
+    list_display = ('id', 'user', 'exam', 'answer', 'weight')
+    list_select_related = ('user', 'exam', 'answer__exam')
+    search_fields = ('user__email', 'exam__title')
+    autocomplete_fields = ('user', 'exam', 'answer')
+
+
+@admin.register(WritingEvalution)
+class WritingEvalutionAdmin(WritingModelAdmin):
+    list_display = ('id', 'evalute', 'overall_band')
+    list_select_related = ('evalute__user', 'evalute__exam', 'evalute__answer')
+    search_fields = ('evalute__user__email',)
+    autocomplete_fields = ('evalute',)
+    readonly_fields = ('overall_band',)
+
+
+@admin.register(WrintingBandScoreModel)
+class WrintingBandScoreModelAdmin(WritingModelAdmin):
+    list_display = ('id', 'user', 'exam', 'final_band')
+    list_select_related = ('user', 'exam')
+    search_fields = ('user__email', 'exam__title')
+    autocomplete_fields = ('user', 'exam')
+
+
+@admin.register(WritingScoreLedgerModel)
+class WritingScoreLedgerModelAdmin(WritingModelAdmin):
+    list_display = ('id', 'user', 'exam', 'weighted_sum', 'total_weight', 'final_band')
+    list_select_related = ('user', 'exam')
+    search_fields = ('user__email', 'exam__title')
+    autocomplete_fields = ('user', 'exam')
+    readonly_fields = ('weighted_sum', 'total_weight')
+
+
+@admin.register(WritingBandHistogramModel)
+class WritingBandHistogramModelAdmin(WritingModelAdmin):
+    list_display = ('id', 'scope', 'bucket', 'count')
+    search_fields = ('scope',)
+    readonly_fields = ('scope', 'bucket', 'count')
@@ -0,0 +1,90 @@
+"""
+Async exam endpoints for the ASGI deployment (core/asgi_urls.py).
+
+Same contracts as ``ExamDetailApiView`` and ``ExamSubmissionApiView``. A
+cached exam is read with the async cache API and idempotent replays with the
+async ORM; only a cache miss and a new submission, which needs a
+transaction, run the sync code in a thread.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.metrics import budget
+from users_auth.authentication import authenticate_async
+from .catalog import aexam_payload, make_etag
+from .serializers import SubmissionSerializer
+from .services import SubmissionError, areplayed_submission, submit_attempt
+from .views import _image_params, _not_modified, _submission_data, _with_etag, _with_images
+
+
+def _unauthorized(detail):
+    # Same body as DRF's exception handler gives for these errors.
+    response = JsonResponse(detail if isinstance(detail, dict) else {"detail": detail}, status=401)
+    response["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
+
+
+async def _authenticated_user(request):
+    """``(user, None)``, or ``(None, response)`` when the request may not proceed"""
+    try:
+        user = await authenticate_async(request)
+    except AuthenticationFailed as exc:
+        return None, _unauthorized(exc.detail)
+    if user is None:
+        return None, _unauthorized("Authentication credentials were not provided.")
+    return user, None
+
+
+@budget(queries=4, duplicates=0, seconds=0.25)
+@require_GET
+async def exam_detail(request, pk):
+    user, error = await _authenticated_user(request)
+    if error:
+        return error
+    payload = await aexam_payload(pk)
+    if payload is None:
+        raise Http404
+    width, fmt = _image_params(request)
+    etag = make_etag([payload["etag"], width, fmt])
+    if _not_modified(request, etag):
+        return _with_etag(HttpResponseNotModified(), etag)
+    return _with_etag(JsonResponse(_with_images(payload["data"], width, fmt)), etag)
+
+
+@budget(queries=8, duplicates=0)
+@csrf_exempt
+@require_POST
+async def submit_exam(request, pk):
+    user, error = await _authenticated_user(request)
+    if error:
+        return error
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "JSON parse error."}, status=400)
+
+    serializer = SubmissionSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    key = request.headers.get("Idempotency-Key") or serializer.validated_data.get(
+        "idempotency_key"
+    )
+    if key and len(key) > 64:
+        return JsonResponse({"message": "Idempotency key is too long."}, status=400)
+
+    try:
+        replayed = await areplayed_submission(user.id, pk, key) if key else None
+        if replayed:
+            submission, answers = replayed
+            return JsonResponse(_submission_data(submission, answers))
+        submission, answers, created = await sync_to_async(submit_attempt)(
+            user.id, pk, serializer.validated_data["answers"], idempotency_key=key
+        )
+    except SubmissionError as exc:
+        return JsonResponse({"message": str(exc)}, status=exc.status)
+    return JsonResponse(_submission_data(submission, answers), status=201 if created else 200)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import WritingExamModel
+from .serializers import WritingExamSerializer
+
+
+def exam_cache_key(exam_id):
+    return f"writing:exam:{exam_id}"
+
+
+def make_etag(payload):
+    body = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder)
+    return '"%s"' % hashlib.md5(body.encode()).hexdigest()
+
+
+def exam_payloads(exam_ids):
+    """
+    Serialized exams (with their tasks) by id, as ``{"etag", "data"}``.
+
+    Cached entries come from one ``get_many``; misses are loaded with
+    one query per prefetched relation and written back. Unknown ids are left
+    out of the result.
+    """
+    keys = {exam_cache_key(exam_id): exam_id for exam_id in exam_ids}
+    cached = cache.get_many(keys)
+    payloads = {keys[key]: value for key, value in cached.items()}
+
+    missing = [exam_id for exam_id in exam_ids if exam_id not in payloads]
+    if missing:
+        exams = WritingExamModel.objects.filter(pk__in=missing).prefetch_related(
+            "all_questions", "all_questions__image_variants"
+        )
+        fresh = {}
+        for exam in exams:
+            data = WritingExamSerializer(exam).data
+            payloads[exam.pk] = fresh[exam_cache_key(exam.pk)] = {
+                "etag": make_etag(data),
+                "data": data,
+            }
+        cache.set_many(fresh, settings.WRITING_CATALOG_CACHE_TIMEOUT)
+    return payloads
+
+
+async def aexam_payload(exam_id):
+    """``exam_payloads([exam_id]).get(exam_id)`` for async views; a cache hit skips the ORM"""
+    payload = await cache.aget(exam_cache_key(exam_id))
+    if payload is None:
+        payload = (await sync_to_async(exam_payloads)([exam_id])).get(exam_id)
+    return payload
+
+
+def invalidate_exam(exam_id):
+    # Again on commit, in case a concurrent read cached the old rows while
+    # the write was still in flight.
+    key = exam_cache_key(exam_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,193 @@
+"""
+Resized WebP/JPEG copies of Task 1 chart images.
+
+Saving an image task (or finishing its background upload) queues
+``generate_derivatives`` on a small worker pool. It reads the original once,
+hashes it, and stores one variant per configured width and format under a
+name derived from that hash, so tasks sharing the same chart share the files
+and the second one is done without encoding or uploading anything. Files no
+variant uses any more are deleted once a new image's variants are stored.
+``pick_variant`` chooses what the API hands to a client of a given width.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from .models import WritingTaskImageVariant, WritingTaskModel
+
+VARIANT_DIR = "images/writing/variants"
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return settings.IMAGE_DERIVATIVES
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config()["WORKERS"], thread_name_prefix="image-derivatives"
+            )
+        return _executor
+
+
+def _run(task_id):
+    try:
+        generate_derivatives(task_id)
+    finally:
+        connection.close()
+
+
+def _log_failure(task_id, future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Image derivatives of task %s failed", task_id, exc_info=future.exception())
+
+
+def enqueue_derivatives(task_id):
+    """Generate in the worker pool; with ``WORKERS`` 0 it runs inline."""
+    if _config()["WORKERS"]:
+        _pool().submit(_run, task_id).add_done_callback(partial(_log_failure, task_id))
+    else:
+        generate_derivatives(task_id)
+
+
+def variant_name(source_hash, width, fmt):
+    return f"{VARIANT_DIR}/{source_hash[:40]}/{width}.{EXTENSIONS[fmt]}"
+
+
+def _encode(image, width, fmt):
+    from PIL import Image
+
+    resized = image.copy()
+    resized.thumbnail((width, width * 100), Image.Resampling.LANCZOS)
+    if fmt == "jpeg" and resized.mode not in ("RGB", "L"):
+        # JPEG has no alpha; charts are drawn on white.
+        background = Image.new("RGB", resized.size, "white")
+        background.paste(resized, mask=resized.convert("RGBA").getchannel("A"))
+        resized = background
+    out = io.BytesIO()
+    resized.save(out, PIL_FORMATS[fmt], quality=_config()["QUALITY"], optimize=True)
+    return resized.size, out.getvalue()
+
+
+def _render_variants(source, source_hash, storage):
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(source))
+    image.load()
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA")
+    # Never upscale; the original's width stands in for larger sizes.
+    widths = sorted({min(width, image.width) for width in _config()["WIDTHS"]})
+
+    variants = []
+    for fmt in _config()["FORMATS"]:
+        for width in widths:
+            (w, h), data = _encode(image, width, fmt)
+            name = storage.save(variant_name(source_hash, w, fmt), ContentFile(data))
+            variants.append({"format": fmt, "width": w, "height": h, "size": len(data), "file": name})
+    return variants
+
+
+def generate_derivatives(task_id):
+    """
+    Create the variants of a task's current image. Returns the number of
+    variants written, 0 when they were already up to date.
+    """
+    task = WritingTaskModel.objects.select_related(None).filter(pk=task_id).first()
+    if task is None or task.type != "image" or not task.image_file:
+        return 0
+    with task.image_file.open("rb") as original:
+        source = original.read()
+    source_hash = hashlib.sha256(source).hexdigest()
+
+    current = WritingTaskImageVariant.objects.filter(task_id=task_id)
+    if current.exists() and not current.exclude(source_hash=source_hash).exists():
+        return 0
+
+    shared = list(
+        WritingTaskImageVariant.objects.filter(source_hash=source_hash)
+        .exclude(task_id=task_id)
+        .values("task_id", "format", "width", "height", "size", "file")
+    )
+    storage = WritingTaskImageVariant._meta.get_field("file").storage
+    rendered = []
+    if shared:
+        # Same chart as another task: reuse its files.
+        first_task = shared[0]["task_id"]
+        variants = [row for row in shared if row["task_id"] == first_task]
+    else:
+        variants = _render_variants(source, source_hash, storage)
+        rendered = [row["file"] for row in variants]
+
+    with transaction.atomic():
+        replaced = list(current.values_list("file", flat=True))
+        # An upsert, so concurrent runs for the same task (its save and its
+        # upload both queue one) don't trip the (task, format, width) constraint.
+        WritingTaskImageVariant.objects.bulk_create(
+            [
+                WritingTaskImageVariant(
+                    task_id=task_id,
+                    source_hash=source_hash,
+                    format=row["format"],
+                    width=row["width"],
+                    height=row["height"],
+                    size=row["size"],
+                    file=row["file"],
+                )
+                for row in variants
+            ],
+            update_conflicts=True,
+            unique_fields=["task", "format", "width"],
+            update_fields=["source_hash", "height", "size", "file"],
+        )
+        current.exclude(source_hash=source_hash).delete()
+        # Files of the replaced variants, and ours if a concurrent run won.
+        transaction.on_commit(partial(_delete_unused_files, storage, {*replaced, *rendered}))
+    # bulk_create sends no signals; the catalog embeds the variants.
+    from .catalog import invalidate_exam
+
+    invalidate_exam(task.exam_id)
+    return len(variants)
+
+
+def _delete_unused_files(storage, names):
+    """Delete the variant files among ``names`` that no variant uses any more."""
+    used = set(
+        WritingTaskImageVariant.objects.filter(file__in=names).values_list("file", flat=True)
+    )
+    for name in set(names) - used:
+        storage.delete(name)
+
+
+def pick_variant(variants, width=None, fmt="webp"):
+    """
+    The smallest variant of ``fmt`` at least ``width`` pixels wide, else the
+    widest one; without ``width`` the widest. Falls back to any format when
+    ``fmt`` has none. ``variants`` are serialized variant dicts.
+    """
+    candidates = [v for v in variants if v["format"] == fmt] or list(variants)
+    if not candidates:
+        return None
+    candidates.sort(key=lambda v: v["width"])
+    if width:
+        for variant in candidates:
+            if variant["width"] >= width:
+                return variant
+    return candidates[-1]
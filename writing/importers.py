@@ -0,0 +1,209 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from .models import WritingAnswerModel, WritingEvalution
+from .services import apply_ledger_deltas
+
+BAND_FIELDS = (
+    "task_response",
+    "coherence_cohesion",
+    "lexical_resource",
+    "grammatical_range_accuracy",
+)
+MIN_BAND = 0.0
+MAX_BAND = 9.0
+FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 500
+
+
+class ImportReport:
+    """Outcome of an evaluation import"""
+
+    def __init__(self):
+        self.created = 0
+        self.rejected = []
+        # Why the file could not be read to the end, if it could not
+        self.error = None
+
+    def reject(self, line, reason, row=None):
+        self.rejected.append({"line": line, "reason": reason, "row": row})
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "rejected_count": len(self.rejected),
+            "rejected": self.rejected,
+            "error": self.error,
+        }
+
+
+def guess_format(filename):
+    if filename and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def read_rows(stream, fmt="csv"):
+    """Yield ``(line_number, row_dict)`` lazily from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _parse_band(value):
+    band = float(value)
+    if not MIN_BAND <= band <= MAX_BAND or (band * 2) % 1:
+        raise ValueError
+    return band
+
+
+def _parse_row(row):
+    """Return ``(answer_id, bands)`` or raise ValueError with a reason."""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    try:
+        answer_id = int(row.get("answer") or row.get("evalute"))
+    except (TypeError, ValueError):
+        raise ValueError("answer must be a WritingAnswerModel id")
+
+    bands = []
+    for field in BAND_FIELDS:
+        try:
+            bands.append(_parse_band(row.get(field)))
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a band between 0 and 9 in steps of 0.5")
+    return answer_id, bands
+
+
+def _import_chunk(chunk, report, batch_size):
+    parsed = {}
+    for line, row in chunk:
+        try:
+            answer_id, bands = _parse_row(row)
+        except ValueError as exc:
+            report.reject(line, str(exc), row)
+            continue
+        if answer_id in parsed:
+            report.reject(line, "answer appears twice in the file", row)
+            continue
+        parsed[answer_id] = (line, row, bands)
+
+    # One lookup resolves every answer in the chunk and flags the ones that
+    # already carry an evaluation.
+    answers = {
+        pk: (user_id, exam_id, weight, evaluation_id)
+        for pk, user_id, exam_id, weight, evaluation_id in WritingAnswerModel.objects.filter(
+            pk__in=parsed
+        ).values_list("pk", "user_id", "exam_id", "weight", "evaluation__id")
+    }
+
+    pending = []
+    for answer_id, (line, row, bands) in parsed.items():
+        if answer_id not in answers:
+            report.reject(line, "answer does not exist", row)
+            continue
+        user_id, exam_id, weight, evaluation_id = answers[answer_id]
+        if evaluation_id is not None:
+            report.reject(line, "answer is already evaluated", row)
+            continue
+        pending.append((line, row, answer_id, bands, user_id, exam_id, weight))
+
+    while True:
+        try:
+            _write_evaluations(pending, batch_size)
+            break
+        except IntegrityError:
+            # A concurrent evaluation (or deletion) got to some answers
+            # first; drop those and retry until the write goes through.
+            still_open = _drop_taken_answers(pending, report)
+            if len(still_open) == len(pending):
+                raise
+            pending = still_open
+    report.created += len(pending)
+
+
+def _drop_taken_answers(pending, report):
+    """Reject the pending rows whose answer is now gone or evaluated."""
+    current = dict(
+        WritingAnswerModel.objects.filter(
+            pk__in=[answer_id for _, _, answer_id, *_ in pending]
+        ).values_list("pk", "evaluation__id")
+    )
+    still_open = []
+    for entry in pending:
+        line, row, answer_id = entry[:3]
+        if answer_id not in current:
+            report.reject(line, "answer does not exist", row)
+        elif current[answer_id] is not None:
+            report.reject(line, "answer is already evaluated", row)
+        else:
+            still_open.append(entry)
+    return still_open
+
+
+def _write_evaluations(pending, batch_size):
+    if not pending:
+        return
+    evaluations = []
+    deltas = defaultdict(lambda: [0.0, 0])
+    for _, _, answer_id, bands, user_id, exam_id, weight in pending:
+        overall_band = sum(bands) / len(bands)
+        evaluations.append(
+            WritingEvalution(
+                evalute_id=answer_id,
+                task_response=bands[0],
+                coherence_cohesion=bands[1],
+                lexical_resource=bands[2],
+                grammatical_range_accuracy=bands[3],
+                overall_band=overall_band,
+            )
+        )
+        delta = deltas[(user_id, exam_id)]
+        delta[0] += overall_band * weight
+        delta[1] += weight
+
+    # bulk_create skips WritingEvalution.save(), so the ledger is updated
+    # here for the whole chunk.
+    with transaction.atomic():
+        WritingEvalution.objects.bulk_create(evaluations, batch_size=batch_size)
+        apply_ledger_deltas(deltas)
+
+
+def import_evaluations(stream, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream evaluations from a CSV/JSONL text stream into the database.
+
+    Rows need ``answer`` (a WritingAnswerModel id) and the four criteria
+    bands. The file is processed ``chunk_size`` rows at a time, so memory
+    does not grow with the file; each chunk is committed on its own. An
+    unreadable file stops the import with ``report.error`` set.
+    """
+    report = ImportReport()
+    rows = read_rows(stream, fmt)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            _import_chunk(chunk, report, batch_size)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # The chunks before the unreadable one stay imported.
+        report.error = f"the file is not valid UTF-8 {fmt.upper()}: {exc}"
+    return report
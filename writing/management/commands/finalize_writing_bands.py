@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from writing.models import WritingExamModel
+from writing.services import finalize_bands
+
+
+class Command(BaseCommand):
+    help = "Compute and store weighted final writing bands for an exam or cohort."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--exam", type=int, help="Exam id (default: every exam)")
+        parser.add_argument(
+            "--user", type=int, action="append", dest="users",
+            help="Restrict to a user id; repeat for a cohort",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        exam = options["exam"]
+        if exam is not None and not WritingExamModel.objects.filter(pk=exam).exists():
+            raise CommandError(f"Writing exam {exam} does not exist.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        written = finalize_bands(
+            exam=exam,
+            users=options["users"],
+            batch_size=options["batch_size"],
+        )
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Stored {written} final band(s)."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from writing.importers import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    FORMATS,
+    guess_format,
+    import_evaluations,
+)
+
+
+class Command(BaseCommand):
+    help = "Import examiner evaluations from a CSV or JSONL grading sheet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="Default: guessed from the file name")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--chunk-size and --batch-size must be positive integers.")
+        fmt = options["format"] or guess_format(options["path"])
+        try:
+            stream = open(options["path"], encoding="utf-8-sig", newline="")
+        except OSError as exc:
+            raise CommandError(exc)
+
+        with stream:
+            report = import_evaluations(
+                stream,
+                fmt=fmt,
+                chunk_size=options["chunk_size"],
+                batch_size=options["batch_size"],
+            )
+
+        for rejected in report.rejected:
+            self.stderr.write(f"line {rejected['line']}: {rejected['reason']}")
+        if report.error:
+            raise CommandError(f"Stopped after {report.created} evaluation(s): {report.error}")
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Imported {report.created} evaluation(s), rejected {len(report.rejected)}."
+            ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from writing.models import WritingExamModel
+from writing.rankings import rebuild_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the writing ranking histograms from the stored final bands, "
+        "e.g. after an exam changed tag or bands were edited with raw SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--exam", type=int, help="Exam id, with its tag (default: everything)")
+
+    def handle(self, *args, **options):
+        exam = options["exam"]
+        if exam is not None and not WritingExamModel.objects.filter(pk=exam).exists():
+            raise CommandError(f"Writing exam {exam} does not exist.")
+
+        written = rebuild_rankings(exam=exam)
+        if options["verbosity"]:
+            self.stdout.write(self.style.SUCCESS(f"Stored {written} histogram bucket(s)."))
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:29
+
+import cloudinary_storage.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WritingExamModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('tag', models.CharField(choices=[('general', 'General'), ('academic', 'Academic')], max_length=30)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WritingAnswerModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='writing_answers', to=settings.AUTH_USER_MODEL)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='writing.writingexammodel')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WritingEvalution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_response', models.FloatField()),
+                ('coherence_cohesion', models.FloatField()),
+                ('lexical_resource', models.FloatField()),
+                ('grammatical_range_accuracy', models.FloatField()),
+                ('overall_band', models.FloatField()),
+                ('evalute', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='evaluation', to='writing.writinganswermodel')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WritingTaskModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('text', 'Text'), ('image', 'Image')], max_length=10)),
+                ('task', models.CharField(choices=[('task1', 'Task 1'), ('task2', 'Task 2')], max_length=10)),
+                ('the_question', models.TextField(blank=True, null=True)),
+                ('image_file', models.FileField(blank=True, null=True, storage=cloudinary_storage.storage.MediaCloudinaryStorage(), upload_to='images/writing/img/')),
+                ('source', models.CharField(blank=True, max_length=250, null=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='all_questions', to='writing.writingexammodel')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='writinganswermodel',
+            name='answer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers_of_task', to='writing.writingtaskmodel'),
+        ),
+        migrations.CreateModel(
+            name='WrintingBandScoreModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('final_band', models.FloatField(default=0.0)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='writing_bands', to=settings.AUTH_USER_MODEL)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='final_scores', to='writing.writingexammodel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'exam'), name='unique_writing_band_per_user_exam')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('writing', '0002_writingscoreledgermodel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='writinganswermodel',
+            name='text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='WritingSubmissionModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(blank=True, max_length=64, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='writing.writingexammodel')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='writing_submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='writinganswermodel',
+            name='submission',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='answers', to='writing.writingsubmissionmodel'),
+        ),
+        migrations.AddConstraint(
+            model_name='writingsubmissionmodel',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_writing_submission_key_per_user'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('writing', '0003_writingsubmissionmodel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wrintingbandscoremodel',
+            index=models.Index(fields=['exam', '-final_band'], name='writing_band_exam_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='writinganswermodel',
+            index=models.Index(fields=['exam', 'user', 'weight'], name='writing_answer_exam_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='writingexammodel',
+            index=models.Index(fields=['tag', 'id'], name='writing_exam_tag_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='writinganswermodel',
+            constraint=models.UniqueConstraint(fields=('answer', 'user'), name='unique_writing_answer_per_user_task'),
+        ),
+    ]
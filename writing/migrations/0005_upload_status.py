@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('writing', '0004_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='writingtaskmodel',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+    ]
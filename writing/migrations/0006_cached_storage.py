@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:52
+
+import temp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('writing', '0005_upload_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='writingtaskmodel',
+            name='image_file',
+            field=models.FileField(blank=True, null=True, storage=temp.storage.CachedMediaCloudinaryStorage(), upload_to='images/writing/img/'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:59
+
+import django.db.models.deletion
+import temp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('writing', '0006_cached_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WritingTaskImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(db_index=True, max_length=64)),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('size', models.PositiveIntegerField()),
+                ('file', models.FileField(max_length=255, storage=temp.storage.CachedMediaCloudinaryStorage(), upload_to='')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='writing.writingtaskmodel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('task', 'format', 'width'), name='unique_writing_task_image_variant')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('writing', '0007_task_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WritingBandHistogramModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'bucket'), name='unique_writing_histogram_bucket')],
+            },
+        ),
+    ]
@@ -1,6 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 
+class SelectRelatedManager(models.Manager):
+    """Default manager that joins the relations a model's __str__ reads"""
+
+    def __init__(self, *related):
+        super().__init__()
+        self.related = related
+
+    def get_queryset(self):
+        return super().get_queryset().select_related(*self.related)
+
+
 # ------------------------------
 # WritingModel
 # ------------------------------
@@ -13,6 +24,12 @@ class WritingExamModel(models.Model):
     title = models.CharField(max_length=100)
     tag = models.CharField(max_length=30, choices=TAG)
 
+    class Meta:
+        indexes = [
+            # catalog: filter by tag, keyset-paginate on id
+            models.Index(fields=["tag", "id"], name="writing_exam_tag_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.tag}) ({self.id})"
     
@@ -20,13 +37,14 @@ class WritingExamModel(models.Model):
 
 
 
-from cloudinary_storage.storage import MediaCloudinaryStorage
+from temp.models import UPLOAD_READY, UploadStatusMixin
+from temp.storage import CachedMediaCloudinaryStorage
 
 
 # ------------------------------
 # WritingTaskModel
 # ------------------------------
-class WritingTaskModel(models.Model):
+class WritingTaskModel(UploadStatusMixin):
     TASK_CHOICES = [
         ("task1", "Task 1"),
         ("task2", "Task 2"),
@@ -46,31 +64,114 @@ class WritingTaskModel(models.Model):
     task = models.CharField(max_length=10, choices=TASK_CHOICES)
     the_question = models.TextField(blank=True, null=True)
     image_file = models.FileField(
-        storage=MediaCloudinaryStorage(),
+        storage=CachedMediaCloudinaryStorage(),
         upload_to='images/writing/img/',
         null=True,
         blank=True
     )
     source = models.CharField(max_length=250, blank=True, null=True)
 
+    objects = SelectRelatedManager("exam")
+
     def __str__(self):
         return f"{self.task} ({self.exam.title}) ({self.id})"
 
     def clean(self):
         """Custom validation based on type"""
-        if self.type == 'image' and not self.image_file:
+        # An image that is still being uploaded is attached when it's done.
+        if self.type == 'image' and not self.image_file and self.upload_status == UPLOAD_READY:
             raise ValidationError("Image file is required for image tasks.")
         if self.type == 'text' and not self.the_question:
             raise ValidationError("Question text is required for text tasks.")
+        if self.type == 'image' and self.image_file and not self.image_file._committed:
+            self._validate_image()
+
+    def _validate_image(self):
+        """A newly attached file must decode as an image"""
+        from PIL import Image
+
+        position = self.image_file.tell()
+        try:
+            with Image.open(self.image_file) as image:
+                image.verify()
+        except Exception:
+            raise ValidationError("Upload a valid image for image tasks.")
+        finally:
+            self.image_file.seek(position)
         
     def save(self, *args,**kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
 
 
+class WritingTaskImageVariant(models.Model):
+    """A resized WebP/JPEG copy of a task image; tasks with the same image share files"""
+    FORMAT_CHOICES = [
+        ("webp", "WebP"),
+        ("jpeg", "JPEG"),
+    ]
+
+    task = models.ForeignKey(
+        WritingTaskModel,
+        on_delete=models.CASCADE,
+        related_name="image_variants"
+    )
+    source_hash = models.CharField(max_length=64, db_index=True)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    file = models.FileField(storage=CachedMediaCloudinaryStorage(), max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["task", "format", "width"],
+                name="unique_writing_task_image_variant",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.format} {self.width}px of task {self.task_id} ({self.id})"
+
+
 
 
 from users.models import CustomUser
+
+
+def task_weight(task):
+    """Task 2 counts double towards the final writing band"""
+    return 1 if task == "task1" else 2
+
+
+class WritingSubmissionModel(models.Model):
+    """One submitted writing attempt; the key makes client retries idempotent"""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="writing_submissions"
+    )
+    exam = models.ForeignKey(
+        WritingExamModel,
+        on_delete=models.CASCADE,
+        related_name="submissions"
+    )
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                name="unique_writing_submission_key_per_user",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Submission {self.id} - user {self.user_id} exam {self.exam_id}"
+
+
 class WritingAnswerModel(models.Model):
     exam = models.ForeignKey(
             WritingExamModel , 
@@ -90,13 +191,39 @@ class WritingAnswerModel(models.Model):
        
        )
     weight = models.PositiveIntegerField(default=1)
+    text = models.TextField(blank=True, default="")
+    submission = models.ForeignKey(
+        WritingSubmissionModel,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="answers"
+    )
+
+    objects = SelectRelatedManager("user", "answer", "exam")
 
+    class Meta:
+        indexes = [
+            # band scoring filters on exam (and user) and reads weight, so
+            # the index alone answers it
+            models.Index(fields=["exam", "user", "weight"], name="writing_answer_exam_user_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["answer", "user"],
+                name="unique_writing_answer_per_user_task",
+            ),
+        ]
 
     def get_weight(self):
-        if self.answer.task == "task1":
-            self.weight=1
+        if WritingAnswerModel.answer.is_cached(self):
+            task = self.answer.task
         else:
-            self.weight=2
+            # Only the task column is needed, not the whole task row.
+            task = WritingTaskModel.objects.filter(pk=self.answer_id).values_list(
+                "task", flat=True
+            ).first()
+        self.weight = task_weight(task)
 
     def __str__(self):
         return f"{self.user} - {self.answer.task} ({self.exam.title})"       
@@ -117,6 +244,8 @@ class WritingEvalution(models.Model):
     lexical_resource = models.FloatField()
     grammatical_range_accuracy=models.FloatField()
     overall_band=models.FloatField()
+
+    objects = SelectRelatedManager("evalute__user", "evalute__answer")
    
     
     def save(self, *args, **kwargs):
@@ -127,7 +256,19 @@ class WritingEvalution(models.Model):
             self.lexical_resource +
             self.grammatical_range_accuracy
         ) / 4
-        super().save(*args, **kwargs)
+        from .services import record_evaluation
+
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = (
+                    WritingEvalution.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("evalute_id", "overall_band")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            record_evaluation(self, previous=previous)
 
     def __str__(self):
         return f"Evaluation for {self.evalute.user} - {self.evalute.answer.task} ({self.id})"
@@ -136,7 +277,8 @@ class WritingEvalution(models.Model):
 class WrintingBandScoreModel(models.Model):
     user=models.ForeignKey(
         CustomUser ,
-         on_delete=set.null,
+         on_delete=models.SET_NULL,
+         null=True,
          related_name="writing_bands"
          )
 
@@ -146,23 +288,88 @@ class WrintingBandScoreModel(models.Model):
         related_name="final_scores"
           )
 
-    final_Band = models.FloatField()
+    final_band = models.FloatField(default=0.0)
+
+    objects = SelectRelatedManager("user")
     #user details
     #will be set in future 
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "exam"],
+                name="unique_writing_band_per_user_exam",
+            ),
+        ]
+        indexes = [
+            # per-exam rankings read bands in descending order
+            models.Index(fields=["exam", "-final_band"], name="writing_band_exam_rank_idx"),
+        ]
+
     def calculate_final_band(self):
         """Calculate weighted band from user’s two tasks"""
-        answers = WritingAnswerModel.objects.filter(user=self.user, exam=self.exam)
-        if not answers.exists():
-            return 0.0
-        
-        total = 0
-        total_weight = 0
-        for ans in answers:
-            if hasattr(ans, "evaluation"):
-                total += ans.evaluation.overall_band * ans.weight
-                total_weight += ans.weight
-        self.final_band = total / total_weight if total_weight else 0.0
+        from .services import final_bands
+
+        row = next(iter(final_bands(exam=self.exam_id, users=[self.user_id])), None)
+        self.final_band = row["final_band"] if row else 0.0
         return self.final_band
 
     def __str__(self):
-        return f"{self.user} - Final Band: {self.final_band}({self.id})"
\ No newline at end of file
+        return f"{self.user} - Final Band: {self.final_band}({self.id})"
+
+
+class WritingScoreLedgerModel(models.Model):
+    """Running weighted band per (user, exam), kept current on every evaluation"""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="writing_ledgers"
+    )
+    exam = models.ForeignKey(
+        WritingExamModel,
+        on_delete=models.CASCADE,
+        related_name="score_ledgers"
+    )
+    weighted_sum = models.FloatField(default=0.0)
+    total_weight = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "exam"],
+                name="unique_writing_ledger_per_user_exam",
+            ),
+        ]
+
+    @property
+    def final_band(self):
+        return self.weighted_sum / self.total_weight if self.total_weight else 0.0
+
+    def __str__(self):
+        return f"Ledger {self.user_id} - exam {self.exam_id}: {self.final_band}"
+
+
+class WritingBandHistogramModel(models.Model):
+    """
+    How many final bands fall in each band bucket of a ranking scope.
+
+    ``scope`` is ``exam:<id>`` or ``tag:<tag>`` and ``bucket`` the final
+    band times BUCKETS_PER_BAND. Kept current by writing/rankings.py, which
+    answers ranks and percentiles from it without sorting band rows.
+    """
+    BUCKETS_PER_BAND = 100
+
+    scope = models.CharField(max_length=40)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "bucket"],
+                name="unique_writing_histogram_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} band {self.bucket / self.BUCKETS_PER_BAND}: {self.count}"
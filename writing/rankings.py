@@ -0,0 +1,308 @@
+"""
+Ranks and percentiles of writing final bands, per exam and per exam tag.
+
+Final bands are counted in ``WritingBandHistogramModel``, one row per scope
+and 0.01-band bucket, so a scope has at most 901 rows whatever the number
+of candidates. An exam scope counts every band of the exam; a tag scope
+counts each candidate once, with their best band in the tag's exams.
+``ranking()`` reads them once into a ``Ranking`` (the counts plus the number
+of bands above each bucket) and caches it; after that a rank or a
+percentile is an array lookup.
+
+Writers of final bands report what changed to ``apply_band_changes``, which
+moves the counts with atomic increments and drops the cached rankings of
+the touched scopes. ``rebuild_rankings`` (and the rebuild_writing_rankings
+command) recomputes the histograms from the band rows, which is needed after
+an exam moves to another tag. The top N of an exam reads the bands through the
+(exam, -final_band) index; a tag's top N uses the histogram to bound the
+rows it reads.
+"""
+import math
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, Max, Value
+from django.db.models.functions import Cast, Floor
+
+from .models import WritingBandHistogramModel, WritingExamModel, WrintingBandScoreModel
+
+BUCKETS_PER_BAND = WritingBandHistogramModel.BUCKETS_PER_BAND
+MAX_BUCKET = 9 * BUCKETS_PER_BAND
+
+
+def exam_scope(exam_id):
+    return f"exam:{exam_id}"
+
+
+def tag_scope(tag):
+    return f"tag:{tag}"
+
+
+def bucket(band):
+    """The histogram bucket of a band: hundredths, rounded half up"""
+    if not math.isfinite(band):
+        raise ValueError(f"band must be finite, not {band!r}")
+    return min(MAX_BUCKET, max(0, int(band * BUCKETS_PER_BAND + 0.5)))
+
+
+def _bucket_expression():
+    # Same rounding as bucket(), done by the database.
+    return Cast(Floor(F("final_band") * BUCKETS_PER_BAND + Value(0.5)), IntegerField())
+
+
+class Ranking:
+    """The band histogram of one scope, with the count above every bucket"""
+
+    def __init__(self, counts):
+        self.counts = [0] * (MAX_BUCKET + 1)
+        for position, count in counts.items():
+            self.counts[min(MAX_BUCKET, max(0, position))] += count
+        # above[b]: bands in buckets higher than b
+        self.above = [0] * (MAX_BUCKET + 1)
+        for position in range(MAX_BUCKET - 1, -1, -1):
+            self.above[position] = self.above[position + 1] + self.counts[position + 1]
+        self.total = self.above[0] + self.counts[0]
+
+    def rank(self, band):
+        """1 + the number of higher bands; equal bands share a rank"""
+        return self.above[bucket(band)] + 1
+
+    def percentile(self, band):
+        """Percentage of bands in the scope below ``band``, None when it is empty"""
+        if not self.total:
+            return None
+        position = bucket(band)
+        below = self.total - self.above[position] - self.counts[position]
+        return 100.0 * below / self.total
+
+    def threshold(self, n):
+        """The lowest band among the best ``n``, as a bucket"""
+        for position in range(MAX_BUCKET, -1, -1):
+            if self.above[position] + self.counts[position] >= n:
+                return position
+        return 0
+
+
+def _ranking_cache_key(scope):
+    return f"writing:ranking:{scope}"
+
+
+def ranking(scope):
+    """The cached Ranking of a scope; one query to build it"""
+    key = _ranking_cache_key(scope)
+    result = cache.get(key)
+    if result is None:
+        result = Ranking(dict(
+            WritingBandHistogramModel.objects.filter(scope=scope, count__gt=0)
+            .values_list("bucket", "count")
+        ))
+        cache.set(key, result, settings.WRITING_RANKINGS_CACHE_TIMEOUT)
+    return result
+
+
+def invalidate_rankings(scopes):
+    keys = [_ranking_cache_key(scope) for scope in scopes]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _apply_histogram_deltas(deltas):
+    """Add ``{(scope, bucket): delta}`` to the histogram, like apply_ledger_deltas"""
+    existing = set(
+        WritingBandHistogramModel.objects.filter(
+            scope__in={scope for scope, _ in deltas},
+            bucket__in={position for _, position in deltas},
+        ).values_list("scope", "bucket")
+    )
+    # A negative delta for a missing row means the histogram has drifted;
+    # rebuild_rankings() repairs it.
+    missing = {key: delta for key, delta in deltas.items() if key not in existing and delta > 0}
+    try:
+        with transaction.atomic():
+            WritingBandHistogramModel.objects.bulk_create([
+                WritingBandHistogramModel(scope=scope, bucket=position, count=delta)
+                for (scope, position), delta in missing.items()
+            ])
+    except IntegrityError:
+        # A concurrent writer created some of the rows first.
+        existing.update(missing)
+    for scope, position in existing & deltas.keys():
+        WritingBandHistogramModel.objects.filter(scope=scope, bucket=position).update(
+            count=F("count") + deltas[(scope, position)]
+        )
+
+
+def _tag_best_changes(changes, tags):
+    """
+    ``(tag, old_best, new_best)`` for the users whose best band in a tag
+    moves. Called after the writes, so the rows read are the new state and
+    the old one is those rows with the changed bands put back.
+    """
+    affected = {
+        (user_id, tags[exam_id]) for user_id, exam_id, _, _ in changes
+        if user_id is not None and exam_id in tags
+    }
+    if not affected:
+        return []
+    current = {key: {} for key in affected}
+    rows = (
+        WrintingBandScoreModel.objects.select_related(None)
+        .filter(user_id__in={user_id for user_id, _ in affected},
+                exam__tag__in={tag for _, tag in affected})
+        .values_list("user_id", "exam_id", "exam__tag", "final_band")
+    )
+    for user_id, exam_id, tag, band in rows:
+        if (user_id, tag) in current:
+            current[(user_id, tag)][exam_id] = band
+    previous = {key: dict(bands) for key, bands in current.items()}
+    for user_id, exam_id, old, _ in changes:
+        bands = previous.get((user_id, tags.get(exam_id)))
+        if bands is None:
+            continue
+        if old is None:
+            bands.pop(exam_id, None)
+        else:
+            bands[exam_id] = old
+    return [
+        (tag, max(previous[key].values(), default=None), max(bands.values(), default=None))
+        for key, bands in current.items()
+        for tag in [key[1]]
+    ]
+
+
+def apply_band_changes(changes):
+    """
+    Count band changes in the exam and tag histograms.
+
+    ``changes`` are ``(user_id, exam_id, old_band, new_band)`` with None for
+    a band that did not exist before or no longer does, reported after the
+    band rows were written. An exam histogram counts every band; a tag
+    histogram counts each candidate's best band across the tag's exams.
+    """
+    def moved(old, new):
+        return (None if old is None else bucket(old)) != (None if new is None else bucket(new))
+
+    changes = [change for change in changes if moved(change[2], change[3])]
+    if not changes:
+        return
+    tags = dict(
+        WritingExamModel.objects.filter(pk__in={exam_id for _, exam_id, _, _ in changes})
+        .values_list("pk", "tag")
+    )
+    deltas = Counter()
+    moves = [(exam_scope(exam_id), old, new) for _, exam_id, old, new in changes]
+    moves += [
+        (tag_scope(tag), old, new)
+        for tag, old, new in _tag_best_changes(changes, tags) if moved(old, new)
+    ]
+    for scope, old, new in moves:
+        if old is not None:
+            deltas[(scope, bucket(old))] -= 1
+        if new is not None:
+            deltas[(scope, bucket(new))] += 1
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        with transaction.atomic():
+            _apply_histogram_deltas(deltas)
+        invalidate_rankings({scope for scope, _ in deltas})
+
+
+def rebuild_rankings(exam=None):
+    """
+    Recompute histograms from the band rows: every scope, or ``exam`` (a pk)
+    and its tag. Returns the number of histogram rows written.
+    """
+    bands = WrintingBandScoreModel.objects.select_related(None).order_by()
+    exam_bands = tag_bands = bands
+    stale = WritingBandHistogramModel.objects.all()
+    if exam is not None:
+        tag = WritingExamModel.objects.filter(pk=exam).values_list("tag", flat=True).first()
+        exam_bands = bands.filter(exam_id=exam)
+        tag_bands = bands.filter(exam__tag=tag)
+        stale = stale.filter(scope__in=[exam_scope(exam), tag_scope(tag)])
+
+    counts = Counter()
+    grouped = (
+        exam_bands.annotate(position=_bucket_expression())
+        .values("exam_id", "position")
+        .annotate(count=Count("pk"))
+    )
+    for row in grouped:
+        position = min(MAX_BUCKET, max(0, row["position"]))
+        counts[(exam_scope(row["exam_id"]), position)] += row["count"]
+    # One band per candidate and tag: their best.
+    best = (
+        tag_bands.filter(user__isnull=False)
+        .values("exam__tag", "user_id")
+        .annotate(best=Max("final_band"))
+        .values_list("exam__tag", "best")
+    )
+    for tag, band in best.iterator():
+        counts[(tag_scope(tag), bucket(band))] += 1
+
+    with transaction.atomic():
+        scopes = set(stale.values_list("scope", flat=True).distinct()) | {s for s, _ in counts}
+        stale.delete()
+        WritingBandHistogramModel.objects.bulk_create([
+            WritingBandHistogramModel(scope=scope, bucket=position, count=count)
+            for (scope, position), count in counts.items()
+        ], batch_size=1000)
+    invalidate_rankings(scopes)
+    return len(counts)
+
+
+def top_bands(exam_id=None, tag=None, n=10):
+    """
+    The ``n`` best final bands of an exam or a tag, best first, as
+    ``{"rank", "user", "name", "final_band"}``.
+    """
+    scope = exam_scope(exam_id) if exam_id is not None else tag_scope(tag)
+    result = ranking(scope)
+    bands = WrintingBandScoreModel.objects.select_related(None)
+    if exam_id is not None:
+        rows = bands.filter(exam_id=exam_id).order_by("-final_band")
+        rows = rows.values("user_id", "user__full_name", "final_band")[:n]
+    else:
+        # Each candidate once, with their best band. Only bands that can be
+        # in the top n are read; each exam's index serves them.
+        lowest = (result.threshold(n) - 0.5) / BUCKETS_PER_BAND
+        rows = (
+            bands.filter(exam__tag=tag, final_band__gte=lowest, user__isnull=False)
+            .values("user_id", "user__full_name")
+            .annotate(final_band=Max("final_band"))
+            .order_by("-final_band", "user_id")[:n]
+        )
+    return [
+        {
+            "rank": result.rank(row["final_band"]),
+            "user": row["user_id"],
+            "name": row["user__full_name"],
+            "final_band": row["final_band"],
+        }
+        for row in rows
+    ]
+
+
+def user_standing(user_id, exam_id=None, tag=None):
+    """
+    ``{"final_band", "rank", "percentile", "total"}`` of a user in an exam,
+    or of their best band in a tag; None without a band there.
+    """
+    bands = WrintingBandScoreModel.objects.select_related(None).filter(user_id=user_id)
+    if exam_id is not None:
+        scope = exam_scope(exam_id)
+        band = bands.filter(exam_id=exam_id).values_list("final_band", flat=True).first()
+    else:
+        scope = tag_scope(tag)
+        band = bands.filter(exam__tag=tag).aggregate(best=Max("final_band"))["best"]
+    if band is None:
+        return None
+    result = ranking(scope)
+    return {
+        "final_band": band,
+        "rank": result.rank(band),
+        "percentile": result.percentile(band),
+        "total": result.total,
+    }
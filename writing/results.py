@@ -0,0 +1,156 @@
+"""
+A candidate's writing results across exams (``/me/results/``).
+
+``user_results`` reads everything with one aggregate query over the user's
+answers, grouped by exam: the weighted final band, the per-criterion
+averages and the latest submission time. The result is cached per user
+until the score ledger or a new submission invalidates it
+(``invalidate_results``), so pages after the first, and repeat
+visits, cost no query. Exams are listed newest first and paged with an
+opaque keyset cursor over that cached list.
+"""
+import base64
+import bisect
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Max
+
+from .models import WritingAnswerModel
+
+CRITERIA = (
+    "task_response",
+    "coherence_cohesion",
+    "lexical_resource",
+    "grammatical_range_accuracy",
+)
+
+
+def results_cache_key(user_id):
+    return f"writing:results:{user_id}"
+
+
+def invalidate_results(*user_ids):
+    """Drop the cached results dashboard of these users"""
+    keys = [results_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def results_queryset(user_id):
+    """One row per exam the user answered, aggregated by the database"""
+    # services imports this module to invalidate results
+    from .services import band_sums
+
+    return (
+        WritingAnswerModel.objects.filter(user_id=user_id)
+        .order_by()
+        .values("exam_id", "exam__title", "exam__tag")
+        .annotate(
+            answers=Count("pk"),
+            evaluated=Count("evaluation"),
+            submitted_at=Max("submission__created_at"),
+            **band_sums(),
+            **{criterion: Avg(f"evaluation__{criterion}") for criterion in CRITERIA},
+        )
+    )
+
+
+def sort_key(row):
+    """Newest submission first, exams answered without one last"""
+    submitted_at = row["submitted_at"]
+    return (
+        submitted_at is None,
+        -submitted_at.timestamp() if submitted_at else 0.0,
+        -row["exam"],
+    )
+
+
+def _build(rows):
+    results = [
+        {
+            "exam": row["exam_id"],
+            "title": row["exam__title"],
+            "tag": row["exam__tag"],
+            "submitted_at": row["submitted_at"],
+            "answers": row["answers"],
+            "evaluated": row["evaluated"],
+            # None until an answer is evaluated
+            "final_band": (
+                row["weighted_sum"] / row["total_weight"] if row["total_weight"] else None
+            ),
+            "criteria": {criterion: row[criterion] for criterion in CRITERIA},
+        }
+        for row in rows
+    ]
+    results.sort(key=sort_key)
+
+    # Trend: evaluated exams oldest first, each with its change in band.
+    trend = []
+    for result in reversed(results):
+        if result["final_band"] is None:
+            result["change"] = None
+            continue
+        result["change"] = result["final_band"] - trend[-1]["final_band"] if trend else None
+        trend.append({
+            "exam": result["exam"],
+            "submitted_at": result["submitted_at"],
+            "final_band": result["final_band"],
+        })
+
+    evaluated = [result for result in results if result["evaluated"]]
+    weight = sum(result["evaluated"] for result in evaluated)
+    summary = {
+        "exams": len(results),
+        "evaluated_exams": len(evaluated),
+        "latest_band": trend[-1]["final_band"] if trend else None,
+        "best_band": max((point["final_band"] for point in trend), default=None),
+        # over every evaluated answer, not the mean of the exam means
+        "criteria": {
+            criterion: (
+                sum(r["criteria"][criterion] * r["evaluated"] for r in evaluated) / weight
+                if weight else None
+            )
+            for criterion in CRITERIA
+        },
+    }
+    return {"summary": summary, "trend": trend, "results": results}
+
+
+def user_results(user_id):
+    """``{"summary", "trend", "results"}`` for a user, cached until invalidated"""
+    key = results_cache_key(user_id)
+    data = cache.get(key)
+    if data is None:
+        data = _build(list(results_queryset(user_id)))
+        cache.set(key, data, settings.WRITING_RESULTS_CACHE_TIMEOUT)
+    return data
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The sort key in a cursor; ValueError when it was not made by encode_cursor"""
+    try:
+        flag, timestamp, exam = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (bool(flag), float(timestamp), int(exam))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+
+def results_page(results, cursor=None, page_size=20):
+    """
+    ``(rows, next_cursor)``: up to ``page_size`` results after ``cursor``.
+    The cursor is a position in the ordering, not an index, so results
+    added or removed between requests don't shift the pages.
+    """
+    start = 0
+    if cursor:
+        start = bisect.bisect_right([sort_key(row) for row in results], decode_cursor(cursor))
+    rows = results[start:start + page_size]
+    has_more = start + page_size < len(results)
+    return rows, encode_cursor(sort_key(rows[-1])) if rows and has_more else None
@@ -0,0 +1,37 @@
+from rest_framework import serializers
+
+from .models import WritingExamModel, WritingTaskImageVariant, WritingTaskModel
+
+
+class WritingTaskImageVariantSerializer(serializers.ModelSerializer):
+    url = serializers.FileField(source="file", read_only=True)
+
+    class Meta:
+        model = WritingTaskImageVariant
+        fields = ['format', 'width', 'height', 'size', 'url']
+
+
+class WritingTaskSerializer(serializers.ModelSerializer):
+    image_variants = WritingTaskImageVariantSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = WritingTaskModel
+        fields = ['id', 'task', 'type', 'the_question', 'image_file', 'image_variants', 'source']
+
+
+class WritingExamSerializer(serializers.ModelSerializer):
+    tasks = WritingTaskSerializer(source="all_questions", many=True, read_only=True)
+
+    class Meta:
+        model = WritingExamModel
+        fields = ['id', 'title', 'tag', 'tasks']
+
+
+class AnswerInputSerializer(serializers.Serializer):
+    task = serializers.IntegerField()
+    text = serializers.CharField(allow_blank=True, trim_whitespace=False)
+
+
+class SubmissionSerializer(serializers.Serializer):
+    answers = AnswerInputSerializer(many=True, allow_empty=False)
+    idempotency_key = serializers.CharField(max_length=64, required=False)
@@ -0,0 +1,375 @@
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .rankings import apply_band_changes
+from .results import invalidate_results
+from .models import (
+    WritingAnswerModel,
+    WritingEvalution,
+    WritingScoreLedgerModel,
+    WritingSubmissionModel,
+    WritingTaskModel,
+    WrintingBandScoreModel,
+    task_weight,
+)
+
+
+# ------------------------------
+# Final band scores
+# ------------------------------
+def band_sums():
+    """Aggregates of a group of answers: weighted band sum and evaluated weight."""
+    return {
+        "weighted_sum": Coalesce(
+            Sum(F("evaluation__overall_band") * F("weight"), output_field=FloatField()),
+            0.0,
+            output_field=FloatField(),
+        ),
+        "total_weight": Coalesce(Sum("weight", filter=Q(evaluation__isnull=False)), 0),
+    }
+
+
+def _band_totals(exam=None, users=None):
+    """Per (user, exam) weighted band sum and evaluated weight."""
+    answers = WritingAnswerModel.objects.all()
+    if exam is not None:
+        answers = answers.filter(exam=exam)
+    if users is not None:
+        answers = answers.filter(user__in=users)
+
+    return answers.order_by().values("user_id", "exam_id").annotate(**band_sums())
+
+
+def final_bands(exam=None, users=None):
+    """
+    Weighted final band per (user, exam), computed by the database.
+
+    Returns a values queryset of ``{"user_id", "exam_id", "final_band"}``
+    rows. ``exam`` is an exam instance or pk, ``users`` an iterable of users
+    or pks (a cohort). Answers without an evaluation carry no weight, and a
+    user with no evaluated answers gets 0.0, like the old per-row loop.
+    """
+    return (
+        _band_totals(exam=exam, users=users)
+        .annotate(
+            final_band=Coalesce(
+                F("weighted_sum") / Cast(NullIf(F("total_weight"), 0), FloatField()),
+                0.0,
+                output_field=FloatField(),
+            )
+        )
+        .values("user_id", "exam_id", "final_band")
+    )
+
+
+def finalize_bands(exam=None, users=None, batch_size=1000):
+    """
+    Write ``WrintingBandScoreModel`` rows for a whole exam or cohort.
+
+    One aggregate query reads every final band and the rows are upserted on
+    the (user, exam) constraint in batches of ``batch_size``. The bands they
+    replace are read per batch so the ranking histograms move by the
+    difference. Returns the number of rows written.
+    """
+    rows = final_bands(exam=exam, users=users).iterator(chunk_size=batch_size)
+    written = 0
+    with transaction.atomic():
+        while True:
+            chunk = [
+                WrintingBandScoreModel(
+                    user_id=row["user_id"],
+                    exam_id=row["exam_id"],
+                    final_band=row["final_band"],
+                )
+                for row in islice(rows, batch_size)
+            ]
+            if not chunk:
+                break
+            previous = {
+                (user_id, exam_id): band
+                for user_id, exam_id, band in WrintingBandScoreModel.objects.filter(
+                    user_id__in={row.user_id for row in chunk},
+                    exam_id__in={row.exam_id for row in chunk},
+                ).values_list("user_id", "exam_id", "final_band")
+            }
+            WrintingBandScoreModel.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=["user", "exam"],
+                update_fields=["final_band"],
+            )
+            apply_band_changes([
+                (row.user_id, row.exam_id, previous.get((row.user_id, row.exam_id)),
+                 row.final_band)
+                for row in chunk
+            ])
+            written += len(chunk)
+    return written
+
+
+# ------------------------------
+# Score ledger
+# ------------------------------
+def apply_ledger_delta(user_id, exam_id, weighted_sum, total_weight, create=True):
+    """
+    Add a delta to the (user, exam) ledger row.
+
+    The increment runs as a single ``UPDATE ... SET x = x + delta`` so
+    concurrent examiners grading the same user never overwrite each other.
+    The first evaluation creates the row; losing that insert race falls back
+    to the update. With ``create=False`` a missing row is left alone.
+    """
+    invalidate_results(user_id)
+    ledger = WritingScoreLedgerModel.objects.filter(user_id=user_id, exam_id=exam_id)
+    increment = {
+        "weighted_sum": F("weighted_sum") + weighted_sum,
+        "total_weight": F("total_weight") + total_weight,
+    }
+    if ledger.update(**increment) or not create:
+        return
+    try:
+        with transaction.atomic():
+            WritingScoreLedgerModel.objects.create(
+                user_id=user_id,
+                exam_id=exam_id,
+                weighted_sum=weighted_sum,
+                total_weight=total_weight,
+            )
+    except IntegrityError:
+        ledger.update(**increment)
+
+
+def apply_ledger_deltas(deltas):
+    """
+    Apply ``{(user_id, exam_id): (weighted_sum, total_weight)}`` in bulk.
+
+    Missing ledger rows are inserted with one ``bulk_create``; rows that
+    already exist get the usual atomic increment.
+    """
+    if not deltas:
+        return
+    invalidate_results(*{user_id for user_id, _ in deltas})
+    existing = set(
+        WritingScoreLedgerModel.objects.filter(
+            user_id__in={user_id for user_id, _ in deltas},
+            exam_id__in={exam_id for _, exam_id in deltas},
+        ).values_list("user_id", "exam_id")
+    )
+    missing = [key for key in deltas if key not in existing]
+    try:
+        with transaction.atomic():
+            WritingScoreLedgerModel.objects.bulk_create([
+                WritingScoreLedgerModel(
+                    user_id=user_id,
+                    exam_id=exam_id,
+                    weighted_sum=deltas[(user_id, exam_id)][0],
+                    total_weight=deltas[(user_id, exam_id)][1],
+                )
+                for user_id, exam_id in missing
+            ])
+    except IntegrityError:
+        # A concurrent evaluation created some of the rows first.
+        existing.update(missing)
+    for user_id, exam_id in existing & deltas.keys():
+        apply_ledger_delta(user_id, exam_id, *deltas[(user_id, exam_id)])
+
+
+def _answer_info(answer_id, evaluation=None):
+    """(user_id, exam_id, weight) of an answer, reusing a loaded instance."""
+    if evaluation is not None and WritingEvalution.evalute.is_cached(evaluation):
+        answer = evaluation.evalute
+        return answer.user_id, answer.exam_id, answer.weight
+    return (
+        WritingAnswerModel.objects.filter(pk=answer_id)
+        .values_list("user_id", "exam_id", "weight")
+        .first()
+    )
+
+
+def record_evaluation(evaluation, previous=None):
+    """
+    Apply a saved evaluation to the ledger.
+
+    ``previous`` is the ``(evalute_id, overall_band)`` pair stored before the
+    save, or None for a new evaluation.
+    """
+    user_id, exam_id, weight = _answer_info(evaluation.evalute_id, evaluation)
+
+    if previous is None:
+        apply_ledger_delta(user_id, exam_id, evaluation.overall_band * weight, weight)
+        return
+
+    previous_answer_id, previous_band = previous
+    if previous_answer_id == evaluation.evalute_id:
+        delta = (evaluation.overall_band - previous_band) * weight
+        if delta:
+            apply_ledger_delta(user_id, exam_id, delta, 0)
+        else:
+            # The criteria may have changed under the same overall band.
+            invalidate_results(user_id)
+        return
+
+    old_info = _answer_info(previous_answer_id)
+    if old_info is not None:
+        old_user_id, old_exam_id, old_weight = old_info
+        apply_ledger_delta(
+            old_user_id, old_exam_id, -previous_band * old_weight, -old_weight, create=False
+        )
+    apply_ledger_delta(user_id, exam_id, evaluation.overall_band * weight, weight)
+
+
+def forget_evaluation(evaluation):
+    """Remove a deleted evaluation from the ledger."""
+    info = _answer_info(evaluation.evalute_id, evaluation)
+    if info is None:
+        return
+    user_id, exam_id, weight = info
+    # The ledger row may already be gone when a user or exam delete cascades.
+    apply_ledger_delta(
+        user_id, exam_id, -evaluation.overall_band * weight, -weight, create=False
+    )
+
+
+def current_final_band(user, exam):
+    """Read the live final band with a single indexed lookup."""
+    row = (
+        WritingScoreLedgerModel.objects.filter(user=user, exam=exam)
+        .values_list("weighted_sum", "total_weight")
+        .first()
+    )
+    if not row or not row[1]:
+        return 0.0
+    return row[0] / row[1]
+
+
+def rebuild_ledger(exam=None, users=None, batch_size=1000):
+    """Recompute ledger rows from the answers, e.g. after raw SQL edits."""
+    rows = _band_totals(exam=exam, users=users).iterator(chunk_size=batch_size)
+    written = 0
+    with transaction.atomic():
+        while True:
+            chunk = [
+                WritingScoreLedgerModel(
+                    user_id=row["user_id"],
+                    exam_id=row["exam_id"],
+                    weighted_sum=row["weighted_sum"],
+                    total_weight=row["total_weight"],
+                )
+                for row in islice(rows, batch_size)
+            ]
+            if not chunk:
+                break
+            WritingScoreLedgerModel.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=["user", "exam"],
+                update_fields=["weighted_sum", "total_weight"],
+            )
+            invalidate_results(*{row.user_id for row in chunk})
+            written += len(chunk)
+    return written
+
+
+# ------------------------------
+# Answer submission
+# ------------------------------
+class SubmissionError(Exception):
+    """The attempt cannot be stored; ``status`` is the HTTP status to report"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _submission_answers(submission):
+    return list(
+        WritingAnswerModel.objects.filter(submission=submission)
+        .order_by("pk")
+        .values("id", "answer_id", "weight")
+    )
+
+
+async def areplayed_submission(user_id, exam_id, idempotency_key):
+    """
+    ``(submission, answer_rows)`` when ``idempotency_key`` was already used,
+    read with the async ORM, else None. Raises SubmissionError when the key
+    belongs to another exam.
+    """
+    submission = await WritingSubmissionModel.objects.filter(
+        user_id=user_id, idempotency_key=idempotency_key
+    ).afirst()
+    if submission is None:
+        return None
+    if submission.exam_id != exam_id:
+        raise SubmissionError("This idempotency key was already used for another exam.", status=409)
+    answers = [
+        row async for row in WritingAnswerModel.objects.filter(submission=submission)
+        .order_by("pk")
+        .values("id", "answer_id", "weight")
+    ]
+    return submission, answers
+
+
+def submit_attempt(user_id, exam_id, answers, idempotency_key=None):
+    """
+    Store a complete writing attempt (every task of the exam) at once.
+
+    ``answers`` is a list of ``{"task": task_id, "text": str}``. The exam's
+    tasks are read in one query, weights come from their task type and the
+    answers are inserted with one ``bulk_create``. Replaying an
+    ``idempotency_key`` returns the first submission instead of creating
+    rows. Returns ``(submission, answer_rows, created)``.
+    """
+    tasks = dict(
+        WritingTaskModel.objects.select_related(None)
+        .filter(exam_id=exam_id)
+        .values_list("pk", "task")
+    )
+    if not tasks:
+        raise SubmissionError("Exam not found.", status=404)
+    submitted = [answer["task"] for answer in answers]
+    if len(set(submitted)) != len(submitted):
+        raise SubmissionError("Each task can only be answered once.")
+    if set(submitted) != set(tasks):
+        raise SubmissionError("Answer every task of the exam, and only those tasks.")
+
+    try:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    submission = WritingSubmissionModel.objects.create(
+                        user_id=user_id, exam_id=exam_id, idempotency_key=idempotency_key
+                    )
+            except IntegrityError:
+                # The key was seen before: this is a client retry.
+                submission = WritingSubmissionModel.objects.get(
+                    user_id=user_id, idempotency_key=idempotency_key
+                )
+                if submission.exam_id != exam_id:
+                    raise SubmissionError(
+                        "This idempotency key was already used for another exam.", status=409
+                    )
+                return submission, _submission_answers(submission), False
+
+            rows = WritingAnswerModel.objects.bulk_create([
+                WritingAnswerModel(
+                    exam_id=exam_id,
+                    answer_id=answer["task"],
+                    user_id=user_id,
+                    text=answer.get("text", ""),
+                    weight=task_weight(tasks[answer["task"]]),
+                    submission=submission,
+                )
+                for answer in answers
+            ])
+    except IntegrityError:
+        raise SubmissionError("This exam was already submitted.", status=409)
+    # The new attempt shows up on the dashboard as pending.
+    invalidate_results(user_id)
+    answer_rows = [
+        {"id": row.pk, "answer_id": row.answer_id, "weight": row.weight} for row in rows
+    ]
+    return submission, answer_rows, True
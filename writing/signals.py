@@ -0,0 +1,96 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from temp.models import UPLOAD_READY
+from temp.uploads import upload_finished
+from .catalog import invalidate_exam
+from .derivatives import enqueue_derivatives
+from .models import (
+    WritingEvalution,
+    WritingExamModel,
+    WritingTaskModel,
+    WrintingBandScoreModel,
+)
+from .rankings import apply_band_changes
+from .services import forget_evaluation
+
+
+@receiver(post_delete, sender=WritingEvalution)
+def evaluation_deleted(sender, instance, **kwargs):
+    # post_delete also fires for queryset and cascade deletes, which never
+    # reach WritingEvalution.delete().
+    forget_evaluation(instance)
+
+
+# finalize_bands() reports its bulk writes itself; these cover single saves
+# (e.g. the admin) and deletes.
+@receiver(pre_save, sender=WrintingBandScoreModel)
+def band_saving(sender, instance, raw=False, **kwargs):
+    instance._ranked_band = None
+    if instance.pk and not raw:
+        instance._ranked_band = (
+            sender.objects.select_related(None).filter(pk=instance.pk)
+            .values_list("final_band", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=WrintingBandScoreModel)
+def band_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        apply_band_changes(
+            [(instance.user_id, instance.exam_id, instance._ranked_band, instance.final_band)]
+        )
+
+
+@receiver(post_delete, sender=WrintingBandScoreModel)
+def band_deleted(sender, instance, **kwargs):
+    apply_band_changes([(instance.user_id, instance.exam_id, instance.final_band, None)])
+
+
+@receiver([post_save, post_delete], sender=WritingExamModel)
+def exam_changed(sender, instance, **kwargs):
+    invalidate_exam(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=WritingTaskModel)
+def task_changed(sender, instance, **kwargs):
+    invalidate_exam(instance.exam_id)
+
+
+@receiver(pre_save, sender=WritingTaskModel)
+def task_image_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Only a new image needs new variants, not every edit of the task.
+    instance._image_changed = True
+    if instance.pk and not raw and instance.type == "image" and (
+        update_fields is None or "image_file" in update_fields
+    ):
+        stored = (
+            sender.objects.select_related(None).filter(pk=instance.pk)
+            .values_list("image_file", flat=True).first()
+        )
+        # An uncommitted file is a new upload, even if it reuses the name.
+        instance._image_changed = (
+            stored != instance.image_file.name or not instance.image_file._committed
+        )
+
+
+@receiver(post_save, sender=WritingTaskModel)
+def task_image_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "image_file" not in update_fields:
+        return
+    if not getattr(instance, "_image_changed", True):
+        return
+    if instance.type == "image" and instance.image_file and instance.upload_status == UPLOAD_READY:
+        transaction.on_commit(partial(enqueue_derivatives, instance.pk))
+
+
+@receiver(upload_finished, sender=WritingTaskModel)
+def task_image_uploaded(sender, object_id, field_name, **kwargs):
+    exam_id = WritingTaskModel.objects.filter(pk=object_id).values_list("exam_id", flat=True).first()
+    if exam_id is not None:
+        invalidate_exam(exam_id)
+    if field_name == "image_file":
+        transaction.on_commit(partial(enqueue_derivatives, object_id))
@@ -1,3 +1,962 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.testing import assert_no_full_scan, assert_within_budget
+
+from users.models import CustomUser
+from users_auth.tokens import LoginRefreshToken
+from .models import (
+    WritingAnswerModel,
+    WritingBandHistogramModel,
+    WritingEvalution,
+    WritingExamModel,
+    WritingScoreLedgerModel,
+    WritingSubmissionModel,
+    WritingTaskImageVariant,
+    WritingTaskModel,
+    WrintingBandScoreModel,
+)
+from . import derivatives, importers
+from .derivatives import VARIANT_DIR, generate_derivatives, pick_variant
+from .importers import import_evaluations
+from .rankings import (
+    bucket,
+    exam_scope,
+    ranking,
+    rebuild_rankings,
+    tag_scope,
+    top_bands,
+    user_standing,
+)
+from .results import results_queryset
+from .services import (
+    current_final_band,
+    final_bands,
+    finalize_bands,
+    rebuild_ledger,
+    submit_attempt,
+)
+
+
+class WritingFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.exam = WritingExamModel.objects.create(title="Mock 1", tag="academic")
+        cls.task1 = WritingTaskModel.objects.create(
+            exam=cls.exam, type="text", task="task1", the_question="Describe the chart."
+        )
+        cls.task2 = WritingTaskModel.objects.create(
+            exam=cls.exam, type="text", task="task2", the_question="Discuss both views."
+        )
+
+    @staticmethod
+    def make_user(email):
+        return CustomUser.objects.create_user(
+            email=email, password="pass12345", first_name="Test", last_name="User"
+        )
+
+    @staticmethod
+    def evaluate(answer, band):
+        return WritingEvalution.objects.create(
+            evalute=answer,
+            task_response=band,
+            coherence_cohesion=band,
+            lexical_resource=band,
+            grammatical_range_accuracy=band,
+        )
+
+    def answer(self, user, task):
+        return WritingAnswerModel.objects.create(exam=self.exam, answer=task, user=user)
+
+
+class FinalBandServiceTests(WritingFixtureMixin, TestCase):
+    def test_weighted_band_for_cohort_in_one_query(self):
+        alice = self.make_user("alice@example.com")
+        bob = self.make_user("bob@example.com")
+        self.evaluate(self.answer(alice, self.task1), 6.0)
+        self.evaluate(self.answer(alice, self.task2), 7.5)
+        self.evaluate(self.answer(bob, self.task2), 5.0)
+
+        with self.assertNumQueries(1):
+            rows = {row["user_id"]: row["final_band"] for row in final_bands(exam=self.exam)}
+
+        self.assertAlmostEqual(rows[alice.pk], (6.0 + 7.5 * 2) / 3)
+        self.assertAlmostEqual(rows[bob.pk], 5.0)
+
+    def test_unevaluated_answers_score_zero(self):
+        carol = self.make_user("carol@example.com")
+        self.answer(carol, self.task1)
+
+        band = WrintingBandScoreModel(user=carol, exam=self.exam).calculate_final_band()
+
+        self.assertEqual(band, 0.0)
+
+    def test_finalize_upserts_existing_rows(self):
+        dave = self.make_user("dave@example.com")
+        answer = self.answer(dave, self.task1)
+        self.evaluate(answer, 6.0)
+        finalize_bands(exam=self.exam)
+
+        answer.evaluation.task_response = 8.0
+        answer.evaluation.save()
+        written = finalize_bands(exam=self.exam, users=[dave.pk])
+
+        self.assertEqual(written, 1)
+        score = WrintingBandScoreModel.objects.get(user=dave, exam=self.exam)
+        self.assertAlmostEqual(score.final_band, 6.5)
+
+    def test_management_command(self):
+        erin = self.make_user("erin@example.com")
+        self.evaluate(self.answer(erin, self.task2), 7.0)
+
+        call_command("finalize_writing_bands", exam=self.exam.pk, verbosity=0)
+
+        self.assertEqual(
+            WrintingBandScoreModel.objects.get(user=erin, exam=self.exam).final_band, 7.0
+        )
+
+
+class ScoreLedgerTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user("frank@example.com")
+        self.answer1 = self.answer(self.user, self.task1)
+        self.answer2 = self.answer(self.user, self.task2)
+
+    def test_ledger_follows_new_and_updated_evaluations(self):
+        self.evaluate(self.answer1, 6.0)
+        evaluation = self.evaluate(self.answer2, 7.0)
+        self.assertAlmostEqual(current_final_band(self.user, self.exam), (6.0 + 14.0) / 3)
+
+        evaluation.lexical_resource = 9.0
+        evaluation.save()
+
+        self.assertAlmostEqual(current_final_band(self.user, self.exam), (6.0 + 7.5 * 2) / 3)
+
+    def test_read_is_a_single_lookup(self):
+        self.evaluate(self.answer1, 6.5)
+        with self.assertNumQueries(1):
+            self.assertEqual(current_final_band(self.user, self.exam), 6.5)
+
+    def test_deletes_and_cascades_are_subtracted(self):
+        first = self.evaluate(self.answer1, 6.0)
+        self.evaluate(self.answer2, 8.0)
+
+        first.delete()
+        self.assertEqual(current_final_band(self.user, self.exam), 8.0)
+
+        self.answer2.delete()
+        ledger = WritingScoreLedgerModel.objects.get(user=self.user, exam=self.exam)
+        self.assertEqual((ledger.weighted_sum, ledger.total_weight), (0.0, 0))
+        self.assertEqual(ledger.final_band, 0.0)
+
+    def test_ledger_matches_rebuild(self):
+        self.evaluate(self.answer1, 5.5)
+        self.evaluate(self.answer2, 6.5)
+        live = current_final_band(self.user, self.exam)
+
+        WritingScoreLedgerModel.objects.all().delete()
+        rebuild_ledger(exam=self.exam)
+
+        self.assertAlmostEqual(current_final_band(self.user, self.exam), live)
+
+    def test_user_delete_cascades_cleanly(self):
+        self.evaluate(self.answer1, 6.0)
+        self.user.delete()
+        self.assertFalse(WritingScoreLedgerModel.objects.exists())
+
+
+class EvaluationImportTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        self.users = [self.make_user(f"cand{i}@example.com") for i in range(3)]
+        self.answers = [self.answer(user, self.task2) for user in self.users]
+
+    def sheet(self, rows):
+        header = "answer,task_response,coherence_cohesion,lexical_resource,grammatical_range_accuracy\n"
+        return io.StringIO(header + "".join(f"{','.join(map(str, row))}\n" for row in rows))
+
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        self.evaluate(self.answers[2], 5.0)
+        sheet = self.sheet([
+            (self.answers[0].pk, 6, 6, 7, 7),
+            (self.answers[1].pk, 6, 9.5, 7, 7),
+            (self.answers[0].pk, 6, 6, 6, 6),
+            (self.answers[2].pk, 6, 6, 6, 6),
+            (999999, 6, 6, 6, 6),
+        ])
+
+        report = import_evaluations(sheet)
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([r["line"] for r in report.rejected], [3, 4, 5, 6])
+        evaluation = WritingEvalution.objects.get(evalute=self.answers[0])
+        self.assertEqual(evaluation.overall_band, 6.5)
+        self.assertEqual(current_final_band(self.users[0], self.exam), 6.5)
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        rows = [(answer.pk, 6, 6, 6, 6) for answer in self.answers]
+        # answer lookup, evaluation insert, ledger lookup and ledger insert
+        # plus two savepoint pairs
+        with self.assertNumQueries(8):
+            report = import_evaluations(self.sheet(rows), batch_size=100)
+        self.assertEqual(report.created, 3)
+
+    def test_jsonl_in_small_chunks(self):
+        lines = [
+            json.dumps({"answer": answer.pk, "task_response": 7, "coherence_cohesion": 7,
+                        "lexical_resource": 7, "grammatical_range_accuracy": 7})
+            for answer in self.answers
+        ]
+        report = import_evaluations(io.StringIO("\n".join(lines + ["not json"])), fmt="jsonl", chunk_size=2)
+
+        self.assertEqual(report.created, 3)
+        self.assertEqual(report.rejected[0]["line"], 4)
+
+    def test_rows_evaluated_concurrently_are_rejected(self):
+        rows = [(answer.pk, 6, 6, 6, 6) for answer in self.answers]
+        write = importers._write_evaluations
+
+        def racing(pending, batch_size):
+            # Another examiner evaluates the first answer after the lookup.
+            if not WritingEvalution.objects.exists():
+                self.evaluate(self.answers[0], 5.0)
+            return write(pending, batch_size)
+
+        with mock.patch("writing.importers._write_evaluations", side_effect=racing):
+            report = import_evaluations(self.sheet(rows))
+
+        self.assertEqual(report.created, 2)
+        self.assertEqual([(r["line"], r["reason"]) for r in report.rejected],
+                         [(2, "answer is already evaluated")])
+        self.assertEqual(WritingEvalution.objects.get(evalute=self.answers[0]).overall_band, 5.0)
+
+    def test_conflicts_during_the_retry_are_rejected_too(self):
+        rows = [(answer.pk, 6, 6, 6, 6) for answer in self.answers]
+        write = importers._write_evaluations
+
+        def racing(pending, batch_size):
+            # Each attempt loses one more answer to another examiner.
+            taken = WritingEvalution.objects.count()
+            if taken < 2:
+                self.evaluate(self.answers[taken], 5.0)
+            return write(pending, batch_size)
+
+        with mock.patch("writing.importers._write_evaluations", side_effect=racing):
+            report = import_evaluations(self.sheet(rows))
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual([(r["line"], r["reason"]) for r in report.rejected],
+                         [(2, "answer is already evaluated"), (3, "answer is already evaluated")])
+        self.assertEqual(WritingEvalution.objects.get(evalute=self.answers[2]).overall_band, 6.0)
+
+    def test_unreadable_files_are_reported(self):
+        header = self.sheet([]).getvalue()
+        first = f"{self.answers[0].pk},6,6,6,6\n"
+        long_field = "x" * (csv.field_size_limit() + 1)
+        for content in (header + first + "\udcff", header + first + long_field):
+            stream = io.TextIOWrapper(
+                io.BytesIO(content.encode("utf-8", "surrogateescape")), encoding="utf-8", newline=""
+            )
+            report = import_evaluations(stream, chunk_size=1)
+            self.assertTrue(report.error)
+        # Rows before the unreadable one are kept.
+        self.assertEqual(WritingEvalution.objects.filter(evalute=self.answers[0]).count(), 1)
+
+        admin_user = self.make_user("sheets@example.com")
+        admin_user.is_staff = True
+        admin_user.save()
+        client = APIClient()
+        client.force_authenticate(admin_user)
+        upload = SimpleUploadedFile("sheet.csv", header.encode() + b"\xff\xfe,6\n")
+        response = client.post(reverse("evaluation-import"), {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("UTF-8", response.data["error"])
+
+    def test_admin_upload_endpoint(self):
+        admin_user = self.make_user("examiner@example.com")
+        admin_user.is_staff = True
+        admin_user.save()
+        client = APIClient()
+        client.force_authenticate(admin_user)
+        upload = SimpleUploadedFile(
+            "sheet.csv", self.sheet([(self.answers[0].pk, 8, 8, 8, 8)]).getvalue().encode()
+        )
+
+        response = client.post(reverse("evaluation-import"), {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+
+    def test_endpoint_requires_staff(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.post(reverse("evaluation-import"), {}, format="multipart")
+        self.assertEqual(response.status_code, 403)
+
+
+class ExamCatalogTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.make_user("reader@example.com"))
+        general = WritingExamModel.objects.create(title="General 1", tag="general")
+        WritingTaskModel.objects.create(exam=general, type="text", task="task1", the_question="Letter")
+
+    def test_list_filters_by_tag_and_prefetches_tasks(self):
+        # page ids, exams, tasks, image variants
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("exam-list"), {"tag": "academic"})
+
+        self.assertEqual(response.status_code, 200)
+        [exam] = response.data["results"]
+        self.assertEqual(exam["title"], "Mock 1")
+        self.assertEqual([task["task"] for task in exam["tasks"]], ["task1", "task2"])
+        assert_within_budget(response)
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse("exam-list"), {"tag": "academic"})
+
+    def test_keyset_pagination(self):
+        for i in range(3):
+            WritingExamModel.objects.create(title=f"Extra {i}", tag="academic")
+        response = self.client.get(reverse("exam-list"), {"tag": "academic", "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([exam["title"] for exam in response.data["results"]], ["Extra 1", "Extra 2"])
+        self.assertIsNone(response.data["next"])
+
+    def test_detail_is_cached_and_supports_etags(self):
+        url = reverse("exam-detail", args=[self.exam.pk])
+        first = self.client.get(url)
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_task_save_invalidates_the_exam(self):
+        url = reverse("exam-detail", args=[self.exam.pk])
+        etag = self.client.get(url)["ETag"]
+
+        self.task2.the_question = "Discuss both views and give your opinion."
+        self.task2.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["tasks"][1]["the_question"], self.task2.the_question)
+
+    def test_detail_within_budget(self):
+        response = self.client.get(reverse("exam-detail", args=[self.exam.pk]))
+        self.assertEqual(response.status_code, 200)
+        assert_within_budget(response)
+
+    def test_unknown_exam(self):
+        self.assertEqual(self.client.get(reverse("exam-detail", args=[0])).status_code, 404)
+
+
+class AdminChangelistQueryTests(WritingFixtureMixin, TestCase):
+    ROWS = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        CustomUser.objects.bulk_create(
+            CustomUser(email=f"bulk{i}@example.com", first_name="Bulk", password="!")
+            for i in range(cls.ROWS)
+        )
+        users = list(CustomUser.objects.all())
+        WritingAnswerModel.objects.bulk_create(
+            WritingAnswerModel(exam=cls.exam, answer=cls.task2, user=user, weight=2)
+            for user in users
+        )
+        WritingEvalution.objects.bulk_create(
+            WritingEvalution(
+                evalute=answer, task_response=6, coherence_cohesion=6,
+                lexical_resource=6, grammatical_range_accuracy=6, overall_band=6,
+            )
+            for answer in WritingAnswerModel.objects.all()
+        )
+        WrintingBandScoreModel.objects.bulk_create(
+            WrintingBandScoreModel(user=user, exam=cls.exam, final_band=6) for user in users
+        )
+        cls.admin = CustomUser.objects.create_superuser(
+            email="admin@example.com", password=None, first_name="Admin"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assertChangelistQueries(self, model, expected):
+        url = reverse(f"admin:writing_{model}_changelist")
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    # session + user, paginated COUNT, page rows
+    def test_answer_changelist(self):
+        self.assertChangelistQueries("writinganswermodel", 4)
+
+    def test_evaluation_changelist(self):
+        self.assertChangelistQueries("writingevalution", 4)
+
+    def test_band_score_changelist(self):
+        self.assertChangelistQueries("wrintingbandscoremodel", 4)
+
+    def test_task_changelist(self):
+        self.assertChangelistQueries("writingtaskmodel", 4)
+
+    def test_str_needs_no_extra_queries(self):
+        with self.assertNumQueries(3):
+            labels = [str(answer) for answer in WritingAnswerModel.objects.all()[:200]]
+            labels += [str(evaluation) for evaluation in WritingEvalution.objects.all()[:200]]
+            labels += [str(task) for task in WritingTaskModel.objects.all()]
+        self.assertEqual(len(labels), 402)
+
+
+class ExamSubmissionTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user("submitter@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("exam-submit", args=[self.exam.pk])
+        self.payload = {
+            "answers": [
+                {"task": self.task1.pk, "text": "The chart shows..."},
+                {"task": self.task2.pk, "text": "Some people believe..."},
+            ]
+        }
+
+    def test_both_tasks_in_one_transaction(self):
+        # task lookup, submission insert, answer bulk insert, two savepoint pairs
+        with self.assertNumQueries(7):
+            response = self.client.post(self.url, self.payload, format="json", HTTP_IDEMPOTENCY_KEY="k1")
+
+        self.assertEqual(response.status_code, 201)
+        assert_within_budget(response)
+        weights = {row["task"]: row["weight"] for row in response.data["answers"]}
+        self.assertEqual(weights, {self.task1.pk: 1, self.task2.pk: 2})
+        self.assertEqual(
+            WritingAnswerModel.objects.get(answer=self.task2, user=self.user).text,
+            "Some people believe...",
+        )
+
+    def test_retry_with_same_key_returns_the_original(self):
+        first = self.client.post(self.url, self.payload, format="json", HTTP_IDEMPOTENCY_KEY="k2")
+        retry = self.client.post(self.url, self.payload, format="json", HTTP_IDEMPOTENCY_KEY="k2")
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(WritingAnswerModel.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(WritingSubmissionModel.objects.count(), 1)
+
+    def test_key_reused_for_another_exam(self):
+        self.client.post(self.url, self.payload, format="json", HTTP_IDEMPOTENCY_KEY="k3")
+        other = WritingExamModel.objects.create(title="Mock 2", tag="academic")
+        task = WritingTaskModel.objects.create(exam=other, type="text", task="task2", the_question="Q")
+        response = self.client.post(
+            reverse("exam-submit", args=[other.pk]),
+            {"answers": [{"task": task.pk, "text": "..."}]},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="k3",
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_incomplete_or_foreign_tasks_are_rejected(self):
+        response = self.client.post(
+            self.url, {"answers": self.payload["answers"][:1]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WritingSubmissionModel.objects.exists())
+
+    def test_unknown_exam(self):
+        response = self.client.post(reverse("exam-submit", args=[0]), self.payload, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_single_save_reads_only_the_task_type(self):
+        answer = WritingAnswerModel(exam_id=self.exam.pk, answer_id=self.task1.pk, user=self.user)
+        with self.assertNumQueries(2):
+            answer.save()
+        self.assertEqual(answer.weight, 1)
+
+
+@override_settings(ROOT_URLCONF="core.asgi_urls")
+class AsyncExamViewTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user("async-reader@example.com")
+        self.user.is_active = True
+        self.user.save()
+        # AsyncClient(headers=...) defaults don't reach ASGI requests.
+        self.client = AsyncClient()
+        self.token = str(LoginRefreshToken.for_user(self.user).access_token)
+        self.payload = {
+            "answers": [
+                {"task": self.task1.pk, "text": "The chart shows..."},
+                {"task": self.task2.pk, "text": "Some people believe..."},
+            ]
+        }
+
+    def get(self, pk, token=True, **headers):
+        if token:
+            headers["Authorization"] = f"Bearer {self.token if token is True else token}"
+        return self.client.get(reverse("exam-detail", args=[pk]), headers=headers)
+
+    def submit(self, payload, **headers):
+        headers["Authorization"] = f"Bearer {self.token}"
+        return self.client.post(
+            reverse("exam-submit", args=[self.exam.pk]), payload,
+            content_type="application/json", headers=headers,
+        )
+
+    async def test_detail_requires_authentication(self):
+        self.assertEqual((await self.get(self.exam.pk, token=False)).status_code, 401)
+        self.assertEqual((await self.get(self.exam.pk, token="nonsense")).status_code, 401)
+
+    async def test_detail_matches_the_sync_view_and_is_cached(self):
+        response = await self.get(self.exam.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task["task"] for task in response.json()["tasks"]], ["task1", "task2"])
+        assert_within_budget(response)
+
+        response = await self.get(self.exam.pk, **{"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((await self.get(0)).status_code, 404)
+
+    async def test_submit_and_replay(self):
+        first = await self.submit(self.payload, **{"Idempotency-Key": "a1"})
+        self.assertEqual(first.status_code, 201)
+        assert_within_budget(first)
+        weights = {row["task"]: row["weight"] for row in first.json()["answers"]}
+        self.assertEqual(weights, {self.task1.pk: 1, self.task2.pk: 2})
+
+        retry = await self.submit(self.payload, **{"Idempotency-Key": "a1"})
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(await WritingAnswerModel.objects.filter(user=self.user).acount(), 2)
+
+    async def test_submit_errors(self):
+        self.assertEqual((await self.submit({"answers": []})).status_code, 400)
+        response = await self.submit({"answers": self.payload["answers"][:1]})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(await WritingSubmissionModel.objects.aexists())
+
+
+class ResultsDashboardTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.make_user("dashboard@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.exam2 = WritingExamModel.objects.create(title="Mock 2", tag="academic")
+        self.exam2_task1 = WritingTaskModel.objects.create(
+            exam=self.exam2, type="text", task="task1", the_question="Q"
+        )
+        self.exam2_task2 = WritingTaskModel.objects.create(
+            exam=self.exam2, type="text", task="task2", the_question="Q"
+        )
+        self.take(self.exam, [self.task1, self.task2], 6.0, 7.0, days_ago=10)
+        self.take(self.exam2, [self.exam2_task1, self.exam2_task2], 7.0, 7.5, days_ago=1)
+
+    def take(self, exam, tasks, *bands, days_ago):
+        submission, rows, _ = submit_attempt(
+            self.user.id, exam.pk, [{"task": task.pk, "text": "..."} for task in tasks]
+        )
+        WritingSubmissionModel.objects.filter(pk=submission.pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+        for row, band in zip(rows, bands):
+            self.evaluate(WritingAnswerModel.objects.get(pk=row["id"]), band)
+        return rows
+
+    def test_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("my-results"))
+        self.assertEqual(response.status_code, 200)
+        newest, oldest = response.data["results"]
+        self.assertEqual(newest["exam"], self.exam2.pk)
+        # task2 weighs twice task1
+        self.assertAlmostEqual(newest["final_band"], (7.0 + 2 * 7.5) / 3)
+        self.assertAlmostEqual(oldest["final_band"], (6.0 + 2 * 7.0) / 3)
+        self.assertAlmostEqual(newest["change"], newest["final_band"] - oldest["final_band"])
+        self.assertIsNone(oldest["change"])
+        self.assertEqual(newest["criteria"]["task_response"], 7.25)
+        self.assertEqual([point["exam"] for point in response.data["trend"]],
+                         [self.exam.pk, self.exam2.pk])
+        summary = response.data["summary"]
+        self.assertEqual(summary["exams"], 2)
+        self.assertEqual(summary["criteria"]["lexical_resource"], 6.875)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("my-results"))
+
+    def test_new_evaluation_invalidates(self):
+        self.client.get(reverse("my-results"))
+        evaluation = WritingEvalution.objects.get(evalute__answer=self.task1, evalute__user=self.user)
+        evaluation.task_response = 9.0
+        evaluation.save()
+
+        response = self.client.get(reverse("my-results"))
+        self.assertEqual(response.data["results"][1]["criteria"]["task_response"], 8.0)
+
+    def test_criteria_change_under_the_same_band_invalidates(self):
+        self.client.get(reverse("my-results"))
+        evaluation = WritingEvalution.objects.get(evalute__answer=self.task1, evalute__user=self.user)
+        evaluation.task_response = 7.0
+        evaluation.lexical_resource = 5.0
+        evaluation.save()
+        self.assertEqual(evaluation.overall_band, 6.0)
+
+        criteria = self.client.get(reverse("my-results")).data["results"][1]["criteria"]
+        self.assertEqual(criteria["task_response"], 7.0)
+        self.assertEqual(criteria["lexical_resource"], 6.0)
+
+    def test_pending_exam_and_cursor(self):
+        exam3 = WritingExamModel.objects.create(title="Mock 3", tag="general")
+        task = WritingTaskModel.objects.create(exam=exam3, type="text", task="task2", the_question="Q")
+        self.client.get(reverse("my-results"))
+        submit_attempt(self.user.id, exam3.pk, [{"task": task.pk, "text": "..."}])
+
+        response = self.client.get(reverse("my-results"), {"page_size": 2})
+        pending, newest = response.data["results"]
+        self.assertEqual(pending["exam"], exam3.pk)
+        self.assertIsNone(pending["final_band"])
+        self.assertEqual(newest["exam"], self.exam2.pk)
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["exam"] for row in response.data["results"]], [self.exam.pk])
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("my-results"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class RankingTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.other = WritingExamModel.objects.create(title="Mock 2", tag="academic")
+        self.users = [self.make_user(f"rank{i}@example.com") for i in range(5)]
+        for user, band in zip(self.users, [5.0, 6.0, 6.0, 7.5]):
+            WrintingBandScoreModel.objects.create(user=user, exam=self.exam, final_band=band)
+        WrintingBandScoreModel.objects.create(user=self.users[0], exam=self.other, final_band=8.0)
+
+    def histogram(self):
+        return sorted(WritingBandHistogramModel.objects.filter(count__gt=0)
+                      .values_list("scope", "bucket", "count"))
+
+    def test_rank_and_percentile_in_one_query(self):
+        with self.assertNumQueries(1):
+            result = ranking(exam_scope(self.exam.pk))
+        self.assertEqual(result.total, 4)
+        self.assertEqual([result.rank(band) for band in (7.5, 6.0, 5.0, 9.0)], [1, 2, 4, 1])
+        self.assertEqual(result.percentile(6.0), 25.0)
+        self.assertEqual(result.percentile(6.5), 75.0)
+        # users[0] has two academic bands and counts once, with the best.
+        self.assertEqual(ranking(tag_scope("academic")).total, 4)
+        with self.assertNumQueries(0):
+            ranking(exam_scope(self.exam.pk))
+
+    def test_saves_and_deletes_move_the_counts(self):
+        score = WrintingBandScoreModel.objects.get(user=self.users[0], exam=self.exam)
+        score.final_band = 8.5
+        score.save()
+        self.assertEqual(ranking(exam_scope(self.exam.pk)).rank(8.5), 1)
+
+        score.delete()
+        self.assertEqual(ranking(exam_scope(self.exam.pk)).total, 3)
+        incremental = self.histogram()
+        rebuild_rankings()
+        self.assertEqual(self.histogram(), incremental)
+
+    def test_finalize_bands_updates_incrementally(self):
+        WrintingBandScoreModel.objects.all().delete()
+        user = self.users[4]
+        self.evaluate(self.answer(user, self.task1), 6.0)
+        finalize_bands(exam=self.exam)
+        self.evaluate(self.answer(user, self.task2), 8.0)
+        finalize_bands(exam=self.exam)
+
+        result = ranking(exam_scope(self.exam.pk))
+        self.assertEqual(result.total, 1)
+        self.assertEqual(result.rank((6.0 + 8.0 * 2) / 3), 1)
+        incremental = self.histogram()
+        rebuild_rankings(exam=self.exam.pk)
+        self.assertEqual(self.histogram(), incremental)
+
+    def test_top_bands(self):
+        top = top_bands(exam_id=self.exam.pk, n=3)
+        self.assertEqual([(row["rank"], row["final_band"]) for row in top],
+                         [(1, 7.5), (2, 6.0), (2, 6.0)])
+        top = top_bands(tag="academic", n=2)
+        self.assertEqual([row["final_band"] for row in top], [8.0, 7.5])
+
+    def test_tag_counts_each_candidate_once_with_their_best_band(self):
+        WrintingBandScoreModel.objects.create(user=self.users[3], exam=self.other, final_band=5.0)
+        tag = tag_scope("academic")
+        self.assertEqual(ranking(tag).total, 4)
+        self.assertEqual(ranking(tag).rank(7.5), 2)
+        top = top_bands(tag="academic", n=10)
+        self.assertEqual([(row["user"], row["final_band"]) for row in top], [
+            (self.users[0].pk, 8.0), (self.users[3].pk, 7.5),
+            (self.users[1].pk, 6.0), (self.users[2].pk, 6.0),
+        ])
+
+        # Only a change of best band moves the tag counts.
+        best = WrintingBandScoreModel.objects.get(user=self.users[0], exam=self.other)
+        best.final_band = 4.0
+        best.save()
+        standing = user_standing(self.users[0].pk, tag="academic")
+        self.assertEqual((standing["final_band"], standing["rank"], standing["total"]),
+                         (5.0, 4, 4))
+        best.delete()
+        WrintingBandScoreModel.objects.filter(user=self.users[3], exam=self.other).delete()
+        self.assertEqual(ranking(tag).total, 4)
+        incremental = self.histogram()
+        rebuild_rankings()
+        self.assertEqual(self.histogram(), incremental)
+
+    def test_api(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.get(reverse("exam-ranking", args=[self.exam.pk]), {"top": 2, "band": 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["top"]), 2)
+        self.assertEqual(response.data["me"]["rank"], 2)
+        self.assertEqual(response.data["me"]["percentile"], 25.0)
+        self.assertEqual(response.data["band"]["rank"], 2)
+        assert_within_budget(response)
+
+        response = client.get(reverse("tag-ranking", args=["academic"]))
+        self.assertEqual(response.data["total"], 4)
+        assert_within_budget(response)
+        self.assertEqual(client.get(reverse("tag-ranking", args=["other"])).status_code, 404)
+
+    def test_api_rejects_bands_outside_the_scale(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        url = reverse("exam-ranking", args=[self.exam.pk])
+        for band in ("nan", "inf", "-inf", "-0.5", "9.5", "seven"):
+            response = client.get(url, {"band": band})
+            self.assertEqual(response.status_code, 400, band)
+        self.assertEqual(client.get(url, {"band": "9"}).data["band"]["rank"], 1)
+        with self.assertRaises(ValueError):
+            bucket(float("nan"))
+
+
+class HotQueryPlanTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        self.user = self.make_user("plan@example.com")
+
+    def test_answers_for_user_and_exam(self):
+        assert_no_full_scan(
+            WritingAnswerModel.objects.filter(user=self.user, exam=self.exam).values("weight")
+        )
+
+    def test_final_bands_for_an_exam(self):
+        assert_no_full_scan(final_bands(exam=self.exam))
+
+    def test_final_score_and_ledger_lookups(self):
+        assert_no_full_scan(WrintingBandScoreModel.objects.filter(user=self.user, exam=self.exam))
+        assert_no_full_scan(WritingScoreLedgerModel.objects.filter(user=self.user, exam=self.exam))
+
+    def test_top_bands_of_an_exam(self):
+        assert_no_full_scan(
+            WrintingBandScoreModel.objects.select_related(None)
+            .filter(exam=self.exam)
+            .order_by("-final_band")[:10]
+        )
+
+    def test_results_dashboard(self):
+        assert_no_full_scan(results_queryset(self.user.pk))
+
+    def test_rankings(self):
+        assert_no_full_scan(WritingBandHistogramModel.objects.filter(scope="exam:1"))
+        assert_no_full_scan(
+            WrintingBandScoreModel.objects.select_related(None)
+            .filter(exam__tag="academic", final_band__gte=7.0)
+            .order_by("-final_band")[:10]
+        )
+
+    def test_catalog_page_by_tag(self):
+        assert_no_full_scan(
+            WritingExamModel.objects.filter(tag="academic", id__gt=0).order_by("id")[:20]
+        )
+
+    def test_duplicate_answers_are_rejected(self):
+        self.answer(self.user, self.task1)
+        with self.assertRaises(IntegrityError):
+            WritingAnswerModel.objects.create(exam=self.exam, answer=self.task1, user=self.user)
+
+
+def chart_png(width=1600, height=900, color=(30, 120, 200)):
+    from PIL import Image
+
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+@override_settings(IMAGE_DERIVATIVES={**settings.IMAGE_DERIVATIVES, "WORKERS": 0})
+class ImageDerivativeTests(WritingFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.storage = FileSystemStorage(location=directory, base_url="/media/")
+        for field in (
+            WritingTaskModel._meta.get_field("image_file"),
+            WritingTaskImageVariant._meta.get_field("file"),
+        ):
+            patcher = mock.patch.object(field, "storage", self.storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def image_task(self, png=None, name="chart.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return WritingTaskModel.objects.create(
+                exam=self.exam, type="image", task="task1",
+                image_file=SimpleUploadedFile(name, png or chart_png()),
+            )
+
+    def test_saving_an_image_task_creates_variants(self):
+        task = self.image_task()
+        variants = WritingTaskImageVariant.objects.filter(task=task).order_by("format", "width")
+        self.assertEqual(
+            [(v.format, v.width, v.height) for v in variants],
+            [("jpeg", 320, 180), ("jpeg", 640, 360), ("jpeg", 1024, 576),
+             ("webp", 320, 180), ("webp", 640, 360), ("webp", 1024, 576)],
+        )
+        from PIL import Image
+
+        webp = variants.get(format="webp", width=640)
+        with Image.open(self.storage.path(webp.file.name)) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (640, 360)))
+        self.assertLess(webp.size, task.image_file.size)
+
+    def test_identical_charts_share_files(self):
+        first = self.image_task()
+        with mock.patch.object(self.storage, "save", wraps=self.storage.save) as save:
+            second = self.image_task(name="copy.png")
+        # Only the second original was stored; no variant was encoded again.
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(
+            set(first.image_variants.values_list("file", flat=True)),
+            set(second.image_variants.values_list("file", flat=True)),
+        )
+
+    def test_small_images_are_not_upscaled(self):
+        task = self.image_task(chart_png(200, 100))
+        self.assertEqual(set(task.image_variants.values_list("width", flat=True)), {200})
+
+    def test_unchanged_image_is_not_reprocessed(self):
+        task = self.image_task()
+        self.assertEqual(generate_derivatives(task.pk), 0)
+
+    def test_replaced_image_replaces_variants(self):
+        task = self.image_task()
+        old = set(task.image_variants.values_list("source_hash", flat=True))
+        task.image_file = SimpleUploadedFile("new.png", chart_png(color=(200, 0, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        new = set(task.image_variants.values_list("source_hash", flat=True))
+        self.assertEqual(len(new), 1)
+        self.assertNotEqual(old, new)
+        self.assertEqual(task.image_variants.count(), 6)
+
+    def test_replaced_variant_files_are_deleted(self):
+        task = self.image_task()
+        old = set(task.image_variants.values_list("file", flat=True))
+        task.image_file = SimpleUploadedFile("new.png", chart_png(color=(200, 0, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertFalse(any(self.storage.exists(name) for name in old))
+        self.assertTrue(all(map(self.storage.exists, task.image_variants.values_list("file", flat=True))))
+
+    def test_other_edits_do_not_regenerate(self):
+        task = self.image_task()
+        task.the_question = "Describe the chart."
+        with mock.patch("writing.signals.enqueue_derivatives") as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                task.save()
+        enqueue.assert_not_called()
+
+    def test_concurrent_runs_for_a_task_do_not_conflict(self):
+        task = self.image_task()
+        name = self.storage.save("images/new.png", io.BytesIO(chart_png(color=(0, 200, 0))))
+        WritingTaskModel.objects.filter(pk=task.pk).update(image_file=name)
+        render = derivatives._render_variants
+        raced = []
+
+        def racing(*args):
+            # The other run (e.g. queued by the upload) finishes first.
+            variants = render(*args)
+            if not raced:
+                raced.append(True)
+                generate_derivatives(task.pk)
+            return variants
+
+        with mock.patch("writing.derivatives._render_variants", side_effect=racing):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(generate_derivatives(task.pk), 6)
+        self.assertEqual(task.image_variants.count(), 6)
+        self.assertEqual(len(set(task.image_variants.values_list("source_hash", flat=True))), 1)
+        # The losing run's files were deleted.
+        stored = sum(len(files) for _, _, files in os.walk(self.storage.path(VARIANT_DIR)))
+        self.assertEqual(stored, 6)
+
+    def test_failed_background_runs_are_logged(self):
+        future = Future()
+        future.set_exception(RuntimeError("decoder crashed"))
+        with self.assertLogs("writing.derivatives", "ERROR") as logs:
+            derivatives._log_failure(7, future)
+        self.assertIn("task 7", logs.output[0])
+
+    def test_invalid_image_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            WritingTaskModel.objects.create(
+                exam=self.exam, type="image", task="task1",
+                image_file=SimpleUploadedFile("chart.png", b"not an image"),
+            )
+
+    def test_api_serves_the_smallest_fitting_variant(self):
+        self.image_task()
+        client = APIClient()
+        client.force_authenticate(self.make_user("reader@example.com"))
+        url = reverse("exam-detail", args=[self.exam.pk])
+
+        image = client.get(url, {"image_width": 500}).data["tasks"][-1]["image"]
+        self.assertEqual((image["format"], image["width"]), ("webp", 640))
+        image = client.get(url, {"image_width": 2000, "image_format": "jpeg"}).data["tasks"][-1]["image"]
+        self.assertEqual((image["format"], image["width"]), ("jpeg", 1024))
+        self.assertNotEqual(
+            client.get(url, {"image_width": 500})["ETag"],
+            client.get(url, {"image_width": 300})["ETag"],
+        )
+
+    def test_pick_variant(self):
+        variants = [
+            {"format": "jpeg", "width": 320},
+            {"format": "jpeg", "width": 1024},
+        ]
+        self.assertEqual(pick_variant(variants, 300, "webp")["width"], 320)
+        self.assertEqual(pick_variant(variants)["width"], 1024)
+        self.assertIsNone(pick_variant([], 300))
@@ -0,0 +1,21 @@
+# writing/urls.py
+from django.urls import path
+from .views import (
+    EvaluationImportApiView,
+    ExamDetailApiView,
+    ExamListApiView,
+    ExamRankingApiView,
+    ExamSubmissionApiView,
+    MyResultsApiView,
+    TagRankingApiView,
+)
+
+urlpatterns = [
+    path('exams/', ExamListApiView.as_view(), name='exam-list'),
+    path('exams/<int:pk>/', ExamDetailApiView.as_view(), name='exam-detail'),
+    path('exams/<int:pk>/submit/', ExamSubmissionApiView.as_view(), name='exam-submit'),
+    path('exams/<int:pk>/ranking/', ExamRankingApiView.as_view(), name='exam-ranking'),
+    path('rankings/<str:tag>/', TagRankingApiView.as_view(), name='tag-ranking'),
+    path('me/results/', MyResultsApiView.as_view(), name='my-results'),
+    path('evaluations/import/', EvaluationImportApiView.as_view(), name='evaluation-import'),
+]
@@ -1,3 +1,274 @@
-from django.shortcuts import render
+import io
+import math
 
-# Create your views here.
+from django.http import Http404
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+from core.metrics import Budget
+
+from .catalog import exam_payloads, make_etag
+from .derivatives import PIL_FORMATS, pick_variant
+from .importers import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CHUNK_SIZE,
+    FORMATS,
+    guess_format,
+    import_evaluations,
+)
+from .models import WritingExamModel
+from .rankings import exam_scope, ranking, tag_scope, top_bands, user_standing
+from .results import results_page, user_results
+from .serializers import SubmissionSerializer
+from .services import SubmissionError, submit_attempt
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+class EvaluationImportApiView(APIView):
+    """Upload an examiner grading sheet (CSV or JSONL) as multipart ``file``"""
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"message": "A grading sheet file is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.data.get("format") or guess_format(upload.name)
+        if fmt not in FORMATS:
+            return Response({"message": f"Format must be one of {', '.join(FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        report = import_evaluations(
+            stream,
+            fmt=fmt,
+            chunk_size=_positive_int(request.data.get("chunk_size"), DEFAULT_CHUNK_SIZE),
+            batch_size=_positive_int(request.data.get("batch_size"), DEFAULT_BATCH_SIZE),
+        )
+        if report.error:
+            return Response(report.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+def _not_modified(request, etag):
+    return etag in request.headers.get("If-None-Match", "")
+
+
+def _image_params(request):
+    """``?image_width=`` (the client's display width) and ``?image_format=``"""
+    width = _positive_int(request.GET.get("image_width"), None)
+    fmt = request.GET.get("image_format")
+    return width, fmt if fmt in PIL_FORMATS else "webp"
+
+
+def _with_images(exam, width, fmt):
+    """A cached exam with the best fitting variant of each task image as ``image``"""
+    tasks = [
+        {**task, "image": pick_variant(task["image_variants"], width, fmt)}
+        for task in exam["tasks"]
+    ]
+    return {**exam, "tasks": tasks}
+
+
+def _with_etag(response, etag):
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+class ExamCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class ExamListApiView(APIView):
+    """Writing exams with their tasks, filterable by ``tag``, keyset-paginated"""
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=4, duplicates=0, seconds=0.25)
+
+    def get(self, request):
+        exams = WritingExamModel.objects.only("id")
+        tag = request.query_params.get("tag")
+        if tag:
+            exams = exams.filter(tag=tag)
+
+        paginator = ExamCursorPagination()
+        page = [exam.pk for exam in paginator.paginate_queryset(exams, request, view=self)]
+        payloads = exam_payloads(page)
+        results = [payloads[exam_id] for exam_id in page if exam_id in payloads]
+
+        width, fmt = _image_params(request)
+        etag = make_etag(
+            [paginator.get_next_link(), [item["etag"] for item in results], width, fmt]
+        )
+        if _not_modified(request, etag):
+            return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        response = paginator.get_paginated_response(
+            [_with_images(item["data"], width, fmt) for item in results]
+        )
+        return _with_etag(response, etag)
+
+
+class ExamDetailApiView(APIView):
+    """
+    One writing exam. Each task's ``image`` is the smallest stored variant
+    at least ``?image_width=`` pixels wide in ``?image_format=`` (webp or
+    jpeg, default webp), or null while there are none.
+    """
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=3, duplicates=0, seconds=0.25)
+
+    def get(self, request, pk):
+        payload = exam_payloads([pk]).get(pk)
+        if payload is None:
+            raise Http404
+        width, fmt = _image_params(request)
+        etag = make_etag([payload["etag"], width, fmt])
+        if _not_modified(request, etag):
+            return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        return _with_etag(Response(_with_images(payload["data"], width, fmt)), etag)
+
+
+def _submission_data(submission, answers):
+    return {
+        "submission": submission.pk,
+        "answers": [
+            {"id": row["id"], "task": row["answer_id"], "weight": row["weight"]}
+            for row in answers
+        ],
+    }
+
+
+class ExamSubmissionApiView(APIView):
+    """
+    Submit every task answer of an exam in one request.
+
+    Send an ``Idempotency-Key`` header (or ``idempotency_key`` field) and
+    retry with the same key: the original submission is returned and no
+    duplicate answers are created.
+    """
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=7, duplicates=0)
+
+    def post(self, request, pk):
+        serializer = SubmissionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        key = request.headers.get("Idempotency-Key") or serializer.validated_data.get(
+            "idempotency_key"
+        )
+        if key and len(key) > 64:
+            return Response({"message": "Idempotency key is too long."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            submission, answers, created = submit_attempt(
+                request.user.id, pk, serializer.validated_data["answers"], idempotency_key=key
+            )
+        except SubmissionError as exc:
+            return Response({"message": str(exc)}, status=exc.status)
+
+        return Response(
+            _submission_data(submission, answers),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class MyResultsApiView(APIView):
+    """
+    The signed-in candidate's results: a summary, the band trend and, per
+    exam (newest first, cursor-paginated), the final band, its change from
+    the previous exam and the average of each criterion.
+    """
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=1, duplicates=0, seconds=0.25)
+
+    def get(self, request):
+        data = user_results(request.user.id)
+        page_size = min(
+            _positive_int(request.query_params.get("page_size"), ExamCursorPagination.page_size),
+            ExamCursorPagination.max_page_size,
+        )
+        try:
+            rows, cursor = results_page(
+                data["results"], request.query_params.get("cursor"), page_size
+            )
+        except ValueError:
+            raise NotFound("Invalid cursor")
+        next_url = None
+        if cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", cursor)
+        return Response({
+            "summary": data["summary"],
+            "trend": data["trend"],
+            "next": next_url,
+            "results": rows,
+        })
+
+
+def _ranking_response(request, scope, exam_id=None, tag=None):
+    top = min(_positive_int(request.query_params.get("top"), 10), 100)
+    band = request.query_params.get("band")
+    if band is not None:
+        try:
+            band = float(band)
+        except ValueError:
+            band = None
+        # float() also parses "nan" and "inf".
+        if band is None or not math.isfinite(band) or not 0 <= band <= 9:
+            return Response({"message": "band must be a number from 0 to 9."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    result = ranking(scope)
+    data = {
+        "total": result.total,
+        "top": top_bands(exam_id=exam_id, tag=tag, n=top),
+        "me": user_standing(request.user.id, exam_id=exam_id, tag=tag),
+    }
+    if band is not None:
+        data["band"] = {
+            "final_band": band,
+            "rank": result.rank(band),
+            "percentile": result.percentile(band),
+        }
+    return Response(data)
+
+
+class ExamRankingApiView(APIView):
+    """
+    Leaderboard of an exam: the ``?top=`` best final bands, the candidate's
+    own rank and percentile and, with ``?band=``, where that band would rank.
+    """
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=4, duplicates=0, seconds=0.25)
+
+    def get(self, request, pk):
+        if not WritingExamModel.objects.filter(pk=pk).exists():
+            raise Http404
+        return _ranking_response(request, exam_scope(pk), exam_id=pk)
+
+
+class TagRankingApiView(APIView):
+    """ExamRankingApiView across every exam of a tag; the candidate's best band counts"""
+    permission_classes = [IsAuthenticated]
+    budget = Budget(queries=4, duplicates=0, seconds=0.25)
+
+    def get(self, request, tag):
+        if tag not in dict(WritingExamModel.TAG):
+            raise Http404
+        return _ranking_response(request, tag_scope(tag), tag=tag)